@@ -0,0 +1,354 @@
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_ID = "global"
+
+def day_id(timestamp: datetime) -> str:
+    return f"day:{timestamp.strftime('%Y-%m-%d')}"
+
+def page_id(page: str) -> str:
+    return f"page:{page}"
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def day_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def naive_utc(timestamp: datetime) -> datetime:
+    """Stored timestamps are naive UTC; convert aware query bounds to match"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+# Contact submissions land in the hourly bucket of the page track_page_view records for them
+CONTACT_PAGE = "contact_submission"
+
+GRANULARITIES = ("hour", "day", "week")
+
+def bucket_matches(start: datetime, end: datetime, page: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """$match for the hourly and the daily tier: every bucket overlapping [start, end)"""
+    matches = (
+        {"bucket": {"$gte": hour_bucket(start), "$lt": end}},
+        {"bucket": {"$gte": day_bucket(start), "$lt": end}},
+    )
+    if page is not None:
+        for match in matches:
+            match["page"] = page
+    return matches
+
+def _corrections(current: Dict[Any, Dict[str, int]], wanted: Dict[Any, Dict[str, int]]) -> Dict[Any, Dict[str, int]]:
+    """Counter fields to $set, per key, so `current` matches `wanted`; counters not wanted go to zero"""
+    corrections = {}
+    for key in current.keys() | wanted.keys():
+        have, want = current.get(key, {}), wanted.get(key, {})
+        changed = {field: want.get(field, 0) for field in have.keys() | want.keys() if have.get(field, 0) != want.get(field, 0)}
+        if changed:
+            corrections[key] = changed
+    return corrections
+
+class AnalyticsRollups:
+    """Counters kept in `analytics_rollups` so the dashboard never counts collections.
+
+    Documents are keyed by `_id`: "global" holds the AnalyticsData totals,
+    "day:YYYY-MM-DD" and "page:<name>" hold per-day and per-page counters.
+    Every write path updates them with `$inc`; `reconcile()` rebuilds them
+    from the source collections.
+
+    `analytics_hourly` holds one document per (hour, page) bucket, which
+    `time_series()` rolls up to hours, days or weeks for any date range.
+    Once raw data ages out, `compact()` folds its hourly buckets into one
+    bucket per (day, page) in `analytics_daily`.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db.analytics_rollups
+
+    @property
+    def hourly(self):
+        return self.db.analytics_hourly
+
+    @property
+    def daily(self):
+        return self.db.analytics_daily
+
+    async def record_page_views(self, page_views: List[Dict[str, Any]]):
+        """Fold a flushed batch of page views into the counters in one bulk write"""
+        if not page_views:
+            return
+        per_day = Counter(day_id(view["timestamp"]) for view in page_views)
+        per_page = Counter(page_id(view["page"]) for view in page_views)
+
+        per_hour = Counter((hour_bucket(view["timestamp"]), view["page"]) for view in page_views)
+
+        operations = [UpdateOne({"_id": GLOBAL_ID}, {"$inc": {"page_views": len(page_views)}}, upsert=True)]
+        for key, count in list(per_day.items()) + list(per_page.items()):
+            operations.append(UpdateOne({"_id": key}, {"$inc": {"page_views": count}}, upsert=True))
+        await self.collection.bulk_write(operations, ordered=False)
+
+        await self.hourly.bulk_write([
+            UpdateOne({"bucket": bucket, "page": page}, {"$inc": {"page_views": count}}, upsert=True)
+            for (bucket, page), count in per_hour.items()
+        ], ordered=False)
+
+    async def record_contact(self, message: Dict[str, Any]):
+        timestamp = message["timestamp"]
+        await self.collection.bulk_write([
+            UpdateOne(
+                {"_id": GLOBAL_ID},
+                {
+                    "$inc": {"contact_submissions": 1, "total_messages": 1, "unread_messages": 0 if message["read"] else 1},
+                    "$max": {"last_contact": timestamp}
+                },
+                upsert=True
+            ),
+            UpdateOne({"_id": day_id(timestamp)}, {"$inc": {"contact_submissions": 1}}, upsert=True),
+        ], ordered=False)
+        await self.hourly.update_one(
+            {"bucket": hour_bucket(timestamp), "page": CONTACT_PAGE},
+            {"$inc": {"contact_submissions": 1}},
+            upsert=True
+        )
+
+    async def record_read_change(self, newly_read: int):
+        """Adjust the unread counter; negative values mark messages unread again"""
+        if newly_read:
+            await self.collection.update_one(
+                {"_id": GLOBAL_ID},
+                {"$inc": {"unread_messages": -newly_read}},
+                upsert=True
+            )
+
+    async def record_messages_deleted(self, timestamps: List[datetime], deleted_unread: int):
+        """Remove deleted messages from every counter that reconcile() derives from contact_messages"""
+        if not timestamps:
+            return
+        deleted = len(timestamps)
+        per_day = Counter(day_id(timestamp) for timestamp in timestamps)
+        per_hour = Counter(hour_bucket(timestamp) for timestamp in timestamps)
+        operations = [UpdateOne(
+            {"_id": GLOBAL_ID},
+            {"$inc": {"contact_submissions": -deleted, "total_messages": -deleted, "unread_messages": -deleted_unread}},
+            upsert=True
+        )]
+        operations += [UpdateOne({"_id": key}, {"$inc": {"contact_submissions": -count}}) for key, count in per_day.items()]
+        await self.collection.bulk_write(operations, ordered=False)
+        await self.hourly.bulk_write([
+            UpdateOne({"bucket": bucket, "page": CONTACT_PAGE}, {"$inc": {"contact_submissions": -count}})
+            for bucket, count in per_hour.items()
+        ], ordered=False)
+        # Messages from compacted days are counted in the daily tier instead
+        per_day_bucket = Counter(day_bucket(timestamp) for timestamp in timestamps)
+        await self.daily.bulk_write([
+            UpdateOne({"bucket": bucket, "page": CONTACT_PAGE}, {"$inc": {"contact_submissions": -count}})
+            for bucket, count in per_day_bucket.items()
+        ], ordered=False)
+
+    async def record_messages_archived(self, archived: int, archived_unread: int):
+        """Archived messages leave the inbox counters but stay in the submission history"""
+        if archived:
+            await self.collection.update_one(
+                {"_id": GLOBAL_ID},
+                {"$inc": {"total_messages": -archived, "unread_messages": -archived_unread}},
+                upsert=True
+            )
+
+    async def get_totals(self) -> Dict[str, Any]:
+        totals = await self.collection.find_one({"_id": GLOBAL_ID}, {"_id": 0})
+        return totals or {}
+
+    async def reconcile(self, raw_since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Recompute the rollups from page_views and contact_messages.
+
+        With retention enabled the raw collections only hold recent data, so
+        hourly buckets are rebuilt from `raw_since` on and older buckets and
+        the compacted daily tier are kept; every counter is then summed from
+        those buckets.
+
+        Only counters that differ from the recomputed value are written, each
+        with its own $set, and nothing is deleted, so increments from the
+        write paths meanwhile are kept on every counter that was already
+        right. A counter that was wrong and is incremented between its
+        recount and its $set loses that increment; the next reconcile fixes it.
+        """
+        await self._rebuild_hourly(raw_since)
+
+        per_day: Dict[str, Dict[str, int]] = {}
+        per_page: Dict[str, int] = {}
+        page_views = contact_submissions = 0
+        day_format = {"$dateToString": {"format": "%Y-%m-%d", "date": "$bucket"}}
+        for tier in (self.hourly, self.daily):
+            rows = await tier.aggregate([
+                {"$group": {
+                    "_id": {"day": day_format, "page": "$page"},
+                    "page_views": {"$sum": "$page_views"},
+                    "contact_submissions": {"$sum": "$contact_submissions"}
+                }}
+            ]).to_list(None)
+            for row in rows:
+                day = per_day.setdefault(f"day:{row['_id']['day']}", {"page_views": 0, "contact_submissions": 0})
+                day["page_views"] += row["page_views"]
+                day["contact_submissions"] += row["contact_submissions"]
+                key = page_id(row["_id"]["page"])
+                per_page[key] = per_page.get(key, 0) + row["page_views"]
+                page_views += row["page_views"]
+                contact_submissions += row["contact_submissions"]
+
+        total_messages = await self.db.contact_messages.count_documents({})
+        unread_messages = await self.db.contact_messages.count_documents({"read": False})
+        last_contact_doc = await self.db.contact_messages.find().sort("timestamp", -1).limit(1).to_list(1)
+
+        totals = {
+            "page_views": page_views,
+            "contact_submissions": contact_submissions,
+            "total_messages": total_messages,
+            "unread_messages": unread_messages,
+        }
+        if last_contact_doc:
+            totals["last_contact"] = last_contact_doc[0]["timestamp"]
+
+        counters: Dict[str, Dict[str, int]] = dict(per_day)
+        counters.update({key: {"page_views": count} for key, count in per_page.items() if count})
+
+        counters[GLOBAL_ID] = {field: value for field, value in totals.items() if field != "last_contact"}
+        current = {doc.pop("_id"): doc async for doc in self.collection.find()}
+        # Not a counter: set below from the newest message
+        current.get(GLOBAL_ID, {}).pop("last_contact", None)
+        corrections = _corrections(current, counters)
+        if GLOBAL_ID not in current:
+            # ensure_backfilled() looks for this document
+            corrections[GLOBAL_ID] = dict(counters[GLOBAL_ID])
+        if "last_contact" in totals:
+            corrections.setdefault(GLOBAL_ID, {})["last_contact"] = totals["last_contact"]
+        operations = [UpdateOne({"_id": key}, {"$set": values}, upsert=True) for key, values in corrections.items()]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+        logger.info(f"Reconciled analytics rollups: {len(operations)} documents")
+        return totals
+
+    async def _rebuild_hourly(self, since: Optional[datetime] = None):
+        """Recompute hourly buckets from the raw collections, all of them or those from `since` on"""
+        hour = {"$dateToString": {"format": "%Y-%m-%dT%H", "date": "$timestamp"}}
+        raw_match = {"timestamp": {"$gte": since}} if since else {}
+        views = await self.db.page_views.aggregate([
+            {"$match": raw_match},
+            {"$group": {"_id": {"bucket": hour, "page": "$page"}, "count": {"$sum": 1}}}
+        ]).to_list(None)
+        contacts = await self.db.contact_messages.aggregate([
+            {"$match": raw_match},
+            {"$group": {"_id": hour, "count": {"$sum": 1}}}
+        ]).to_list(None)
+
+        buckets: Dict[tuple, Dict[str, Any]] = {}
+        for row in views:
+            key = (datetime.strptime(row["_id"]["bucket"], "%Y-%m-%dT%H"), row["_id"]["page"])
+            buckets[key] = {"bucket": key[0], "page": key[1], "page_views": row["count"], "contact_submissions": 0}
+        for row in contacts:
+            key = (datetime.strptime(row["_id"], "%Y-%m-%dT%H"), CONTACT_PAGE)
+            bucket = buckets.setdefault(key, {"bucket": key[0], "page": key[1], "page_views": 0, "contact_submissions": 0})
+            bucket["contact_submissions"] = row["count"]
+
+        wanted = {
+            key: {"page_views": bucket["page_views"], "contact_submissions": bucket["contact_submissions"]}
+            for key, bucket in buckets.items()
+        }
+        current = {
+            (doc.pop("bucket"), doc.pop("page")): doc
+            async for doc in self.hourly.find({"bucket": {"$gte": since}} if since else {}, {"_id": 0})
+        }
+        corrections = _corrections(current, wanted)
+        if corrections:
+            await self.hourly.bulk_write([
+                UpdateOne({"bucket": bucket, "page": page}, {"$set": values}, upsert=True)
+                for (bucket, page), values in corrections.items()
+            ], ordered=False)
+        return len(buckets)
+
+    async def compact(self, since: Optional[datetime], before: datetime) -> int:
+        """Fold hourly buckets in [since, before) into one daily bucket per page.
+
+        Daily buckets are written with $set from the hourly ones before those
+        are deleted, so a run interrupted in between is simply repeated.
+        """
+        bucket_range: Dict[str, Any] = {"$lt": before}
+        if since:
+            bucket_range["$gte"] = since
+        rows = await self.hourly.aggregate([
+            {"$match": {"bucket": bucket_range}},
+            {"$group": {
+                "_id": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$bucket"}}, "page": "$page"},
+                "page_views": {"$sum": "$page_views"},
+                "contact_submissions": {"$sum": "$contact_submissions"}
+            }}
+        ]).to_list(None)
+        if rows:
+            await self.daily.bulk_write([
+                UpdateOne(
+                    {"bucket": datetime.strptime(row["_id"]["day"], "%Y-%m-%d"), "page": row["_id"]["page"]},
+                    {"$set": {"page_views": row["page_views"], "contact_submissions": row["contact_submissions"]}},
+                    upsert=True
+                )
+                for row in rows
+            ], ordered=False)
+        return len(rows)
+
+    async def drop_hourly_before(self, before: datetime):
+        await self.hourly.delete_many({"bucket": {"$lt": before}})
+
+    async def time_series(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: str = "day",
+        split_by_page: bool = False,
+        page: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Sum hourly and compacted daily buckets in [start, end) into hour/day/week points.
+
+        A bucket counts whole if it overlaps the range, so a compacted day
+        that `start` falls in is included in full.
+        """
+        hourly_match, daily_match = bucket_matches(start, end, page)
+
+        group_key: Dict[str, Any] = {
+            "bucket": {"$dateTrunc": {"date": "$bucket", "unit": granularity, "startOfWeek": "monday"}}
+        }
+        if split_by_page:
+            group_key["page"] = "$page"
+
+        rows = await self.hourly.aggregate([
+            {"$match": hourly_match},
+            {"$unionWith": {"coll": self.daily.name, "pipeline": [{"$match": daily_match}]}},
+            {"$group": {
+                "_id": group_key,
+                "page_views": {"$sum": "$page_views"},
+                "contact_submissions": {"$sum": "$contact_submissions"}
+            }},
+            {"$sort": {"_id.bucket": 1, "_id.page": 1}}
+        ]).to_list(None)
+
+        return [
+            {
+                "bucket": row["_id"]["bucket"],
+                "page": row["_id"].get("page"),
+                "page_views": row["page_views"],
+                "contact_submissions": row["contact_submissions"]
+            }
+            for row in rows
+        ]
+
+    async def ensure_backfilled(self):
+        """Build the rollups from existing data the first time the app starts"""
+        if await self.collection.find_one({"_id": GLOBAL_ID}, {"_id": 1}) is None:
+            await self.reconcile()
@@ -1,23 +1,52 @@
 import jwt
 import os
+import sys
+import hmac
+import time
+import asyncio
+import bcrypt
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
 
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 JWT_SECRET = os.environ.get('JWT_SECRET')
 ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD')
+# bcrypt hash of the admin password; preferred over the plaintext ADMIN_PASSWORD
+ADMIN_PASSWORD_HASH = os.environ.get('ADMIN_PASSWORD_HASH')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 hours
 
+# bcrypt is CPU-bound (~250ms); run it off the event loop on a small, bounded pool
+HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', '2'))
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(HASH_WORKERS * 4)
+
+# Verified tokens, so repeated dashboard calls skip signature checks until expiry
+TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '128'))
+_token_cache: "OrderedDict[str, dict]" = OrderedDict()
+
+def _bcrypt_secret(password: str) -> bytes:
+    # bcrypt only uses the first 72 bytes; newer releases raise instead of truncating
+    return password.encode("utf-8")[:72]
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return bcrypt.checkpw(_bcrypt_secret(plain_password), hashed_password.encode("utf-8"))
+    except ValueError:
+        return False
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(_bcrypt_secret(password), bcrypt.gensalt()).decode("utf-8")
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bcrypt pool; excess logins queue instead of piling onto threads"""
+    async with _hash_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -27,22 +56,38 @@ def create_access_token(data: dict) -> str:
     return encoded_jwt
 
 def verify_token(token: str) -> dict:
+    cached = _token_cache.get(token)
+    if cached is not None:
+        if cached["exp"] > time.time():
+            _token_cache.move_to_end(token)
+            return cached
+        _token_cache.pop(token, None)
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token expired"
         )
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
 
-def authenticate_admin(password: str) -> bool:
-    return password == ADMIN_PASSWORD
+    if "exp" in payload:
+        _token_cache[token] = payload
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return payload
+
+async def authenticate_admin(password: str) -> bool:
+    if ADMIN_PASSWORD_HASH:
+        return await verify_password_async(password, ADMIN_PASSWORD_HASH)
+    if not ADMIN_PASSWORD:
+        return False
+    return hmac.compare_digest(password.encode("utf-8"), ADMIN_PASSWORD.encode("utf-8"))
 
 async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
@@ -54,4 +99,8 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
             detail="Invalid authentication credentials"
         )
     
-    return payload
\ No newline at end of file
+    return payload
+
+if __name__ == "__main__":
+    # python auth.py <password>  ->  value for ADMIN_PASSWORD_HASH
+    print(get_password_hash(sys.argv[1]))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Per-submission cost of the duplicate check.
+
+Fills the near-duplicate window with synthetic messages from a pool of
+senders, then times `SubmissionDeduplicator.check` (content hash, SimHash
+and window lookup) on fresh submissions from the same senders. Reports
+how many edited copies of stored messages it catches, how many unrelated
+messages from the same sender it wrongly merges (false positives), and
+how many copies sent by someone else it merges (must be none). With
+--check it exits non-zero when the median check exceeds the budget.
+
+    cd backend && python benchmarks/dedup.py --check
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Median check of one submission must stay under this many microseconds
+DEFAULT_BUDGET_US = 200
+
+def make_corpus(rng: random.Random, count: int, senders: int):
+    vocabulary = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randrange(2, 9))) for _ in range(3000)]
+    # Zipf-like word frequencies, as in real text
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return vocabulary, [
+        {
+            "email": f"sender{i % senders}@example.com",
+            "subject": " ".join(rng.choices(vocabulary, weights=weights, k=4)),
+            "message": " ".join(rng.choices(vocabulary, weights=weights, k=rng.randrange(15, 120))),
+        }
+        for i in range(count)
+    ]
+
+def edited_copy(rng: random.Random, vocabulary, contact):
+    """A resend by the same sender: a few words swapped, a sign-off added"""
+    words = contact["message"].split()
+    for _ in range(max(1, len(words) // 20)):
+        words[rng.randrange(len(words))] = rng.choice(vocabulary)
+    return dict(contact, message=" ".join(words) + " thanks")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--probes", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    # Ten messages per sender in the window: far more than a portfolio sees, so false positives show up
+    parser.add_argument("--senders", type=int, default=100)
+    parser.add_argument("--budget-us", type=float, default=float(os.environ.get('DEDUP_BUDGET_US', DEFAULT_BUDGET_US)))
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    from dedup import SubmissionDeduplicator
+
+    deduplicator = SubmissionDeduplicator(db=None)
+    rng = random.Random(args.seed)
+    vocabulary, corpus = make_corpus(rng, deduplicator.window_size + args.probes, args.senders)
+    stored, probes = corpus[:deduplicator.window_size], corpus[deduplicator.window_size:]
+    for i, contact in enumerate(stored):
+        deduplicator.remember(str(i), deduplicator.check(contact))
+
+    timings = []
+    false_positives = 0
+    for contact in probes:
+        started = time.perf_counter()
+        fingerprint = deduplicator.check(contact)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+        false_positives += fingerprint.duplicate_of is not None
+
+    sample = range(0, len(stored), max(1, len(stored) // args.probes))
+    copies = [(i, edited_copy(rng, vocabulary, stored[i])) for i in sample]
+    caught = sum(deduplicator.check(copy).duplicate_of == str(i) for i, copy in copies)
+    # The same edited text from someone else must not be merged
+    cross_sender = sum(deduplicator.check(dict(copy, email="other@example.com")).duplicate_of is not None for _, copy in copies)
+
+    median = statistics.median(timings)
+    print(f"window {len(deduplicator)} messages, max distance {deduplicator.max_distance} bits")
+    print(f"check: median {median:.1f} us, p95 {sorted(timings)[int(len(timings) * 0.95)]:.1f} us")
+    print(f"edited copies caught: {caught}/{len(sample)}, false positives: {false_positives}/{len(probes)}, "
+          f"other senders merged: {cross_sender}/{len(sample)}")
+    if args.check and median > args.budget_us:
+        print(f"Over the {args.budget_us:.0f} us budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Render-cost microbenchmark for the email templates.
+
+Compiles the templates once, as startup does, then renders every template
+with a typical contact submission and reports the cost per email. With
+--check it exits non-zero when any template exceeds the budget.
+
+    cd backend && python benchmarks/email_templates.py --check
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Median render cost per contact submission (all parts) must stay under this many microseconds
+DEFAULT_BUDGET_US = 200
+
+CONTACT = {
+    "name": "Alice <Example>",
+    "email": "alice@example.com",
+    "subject": "Azure data platform role",
+    "message": "Hi,\n\nWe are building a lakehouse on Azure & Databricks and would like to talk.\n" * 8,
+}
+
+# Templates rendered with something other than a single contact submission:
+# (context, submissions covered by one render), so the budget applies per submission
+CONTEXTS = {
+    "notification_digest": ({"messages": [CONTACT] * 10, "count": 10}, 10),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-us", type=float, default=float(os.environ.get('EMAIL_RENDER_BUDGET_US', DEFAULT_BUDGET_US)))
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    from email_templates import EmailTemplates
+
+    templates = EmailTemplates()
+    started = time.perf_counter()
+    templates.load()
+    print(f"Compiled {len(templates.names)} templates in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    failed = []
+    print(f"{'template':20} {'median us':>10} {'min us':>10} {'per submission':>15} {'bytes':>7}")
+    for name in templates.names:
+        context, submissions = CONTEXTS.get(name, (CONTACT, 1))
+        rendered = templates.render(name, context)
+        runs = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            for _ in range(args.iterations):
+                templates.render(name, context)
+            runs.append((time.perf_counter() - started) / args.iterations * 1_000_000)
+        size = len(rendered.subject) + len(rendered.html or "") + len(rendered.text or "")
+        median = statistics.median(runs)
+        per_submission = median / submissions
+        print(f"{name:20} {median:10.1f} {min(runs):10.1f} {per_submission:15.1f} {size:7}")
+        if per_submission > args.budget_us:
+            failed.append(name)
+
+    if args.check and failed:
+        print(f"Over the {args.budget_us:.0f} us budget: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Startup import-time benchmark for the backend.
+
+Runs `python -X importtime -c "import server"` several times in fresh
+processes, reports the median cumulative import time and the heaviest
+top-level imports, and with --check exits non-zero when the median exceeds
+the budget or a heavy optional dependency is imported at startup.
+
+    cd backend && python benchmarks/import_time.py --check
+
+tests/test_import_time.py enforces the same budget and forbidden imports
+in the test suite.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Median cold import of `server` must stay under this many milliseconds
+DEFAULT_BUDGET_MS = 1000
+
+# Heavy packages that may be used by individual features but never at import time
+FORBIDDEN_AT_STARTUP = {"pandas", "numpy", "boto3", "botocore", "jinja2", "brotli"}
+
+def measure_once(module: str) -> Tuple[float, Dict[str, float]]:
+    """Import `module` in a fresh interpreter; return (total ms, {top-level import: cumulative ms})"""
+    env = dict(os.environ)
+    # Import must not need real secrets; these only satisfy config lookups
+    env.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    env.setdefault('DB_NAME', 'import_benchmark')
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+    total_ms = 0.0
+    imports: Dict[str, float] = {}
+    children: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name_column = line[len("import time:"):].split("|")
+        name = name_column.strip()
+        # Nesting is shown as two spaces per level; children are listed before their parent
+        depth = (len(name_column) - len(name_column.lstrip()) - 1) // 2
+        if depth == 1:
+            children[name] = int(cumulative) / 1000
+        elif depth == 0:
+            if name == module:
+                total_ms = int(cumulative) / 1000
+                imports = children
+            children = {}
+    return total_ms, imports
+
+def loaded_modules(module: str) -> List[str]:
+    env = dict(os.environ)
+    env.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    env.setdefault('DB_NAME', 'import_benchmark')
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure backend import time")
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get('IMPORT_BUDGET_MS', DEFAULT_BUDGET_MS)))
+    parser.add_argument("--check", action="store_true", help="exit 1 if the budget is exceeded")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # The first run also compiles bytecode; it is not counted
+    measure_once(args.module)
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    median_ms = statistics.median(total for total, _ in runs)
+    heaviest = sorted(runs[-1][1].items(), key=lambda item: item[1], reverse=True)[:10]
+    forbidden = sorted({name.split(".")[0] for name in loaded_modules(args.module)} & FORBIDDEN_AT_STARTUP)
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    for name, ms in heaviest:
+        print(f"  {ms:8.1f} ms  {name}")
+    if forbidden:
+        print(f"Heavy packages imported at startup: {', '.join(forbidden)}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "module": args.module,
+                "median_ms": median_ms,
+                "runs_ms": [total for total, _ in runs],
+                "budget_ms": args.budget_ms,
+                "heaviest": dict(heaviest),
+                "forbidden_imports": forbidden,
+            }, f, indent=2)
+
+    if args.check and (median_ms > args.budget_ms or forbidden):
+        print("❌ Import-time budget exceeded")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
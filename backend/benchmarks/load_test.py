@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Offline load test and latency benchmark for the portfolio API.
+
+Drives a concurrent mixed workload (page views, contact submissions and
+admin dashboard polling) and reports per-endpoint throughput and
+p50/p95/p99 latency. Results are written as JSON so runs can be compared
+between commits with --compare.
+
+Targets:
+  in-process (default)  the ASGI app via httpx.ASGITransport, with a fake
+                        email provider and either an in-memory Mongo
+                        stand-in (--mongo memory, needs mongomock-motor)
+                        or a local mongod (--mongo-url)
+  --url URL             an already running server
+  --spawn-workers N     starts `uvicorn server:app --workers N` and
+                        benchmarks it, against --mongo-url or, without
+                        it, with an in-memory Mongo stand-in per worker
+
+Spawned workers with in-memory Mongo share no data, so comparing
+--spawn-workers 1 with N shows how the API's own CPU work spreads across
+processes, not how MongoDB copes with the extra connections.
+
+    cd backend && python benchmarks/load_test.py --duration 20 --concurrency 50
+    cd backend && python benchmarks/load_test.py --compare benchmarks/results/load-abc1234.json
+    cd backend && python benchmarks/load_test.py --spawn-workers 4 --concurrency 100
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# The workload comes from a handful of client IPs, so the public rate limits are lifted
+BENCHMARK_ENV = {
+    'DB_NAME': 'portfolio_benchmark',
+    'JWT_SECRET': 'benchmark-secret',
+    'ADMIN_PASSWORD': 'benchmark-password',
+    'ADMIN_EMAIL': 'admin@example.com',
+    'SENDINBLUE_API_KEY': 'benchmark-key',
+    'RATE_LIMIT_CONTACT': '1000000000/1',
+    'RATE_LIMIT_PAGE_VIEW': '1000000000/1',
+}
+
+# Relative weight of each operation in the mixed workload
+DEFAULT_MIX = {
+    "page_view": 70,
+    "contact": 5,
+    "dashboard_analytics": 10,
+    "dashboard_messages": 10,
+    "public_portfolio": 5,
+}
+
+PAGES = ["home", "about", "skills", "experience", "projects", "certifications", "contact"]
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+
+    def record(self, operation: str, seconds: float, status: int):
+        self.latencies.setdefault(operation, []).append(seconds)
+        counts = self.statuses.setdefault(operation, {})
+        counts[status] = counts.get(status, 0) + 1
+        if status >= 400:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        all_latencies: List[float] = []
+        for operation, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            all_latencies.extend(values)
+            endpoints[operation] = {
+                "requests": len(values),
+                "errors": self.errors.get(operation, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+                "statuses": {str(k): v for k, v in sorted(self.statuses[operation].items())},
+            }
+        ordered = sorted(all_latencies)
+        return {
+            "total": {
+                "requests": len(ordered),
+                "errors": sum(self.errors.values()),
+                "rps": round(len(ordered) / elapsed, 2),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+            },
+            "endpoints": endpoints,
+        }
+
+def build_operations(client, admin_headers: Dict[str, str], rng: random.Random) -> Dict[str, Callable[[], Awaitable[Any]]]:
+    async def page_view():
+        return await client.post("/api/track/page-view", params={"page": rng.choice(PAGES)})
+
+    async def contact():
+        n = rng.randrange(1_000_000)
+        return await client.post("/api/contact", json={
+            "name": f"Load Test {n}",
+            "email": f"load{n}@example.com",
+            "subject": f"Benchmark enquiry {n}",
+            "message": f"Message body {n} " + "lorem ipsum " * rng.randrange(1, 40),
+        })
+
+    async def dashboard_analytics():
+        return await client.get("/api/admin/analytics", headers=admin_headers)
+
+    async def dashboard_messages():
+        return await client.get("/api/admin/contact-messages", params={"limit": 10}, headers=admin_headers)
+
+    async def public_portfolio():
+        return await client.get("/api/portfolio")
+
+    return {
+        "page_view": page_view,
+        "contact": contact,
+        "dashboard_analytics": dashboard_analytics,
+        "dashboard_messages": dashboard_messages,
+        "public_portfolio": public_portfolio,
+    }
+
+async def run_workload(client, admin_headers, mix: Dict[str, int], concurrency: int, duration: float, seed: int) -> Dict[str, Any]:
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+
+    async def user(user_id: int):
+        rng = random.Random(seed + user_id)
+        operations = build_operations(client, admin_headers, rng)
+        while time.perf_counter() < deadline:
+            operation = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await operations[operation]()
+                status = response.status_code
+            except Exception:
+                status = 599
+            recorder.record(operation, time.perf_counter() - started, status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return recorder.summary(time.perf_counter() - started)
+
+def fake_email_transport(latency_ms: float):
+    """Sendinblue stand-in: accepts every email after `latency_ms`"""
+    import httpx
+
+    async def handler(request):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return httpx.Response(201, json={"messageId": "<benchmark@local>"})
+
+    return httpx.MockTransport(handler)
+
+async def run_in_process(args) -> Dict[str, Any]:
+    import httpx
+
+    for key, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(key, value)
+    if args.mongo_url:
+        os.environ['MONGO_URL'] = args.mongo_url
+    else:
+        os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+    import server
+    from auth import create_access_token
+    from email_service import email_service
+
+    # The benchmark client and the fake provider both use httpx; their request logs are noise here
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if not args.mongo_url:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--mongo memory needs mongomock-motor (pip install mongomock-motor), or pass --mongo-url")
+        server.db.connect(client=AsyncMongoMockClient())
+    email_service.transport = fake_email_transport(args.email_latency_ms)
+
+    await server.startup()
+    try:
+        if args.mongo_url:
+            # Start every run from empty collections on the benchmark database
+            for name in await server.db.list_collection_names():
+                await server.db[name].delete_many({})
+            await server.analytics_rollups.reconcile()
+        transport = httpx.ASGITransport(app=server.app, client=("198.51.100.7", 40000))
+        admin_headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            return await run_workload(client, admin_headers, args.mix, args.concurrency, args.duration, args.seed)
+    finally:
+        await server.shutdown()
+
+async def run_against_url(args, url: str) -> Dict[str, Any]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        login = await client.post("/api/admin/login", json={"password": os.environ.get('ADMIN_PASSWORD', BENCHMARK_ENV['ADMIN_PASSWORD'])})
+        login.raise_for_status()
+        admin_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        return await run_workload(client, admin_headers, args.mix, args.concurrency, args.duration, args.seed)
+
+def memory_app():
+    """uvicorn app factory for spawned workers without --mongo-url: a private in-memory Mongo per worker"""
+    import server
+    from email_service import email_service
+    from mongomock_motor import AsyncMongoMockClient
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server.db.connect(client=AsyncMongoMockClient())
+    email_service.transport = fake_email_transport(float(os.environ['BENCHMARK_EMAIL_LATENCY_MS']))
+    return server.app
+
+def spawn_server(workers: int, port: int, mongo_url: Optional[str], email_latency_ms: float) -> subprocess.Popen:
+    import httpx
+
+    # WEB_CONCURRENCY as in production, so per-worker defaults (rate-limit backend) match
+    env = dict(os.environ, **BENCHMARK_ENV, WEB_CONCURRENCY=str(workers))
+    if mongo_url:
+        env['MONGO_URL'] = mongo_url
+        app = ["server:app"]
+    else:
+        env.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+        env['BENCHMARK_EMAIL_LATENCY_MS'] = str(email_latency_ms)
+        app = ["--factory", "benchmarks.load_test:memory_app"]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *app, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    for _ in range(100):
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/").status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("uvicorn did not become ready")
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """Print per-endpoint deltas; return False if any p95 regressed beyond max_regression"""
+    ok = True
+    print(f"\nCompared with {baseline.get('revision', '?')} ({baseline.get('created_at', '?')}):")
+    for operation, stats in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(operation)
+        if not before:
+            continue
+        rps_delta = (stats["rps"] - before["rps"]) / before["rps"] if before["rps"] else 0
+        p95_delta = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0
+        flag = ""
+        if p95_delta > max_regression:
+            flag = "  ❌ p95 regression"
+            ok = False
+        print(f"  {operation:22s} rps {rps_delta:+7.1%}  p95 {p95_delta:+7.1%}{flag}")
+    return ok
+
+def print_report(result: Dict[str, Any]):
+    print(f"\n{'endpoint':22s} {'reqs':>8s} {'err':>6s} {'rps':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for operation, stats in rows:
+        print(f"{operation:22s} {stats['requests']:8d} {stats['errors']:6d} {stats['rps']:9.1f} "
+              f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}")
+
+def parse_mix(spec: Optional[str]) -> Dict[str, int]:
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {name: 0 for name in DEFAULT_MIX}
+    for part in spec.split(","):
+        name, weight = part.split("=")
+        if name not in mix:
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name] = int(weight)
+    return mix
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Portfolio API load test")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--mix", help="operation weights, e.g. page_view=80,contact=5,dashboard_analytics=15")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo", choices=["memory"], default="memory", help="in-process Mongo stand-in")
+    parser.add_argument("--mongo-url", help="use a local mongod instead of the in-memory stand-in")
+    parser.add_argument("--email-latency-ms", type=float, default=150, help="fake email provider latency")
+    parser.add_argument("--url", help="benchmark an already running server")
+    parser.add_argument("--spawn-workers", type=int, help="start uvicorn with this many workers and benchmark it")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="result file (default benchmarks/results/load-<revision>.json)")
+    parser.add_argument("--compare", help="baseline result file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase for --compare")
+    args = parser.parse_args()
+    args.mix = parse_mix(args.mix)
+
+    if args.spawn_workers:
+        process = spawn_server(args.spawn_workers, args.port, args.mongo_url, args.email_latency_ms)
+        try:
+            result = asyncio.run(run_against_url(args, f"http://127.0.0.1:{args.port}"))
+        finally:
+            process.terminate()
+            process.wait()
+        target = f"uvicorn --workers {args.spawn_workers} (" + ("mongod" if args.mongo_url else "in-memory mongo per worker") + ")"
+    elif args.url:
+        result = asyncio.run(run_against_url(args, args.url))
+        target = args.url
+    else:
+        result = asyncio.run(run_in_process(args))
+        target = "in-process (" + ("mongod" if args.mongo_url else "in-memory mongo") + ")"
+
+    revision = git_revision()
+    result.update({
+        "revision": revision,
+        "created_at": datetime.utcnow().isoformat(),
+        "target": target,
+        "config": {
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "seed": args.seed,
+            "email_latency_ms": args.email_latency_ms,
+            "workers": args.spawn_workers,
+        },
+    })
+
+    print(f"Target: {target}, {args.concurrency} users for {args.duration:.0f}s")
+    print_report(result)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load-{revision}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if not compare(result, baseline, args.max_regression):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the admin message search.
+
+Seeds a scratch database on a real MongoDB (text search needs the server;
+there is no in-memory stand-in for it) with synthetic contact messages,
+creates the production indexes and times a mix of searches through
+ContactMessageSearch. With --check it exits non-zero when any query's p95
+exceeds the budget.
+
+    cd backend && python benchmarks/search.py --mongo-url mongodb://localhost:27017 --messages 100000 --check
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# p95 of every query in the mix must stay under this many milliseconds
+DEFAULT_BUDGET_MS = 20
+
+WORDS = (
+    "azure data pipeline spark databricks synapse lakehouse freelance contract project "
+    "interview role opportunity consulting migration warehouse etl python kafka streaming "
+    "dashboard powerbi budget timeline proposal meeting collaboration startup analytics"
+).split()
+FIRST_NAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy"]
+
+QUERIES = [
+    ("rare term", {"q": "lakehouse migration"}),
+    ("common term", {"q": "project"}),
+    ("term + unread", {"q": "spark", "read": False}),
+    ("term + date range", {"q": "kafka", "after": datetime.utcnow() - timedelta(days=30)}),
+    ("email prefix", {"email_prefix": "carol"}),
+    ("email prefix + term", {"q": "proposal", "email_prefix": "grace"}),
+]
+
+def synthetic_message(rng: random.Random, now: datetime) -> Dict[str, Any]:
+    first = rng.choice(FIRST_NAMES)
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"{first.title()} {rng.choice(WORDS).title()}",
+        "email": f"{first}.{rng.randrange(10_000)}@example.com",
+        "subject": " ".join(rng.choices(WORDS, k=4)),
+        "message": " ".join(rng.choices(WORDS, k=rng.randrange(20, 120))),
+        "timestamp": now - timedelta(minutes=rng.randrange(60 * 24 * 365)),
+        "read": rng.random() < 0.7,
+        "replied": rng.random() < 0.3,
+        "archived": False,
+    }
+
+async def seed(db, count: int, seed_value: int):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    await db.contact_messages.delete_many({})
+    for start in range(0, count, 5000):
+        batch = [synthetic_message(rng, now) for _ in range(min(5000, count - start))]
+        await db.contact_messages.insert_many(batch, ordered=False)
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+async def run(args) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from indexes import ensure_indexes
+    from search import ContactMessageSearch
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.db_name]
+    try:
+        if not args.skip_seed:
+            print(f"Seeding {args.messages} messages into {args.db_name}...")
+            await seed(db, args.messages, args.seed)
+        await ensure_indexes(db)
+
+        search = ContactMessageSearch(db)
+        failed = []
+        print(f"{'query':24} {'p50 ms':>8} {'p95 ms':>8} {'hits':>6}")
+        for name, params in QUERIES:
+            timings = []
+            hits = 0
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                messages, cursor = await search.search(limit=20, **params)
+                timings.append((time.perf_counter() - started) * 1000)
+                hits = len(messages)
+            # Second page through the cursor, which is what pagination costs
+            if cursor:
+                started = time.perf_counter()
+                await search.search(limit=20, cursor=cursor, **params)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = percentile(timings, 95)
+            print(f"{name:24} {percentile(timings, 50):8.2f} {p95:8.2f} {hits:6}")
+            if p95 > args.budget_ms:
+                failed.append(name)
+
+        if args.check and failed:
+            print(f"Over the {args.budget_ms} ms p95 budget: {', '.join(failed)}")
+            return 1
+        return 0
+    finally:
+        if args.drop:
+            await client.drop_database(args.db_name)
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    parser.add_argument("--db-name", default="portfolio_search_benchmark")
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse messages from a previous run")
+    parser.add_argument("--drop", action="store_true", help="drop the scratch database afterwards")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get('SEARCH_BUDGET_MS', DEFAULT_BUDGET_MS)))
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import os
+import time
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+
+from metrics import email_circuit_transitions_total
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric values for the state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+class CircuitBreaker:
+    """Failure and latency guard for one downstream API, local to this worker.
+
+    Closed: calls go through. `failure_threshold` consecutive failures
+    (errors, 5xx/429 responses or timeouts) open the circuit. Open: calls
+    are refused for `open_seconds`, after which the circuit is half-open and
+    lets one probe through at a time; `probe_successes` good probes close it
+    again and a failed probe reopens it.
+
+    The call timeout follows the latency of recent successful calls: their
+    p99 times `timeout_multiplier`, kept within [min_timeout, max_timeout].
+    A latency spike shows up as timeouts and so counts towards opening.
+    """
+
+    def __init__(self, name: str, max_timeout: float):
+        self.name = name
+        self.failure_threshold = int(os.environ.get('EMAIL_BREAKER_FAILURES', '5'))
+        self.open_seconds = float(os.environ.get('EMAIL_BREAKER_OPEN_SECONDS', '30'))
+        self.probe_successes = int(os.environ.get('EMAIL_BREAKER_PROBES', '2'))
+        self.max_timeout = max_timeout
+        self.min_timeout = float(os.environ.get('EMAIL_MIN_TIMEOUT_SECONDS', '2'))
+        self.timeout_multiplier = float(os.environ.get('EMAIL_TIMEOUT_MULTIPLIER', '3'))
+        self.min_samples = int(os.environ.get('EMAIL_TIMEOUT_MIN_SAMPLES', '20'))
+        self._latencies: deque = deque(maxlen=int(os.environ.get('EMAIL_TIMEOUT_WINDOW', '200')))
+        self._timeout = max_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._successes = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    @property
+    def timeout(self) -> float:
+        return self._timeout
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a probe through; 0 otherwise"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def _transition(self, state: str):
+        if state == OPEN:
+            logger.warning(f"Circuit for {self.name} is now open ({self._last_error})")
+        else:
+            logger.info(f"Circuit for {self.name} is now {state}")
+        self._state = state
+        self._successes = 0
+        self._probe_in_flight = False
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        email_circuit_transitions_total.inc(state)
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError; every admitted call must be followed by a record_*"""
+        state = self.state
+        if state == OPEN:
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        if state == HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError(f"{self.name} circuit is half-open and already probing")
+            self._probe_in_flight = True
+
+    def record_success(self, latency: float):
+        self._latencies.append(latency)
+        if len(self._latencies) >= self.min_samples:
+            ordered = sorted(self._latencies)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            self._timeout = min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+        self._failures = 0
+        if self._state == HALF_OPEN:
+            self._probe_in_flight = False
+            self._successes += 1
+            if self._successes >= self.probe_successes:
+                self._transition(CLOSED)
+
+    def record_cancelled(self):
+        """The admitted call was cancelled before it completed; says nothing about the provider"""
+        self._probe_in_flight = False
+
+    def record_failure(self, error: str):
+        self._last_error = error
+        if self._state == HALF_OPEN:
+            self._transition(OPEN)
+            return
+        self._failures += 1
+        if self._state == CLOSED and self._failures >= self.failure_threshold:
+            self._failures = 0
+            self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "retry_in_seconds": round(self.retry_in(), 3),
+            "consecutive_failures": self._failures,
+            "timeout_seconds": round(self._timeout, 3),
+            "latency_samples": len(self._latencies),
+            "last_error": self._last_error,
+        }
@@ -0,0 +1,59 @@
+import os
+import logging
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from metrics import MongoCommandListener
+
+logger = logging.getLogger(__name__)
+
+class Database:
+    """Per-process Motor client, opened and closed by the app lifespan.
+
+    Attribute and item access are forwarded to the Motor database, so
+    `db.contact_messages` works as before; services keep a reference to this
+    object and resolve collections when they run, not at import time. The
+    client is created on first use if the lifespan has not opened it yet.
+    """
+
+    def __init__(self):
+        self.client: Optional[AsyncIOMotorClient] = None
+        self._database: Optional[AsyncIOMotorDatabase] = None
+
+    def connect(self, client: Optional[AsyncIOMotorClient] = None):
+        """Open the Motor client; `client` substitutes a ready-made one (benchmarks, local stand-ins)"""
+        if self.client is not None:
+            return
+        if client is not None:
+            self.client = client
+            self._database = client[os.environ['DB_NAME']]
+            return
+        max_pool_size = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+        self.client = AsyncIOMotorClient(
+            os.environ['MONGO_URL'],
+            maxPoolSize=max_pool_size,
+            minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+            maxIdleTimeMS=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000')),
+            event_listeners=[MongoCommandListener()],
+        )
+        self._database = self.client[os.environ['DB_NAME']]
+        logger.info(f"MongoDB client created (maxPoolSize={max_pool_size})")
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+            self._database = None
+
+    @property
+    def database(self) -> AsyncIOMotorDatabase:
+        if self._database is None:
+            self.connect()
+        return self._database
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+    def __getitem__(self, name):
+        return self.database[name]
@@ -0,0 +1,150 @@
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple, Awaitable
+
+import pymongo
+from starlette.routing import Match
+
+from metrics import request_budget_overruns_total, deferred_steps_total
+
+logger = logging.getLogger(__name__)
+
+# Absolute time.monotonic() by which the current request must have responded
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+# Budgets for routes that need one out of the box; REQUEST_BUDGETS overrides them
+ROUTE_BUDGET_DEFAULTS = {
+    ("POST", "/api/contact"): 2.0,
+}
+
+def parse_budgets(spec: str) -> Dict[Tuple[str, str], float]:
+    """"POST /api/contact=2,GET /api/portfolio=0.5" -> {(method, route template): seconds}"""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route, seconds = item.rsplit("=", 1)
+        method, path = route.split(None, 1)
+        budgets[(method.upper(), path.strip())] = float(seconds)
+    return budgets
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None outside a budgeted request"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def timeout_within(ceiling: float) -> float:
+    """`ceiling`, shortened to what is left of the request budget; for HTTP client timeouts"""
+    left = remaining()
+    if left is None:
+        return ceiling
+    return max(0.001, min(ceiling, left))
+
+# Kept back from the budget for building and sending the response once the steps are cut off
+RESPONSE_RESERVE_SECONDS = float(os.environ.get('REQUEST_BUDGET_RESERVE_SECONDS', '0.05'))
+
+_background: set = set()
+
+def _report_background(name: str, task: asyncio.Task):
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Deferred step {name} failed: {str(task.exception())}")
+
+async def finish_deferred(timeout: float = 10.0):
+    """Give steps still running in the background a chance to finish; called on shutdown"""
+    if _background:
+        await asyncio.wait(list(_background), timeout=timeout)
+
+async def run_within_budget(steps: Dict[str, Awaitable[Any]]) -> Dict[str, Any]:
+    """Run independent best-effort steps concurrently; whatever outlives the budget finishes in the background.
+
+    The steps run outside the request deadline, so a deferred step is not
+    cut short by it. Results are returned for the steps that finished in
+    time. A failed step is logged and left out: by the time these run the
+    request has done its essential work, so they never fail it.
+    """
+    # A fresh context: no request deadline, no Mongo timeout, no profile
+    tasks = {name: asyncio.create_task(step, context=contextvars.Context()) for name, step in steps.items()}
+    left = remaining()
+    wait_for = max(0.0, left - RESPONSE_RESERVE_SECONDS) if left is not None else None
+    done, pending = await asyncio.wait(tasks.values(), timeout=wait_for)
+    for name, task in tasks.items():
+        if task in pending:
+            deferred_steps_total.inc(name)
+            logger.warning(f"Request budget exhausted; {name} continues in the background")
+            _background.add(task)
+            task.add_done_callback(lambda task, name=name: _report_background(name, task))
+    results = {}
+    for name, task in tasks.items():
+        if task in done:
+            # Every finished task's exception is read, so none is reported as never retrieved
+            if task.exception() is not None:
+                logger.error(f"Step {name} failed: {str(task.exception())}")
+            else:
+                results[name] = task.result()
+    return results
+
+class DeadlineMiddleware:
+    """Gives each request a deadline from its route's budget.
+
+    The deadline is visible through `remaining()` and is applied to every
+    MongoDB operation the request makes via `pymongo.timeout`, which sends
+    it as maxTimeMS and bounds connection checkout; outbound HTTP calls
+    shorten their timeout to it through `timeout_within`. Requests that respond
+    after their deadline are counted per route template. Routes without a
+    budget (including streamed exports unless configured) run unbounded.
+    """
+
+    def __init__(self, app, routes: List[Any]):
+        self.app = app
+        self.routes = routes
+        budgets = {**ROUTE_BUDGET_DEFAULTS, **parse_budgets(os.environ.get('REQUEST_BUDGETS', ''))}
+        self.budgets = {key: seconds for key, seconds in budgets.items() if seconds > 0}
+        self.default_budget = float(os.environ.get('DEFAULT_REQUEST_BUDGET_SECONDS', '0'))
+        self._budgeted_routes: Optional[List[Tuple[Any, float]]] = None
+
+    def _resolve_routes(self) -> List[Tuple[Any, float]]:
+        # Resolved on the first request, once every router has been included
+        resolved = []
+        for route in self.routes:
+            for method in getattr(route, "methods", None) or ():
+                budget = self.budgets.get((method, getattr(route, "path", None)))
+                if budget is not None:
+                    resolved.append((route, budget))
+                    break
+        return resolved
+
+    def _budget(self, scope) -> float:
+        if self._budgeted_routes is None:
+            self._budgeted_routes = self._resolve_routes()
+        for route, budget in self._budgeted_routes:
+            if route.matches(scope)[0] == Match.FULL:
+                return budget
+        return self.default_budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = self._budget(scope)
+        if budget <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        token = current_deadline.set(started + budget)
+        try:
+            with pymongo.timeout(budget):
+                await self.app(scope, receive, send)
+        finally:
+            current_deadline.reset(token)
+            elapsed = time.monotonic() - started
+            if elapsed > budget:
+                route = scope.get("route")
+                route_path = route.path if route is not None else "unmatched"
+                request_budget_overruns_total.inc(scope["method"], route_path)
+                logger.warning(f"{scope['method']} {route_path} took {elapsed:.3f}s, over its {budget:.3f}s budget")
@@ -0,0 +1,235 @@
+import os
+import time
+import hashlib
+import logging
+import string
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+FINGERPRINT_MASK = (1 << FINGERPRINT_BITS) - 1
+
+PUNCTUATION = str.maketrans({char: " " for char in string.punctuation})
+
+def _add(planes: List[int], value: int, k: int):
+    """Add `value` at weight 2**k to bit-sliced counters, rippling the carry upwards"""
+    while value:
+        if k == len(planes):
+            planes.append(value)
+            return
+        plane = planes[k]
+        planes[k] = plane ^ value
+        value &= plane
+        k += 1
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+def content_hash(contact: Dict[str, Any]) -> str:
+    """Exact fingerprint: same sender, subject and message up to case and whitespace"""
+    key = "\x00".join(normalize(contact[field]) for field in ("email", "subject", "message"))
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+class Fingerprint(NamedTuple):
+    content_hash: str
+    sender: str
+    simhash: Optional[int]
+    duplicate_of: Optional[str]
+    # True when duplicate_of has the same content hash, False for a near match
+    exact: bool = False
+
+class _Entry(NamedTuple):
+    message_id: str
+    sender: str
+    content_hash: str
+    simhash: Optional[int]
+    seen_at: float
+
+class SubmissionDeduplicator:
+    """Flags contact submissions that repeat a recent one.
+
+    Exact repeats (double clicks, client retries) share a content hash. They
+    are looked up first in the recent window and, across workers, caught by
+    the unique index on `contact_messages.dedup_key`, the content hash within
+    the current DEDUP_WINDOW_SECONDS period. Near repeats (a
+    resend with a typo fixed or a line added) are found by SimHash over the
+    subject and message word pairs: a 64-bit fingerprint where similar texts
+    differ in few bits. Only messages from the same sender (normalized
+    email) are compared, so two people sending similar templated messages
+    are never merged into one.
+
+    Recent messages are kept per worker in a window bounded by
+    DEDUP_WINDOW_SIZE and DEDUP_WINDOW_SECONDS. Fingerprints are indexed by
+    sender and `max_distance + 1` bands, so a lookup is a few dict probes:
+    two fingerprints within that Hamming distance share at least one band
+    exactly. Texts shorter than DEDUP_MIN_WORDS words skip the near check;
+    short messages are too alike by chance.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.window_size = int(os.environ.get('DEDUP_WINDOW_SIZE', '1000'))
+        self.window_seconds = float(os.environ.get('DEDUP_WINDOW_SECONDS', '86400'))
+        self.max_distance = int(os.environ.get('DEDUP_MAX_DISTANCE', '12'))
+        self.min_words = int(os.environ.get('DEDUP_MIN_WORDS', '12'))
+        self.bands = self.max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self._window: deque = deque()
+        self._hashes: Dict[str, str] = {}
+        self._buckets: List[Dict[tuple, deque]] = [{} for _ in range(self.bands)]
+
+    @property
+    def collection(self):
+        return self.db.contact_messages
+
+    def __len__(self) -> int:
+        return len(self._window)
+
+    def simhash(self, text: str) -> Optional[int]:
+        """64-bit SimHash of the word pairs in `text`, or None when it has too few words.
+
+        Uses Python's string hash, which is salted per process: fingerprints
+        are only ever compared within the worker that computed them.
+        """
+        words = text.casefold().translate(PUNCTUATION).split()
+        if len(words) < self.min_words:
+            return None
+        # Word pairs rather than single words, so word order counts and common words weigh less
+        shingles = set(map(" ".join, zip(words, words[1:])))
+        # The 64 per-bit counters are kept bit-sliced (planes[k] holds bit k of all of them) and
+        # fed eight hashes at a time through a carry-save adder tree, so most work is a few
+        # 64-bit ANDs and XORs per shingle
+        hashes = [hash(shingle) & FINGERPRINT_MASK for shingle in shingles]
+        hashes += [0] * (-len(hashes) % 8)
+        planes = [0, 0, 0, 0]
+        ones = twos = fours = 0
+        for i in range(0, len(hashes), 8):
+            h0, h1, h2, h3, h4, h5, h6, h7 = hashes[i:i + 8]
+            # Seven carry-save adds, carry = a&b | (a^b)&c and sum = a^b^c, written out inline
+            # because this loop is the hot path
+            u = ones ^ h0
+            twos_a = (ones & h0) | (u & h1)
+            ones = u ^ h1
+            u = ones ^ h2
+            twos_b = (ones & h2) | (u & h3)
+            ones = u ^ h3
+            u = twos ^ twos_a
+            fours_a = (twos & twos_a) | (u & twos_b)
+            twos = u ^ twos_b
+            u = ones ^ h4
+            twos_a = (ones & h4) | (u & h5)
+            ones = u ^ h5
+            u = ones ^ h6
+            twos_b = (ones & h6) | (u & h7)
+            ones = u ^ h7
+            u = twos ^ twos_a
+            fours_b = (twos & twos_a) | (u & twos_b)
+            twos = u ^ twos_b
+            u = fours ^ fours_a
+            eights = (fours & fours_a) | (u & fours_b)
+            fours = u ^ fours_b
+            _add(planes, eights, 3)
+        _add(planes, ones, 0)
+        _add(planes, twos, 1)
+        _add(planes, fours, 2)
+        # A fingerprint bit is set when more than half of the shingles set it: compare every
+        # counter with the threshold at once, from the most significant plane down
+        threshold = len(shingles) // 2
+        above, equal = 0, FINGERPRINT_MASK
+        for k in range(max(len(planes), threshold.bit_length()) - 1, -1, -1):
+            plane = planes[k] if k < len(planes) else 0
+            if (threshold >> k) & 1:
+                equal &= plane
+            else:
+                above |= equal & plane
+                equal &= ~plane
+        return above
+
+    def _keys(self, sender: str, fingerprint: int):
+        """Bucket key per band: the sender and that band's bits of the fingerprint"""
+        mask = (1 << self.band_bits) - 1
+        return [(sender, (fingerprint >> (band * self.band_bits)) & mask) for band in range(self.bands)]
+
+    def _expire(self, now: float):
+        while self._window and (len(self._window) > self.window_size or now - self._window[0].seen_at > self.window_seconds):
+            entry = self._window.popleft()
+            if self._hashes.get(entry.content_hash) == entry.message_id:
+                del self._hashes[entry.content_hash]
+            if entry.simhash is None:
+                continue
+            for band, key in enumerate(self._keys(entry.sender, entry.simhash)):
+                bucket = self._buckets[band][key]
+                # Buckets fill in window order, so the expiring entry is at the front
+                bucket.popleft()
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def nearest(self, sender: str, fingerprint: int) -> Optional[str]:
+        """Id of the closest recent message from `sender` within `max_distance` bits, if any"""
+        best, best_distance = None, self.max_distance + 1
+        for band, key in enumerate(self._keys(sender, fingerprint)):
+            for entry in self._buckets[band].get(key, ()):
+                distance = (entry.simhash ^ fingerprint).bit_count()
+                if distance < best_distance:
+                    best, best_distance = entry.message_id, distance
+        return best
+
+    def check(self, contact: Dict[str, Any]) -> Fingerprint:
+        """Fingerprint a submission and look it up in the recent window, exact match first"""
+        self._expire(time.monotonic())
+        exact_hash, sender = content_hash(contact), normalize(contact["email"])
+        if exact_hash in self._hashes:
+            return Fingerprint(exact_hash, sender, None, self._hashes[exact_hash], exact=True)
+        fingerprint = self.simhash(f"{contact['subject']} {contact['message']}")
+        duplicate_of = self.nearest(sender, fingerprint) if fingerprint is not None and self._window else None
+        return Fingerprint(exact_hash, sender, fingerprint, duplicate_of)
+
+    def remember(self, message_id: str, fingerprint: Fingerprint, seen_at: Optional[float] = None):
+        """Add a stored message to the window"""
+        entry = _Entry(
+            message_id, fingerprint.sender, fingerprint.content_hash, fingerprint.simhash,
+            time.monotonic() if seen_at is None else seen_at
+        )
+        self._window.append(entry)
+        self._hashes[entry.content_hash] = message_id
+        if entry.simhash is not None:
+            for band, key in enumerate(self._keys(entry.sender, entry.simhash)):
+                self._buckets[band].setdefault(key, deque()).append(entry)
+        self._expire(entry.seen_at)
+
+    def window_key(self, fingerprint: Fingerprint, now: Optional[float] = None) -> str:
+        """Stored key for the unique index: the content hash within the current window period.
+
+        Uniqueness then lasts about one window, like the in-memory lookup, so
+        the same message sent again a month later is stored and notified as
+        new. Two workers can both store a repeat that straddles a period
+        boundary; each worker's own window still catches it.
+        """
+        period = int((time.time() if now is None else now) // self.window_seconds)
+        return f"{fingerprint.content_hash}:{period}"
+
+    async def warm(self):
+        """Fill the window from the most recent stored messages, so a restart does not forget them"""
+        now_wall, now = datetime.utcnow(), time.monotonic()
+        recent = await self.collection.find(
+            {}, {"_id": 0, "id": 1, "email": 1, "subject": 1, "message": 1, "timestamp": 1}
+        ).sort([("timestamp", -1), ("id", -1)]).limit(self.window_size).to_list(self.window_size)
+        for doc in reversed(recent):
+            age = (now_wall - doc["timestamp"]).total_seconds()
+            if age <= self.window_seconds:
+                fingerprint = Fingerprint(
+                    content_hash(doc), normalize(doc["email"]), self.simhash(f"{doc['subject']} {doc['message']}"), None
+                )
+                self.remember(doc["id"], fingerprint, now - age)
+        logger.info(f"Duplicate window holds {len(self._window)} recent messages")
+
+    async def merge(self, query: Dict[str, Any]) -> bool:
+        """Count a repeat against the stored original; False if the original is gone"""
+        result = await self.collection.update_one(
+            query,
+            {"$inc": {"duplicate_count": 1}, "$set": {"last_duplicate_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
@@ -1,19 +1,43 @@
 import os
-import requests
-from typing import Dict, Any
+import time
+import asyncio
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
 import logging
 
+from metrics import email_send_duration_seconds, email_sends_total
+from profiler import await_span
+from email_templates import email_templates, RenderedEmail, BRAND
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from deadline import timeout_within
+
+if TYPE_CHECKING:
+    import httpx
+
 logger = logging.getLogger(__name__)
 
+class EmailRejectedError(Exception):
+    """The provider refused a batch request outright (a 4xx other than 429); retrying it as is cannot help"""
+
+def _rejected(status_code: int) -> bool:
+    return 400 <= status_code < 500 and status_code != 429
+
 class EmailService:
     def __init__(self):
         self.api_key = os.environ.get('SENDINBLUE_API_KEY')
         self.base_url = 'https://api.sendinblue.com/v3'
         self.admin_email = os.environ.get('ADMIN_EMAIL')
+        self.timeout = float(os.environ.get('EMAIL_TIMEOUT_SECONDS', '10'))
+        self.max_connections = int(os.environ.get('EMAIL_MAX_CONNECTIONS', '10'))
+        self.max_concurrency = int(os.environ.get('EMAIL_MAX_CONCURRENCY', '5'))
+        self.transport: Optional["httpx.AsyncBaseTransport"] = None
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # EMAIL_TIMEOUT_SECONDS is the ceiling; the breaker lowers the per-call timeout as it learns the latency
+        self.breaker = CircuitBreaker("sendinblue", max_timeout=self.timeout)
         
         if not self.api_key:
+            # Only sending needs the key; a missing secret must not stop the API from starting
             logger.error("SENDINBLUE_API_KEY not found in environment variables")
-            raise ValueError("Email service API key not configured")
     
     def _get_headers(self) -> Dict[str, str]:
         return {
@@ -22,45 +46,101 @@ class EmailService:
             'api-key': self.api_key
         }
     
+    def _get_client(self) -> "httpx.AsyncClient":
+        """Return the shared keep-alive client, creating it on first use"""
+        if not self.api_key:
+            raise ValueError("Email service API key not configured")
+        if self._client is None or self._client.is_closed:
+            # Imported here so the HTTP stack only loads once an email is actually sent
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._get_headers(),
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                transport=self.transport
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+    
+    async def _post_email(self, email_data: Dict[str, Any], kind: str) -> "httpx.Response":
+        """POST to the transactional email API over the shared connection pool.
+
+        Raises CircuitOpenError without calling the API while the provider's
+        circuit is open. Inside a budgeted request the timeout is cut to the
+        time left; a send that runs out of budget rather than the provider's
+        timeout is not held against the circuit.
+        """
+        client = self._get_client()
+        async with self._semaphore:
+            self.breaker.before_call()
+            started = time.perf_counter()
+            timeout = timeout_within(self.breaker.timeout)
+            try:
+                with await_span("http", f"sendinblue {kind}"):
+                    response = await client.post("/smtp/email", json=email_data, timeout=timeout)
+            except asyncio.CancelledError:
+                self.breaker.record_cancelled()
+                raise
+            except Exception as e:
+                import httpx
+
+                email_sends_total.inc(kind, "error")
+                if timeout < self.breaker.timeout and isinstance(e, httpx.TimeoutException):
+                    self.breaker.record_cancelled()
+                else:
+                    self.breaker.record_failure(f"{type(e).__name__}: {e}")
+                raise
+            finally:
+                email_send_duration_seconds.observe(time.perf_counter() - started, kind)
+        if response.status_code >= 500 or response.status_code == 429:
+            # Provider trouble; other 4xx responses are about the request and leave the circuit alone
+            self.breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            self.breaker.record_success(time.perf_counter() - started)
+        email_sends_total.inc(kind, "sent" if response.status_code == 201 else "rejected")
+        return response
+    
+    @staticmethod
+    def _content(email: RenderedEmail) -> Dict[str, str]:
+        """Subject and body fields of the send request for a rendered template"""
+        content = {"subject": email.subject}
+        if email.html is not None:
+            content["htmlContent"] = email.html
+        if email.text is not None:
+            content["textContent"] = email.text
+        return content
+    
+    async def close(self):
+        """Close pooled connections; called from the app shutdown hook"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+    
     async def send_contact_notification(self, contact_data: Dict[str, Any]) -> bool:
         """Send email notification to admin when contact form is submitted"""
         try:
-            # Email to admin notification
+            email = email_templates.render("notification", contact_data)
             admin_email_data = {
                 "sender": {
-                    "name": "Portfolio Contact Form",
+                    "name": BRAND["form_name"],
                     "email": self.admin_email
                 },
                 "to": [
                     {
                         "email": self.admin_email,
-                        "name": "Nikhil Jadhav"
+                        "name": BRAND["owner_name"]
                     }
                 ],
-                "subject": f"New Contact Form Submission: {contact_data['subject']}",
-                "htmlContent": f"""
-                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                    <h2 style="color: #06b6d4;">New Contact Form Submission</h2>
-                    <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <p><strong>Name:</strong> {contact_data['name']}</p>
-                        <p><strong>Email:</strong> {contact_data['email']}</p>
-                        <p><strong>Subject:</strong> {contact_data['subject']}</p>
-                        <p><strong>Message:</strong></p>
-                        <div style="background: white; padding: 15px; border-radius: 4px; border-left: 4px solid #06b6d4;">
-                            {contact_data['message'].replace(chr(10), '<br>')}
-                        </div>
-                    </div>
-                    <p style="color: #666; font-size: 14px;">This message was sent from your portfolio contact form.</p>
-                </div>
-                """
+                **self._content(email)
             }
             
-            response = requests.post(
-                f"{self.base_url}/smtp/email",
-                headers=self._get_headers(),
-                json=admin_email_data,
-                timeout=10
-            )
+            response = await self._post_email(admin_email_data, "notification")
             
             if response.status_code == 201:
                 response_data = response.json() if response.content else {}
@@ -73,16 +153,54 @@ class EmailService:
                 logger.error(f"📧 Failed email data: {admin_email_data}")
                 return False
                 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error sending contact notification: {str(e)}")
             return False
     
+    async def send_contact_digest(self, contacts: List[Dict[str, Any]]) -> bool:
+        """Send one admin email summarising several contact form submissions"""
+        try:
+            email = email_templates.render("notification_digest", {"messages": contacts, "count": len(contacts)})
+            digest_data = {
+                "sender": {
+                    "name": BRAND["form_name"],
+                    "email": self.admin_email
+                },
+                "to": [
+                    {
+                        "email": self.admin_email,
+                        "name": BRAND["owner_name"]
+                    }
+                ],
+                **self._content(email)
+            }
+            
+            response = await self._post_email(digest_data, "notification_digest")
+            
+            if response.status_code == 201:
+                logger.info(f"Admin digest of {len(contacts)} submissions sent to {self.admin_email}")
+                return True
+            elif _rejected(response.status_code):
+                raise EmailRejectedError(f"HTTP {response.status_code}: {response.text}")
+            else:
+                logger.error(f"Failed to send admin digest: {response.status_code} - {response.text}")
+                return False
+                
+        except (CircuitOpenError, EmailRejectedError):
+            raise
+        except Exception as e:
+            logger.error(f"Error sending contact digest: {str(e)}")
+            return False
+    
     async def send_auto_reply(self, contact_data: Dict[str, Any]) -> bool:
         """Send auto-reply to contact form submitter"""
         try:
+            email = email_templates.render("auto_reply", contact_data)
             auto_reply_data = {
                 "sender": {
-                    "name": "Nikhil Jadhav",
+                    "name": BRAND["owner_name"],
                     "email": self.admin_email
                 },
                 "to": [
@@ -91,42 +209,10 @@ class EmailService:
                         "name": contact_data['name']
                     }
                 ],
-                "subject": f"Thank you for contacting me - Re: {contact_data['subject']}",
-                "htmlContent": f"""
-                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                    <h2 style="color: #06b6d4;">Thank you for reaching out!</h2>
-                    <p>Hi {contact_data['name']},</p>
-                    <p>Thank you for your message regarding "{contact_data['subject']}". I have received your inquiry and will get back to you within 24-48 hours.</p>
-                    
-                    <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="color: #333; margin-top: 0;">Your Message:</h3>
-                        <p style="color: #666; font-style: italic;">"{contact_data['message']}"</p>
-                    </div>
-                    
-                    <p>In the meantime, feel free to:</p>
-                    <ul>
-                        <li>Connect with me on <a href="https://www.linkedin.com/in/nikhil-n-jadhav07/" style="color: #06b6d4;">LinkedIn</a></li>
-                        <li>Check out my projects on <a href="https://github.com/nikhil-jadhav123" style="color: #06b6d4;">GitHub</a></li>
-                        <li>Download my <a href="#" style="color: #06b6d4;">resume</a> for more details</li>
-                    </ul>
-                    
-                    <p>Best regards,<br>
-                    <strong>Nikhil Jadhav</strong><br>
-                    Data Engineer & Azure Cloud Specialist</p>
-                    
-                    <div style="border-top: 1px solid #eee; padding-top: 20px; margin-top: 30px; font-size: 12px; color: #999;">
-                        <p>This is an automated response. Please do not reply to this email.</p>
-                    </div>
-                </div>
-                """
+                **self._content(email)
             }
             
-            response = requests.post(
-                f"{self.base_url}/smtp/email",
-                headers=self._get_headers(),
-                json=auto_reply_data,
-                timeout=10
-            )
+            response = await self._post_email(auto_reply_data, "auto_reply")
             
             if response.status_code == 201:
                 logger.info(f"Auto-reply sent successfully to {contact_data['email']}")
@@ -135,9 +221,53 @@ class EmailService:
                 logger.error(f"Failed to send auto-reply: {response.status_code} - {response.text}")
                 return False
                 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error sending auto-reply: {str(e)}")
             return False
 
+    async def send_auto_replies(self, contacts: List[Dict[str, Any]]) -> bool:
+        """Send auto-replies to several submitters in one request, one message version each"""
+        try:
+            versions = []
+            for contact in contacts:
+                email = email_templates.render("auto_reply", contact)
+                versions.append({
+                    "to": [
+                        {
+                            "email": contact['email'],
+                            "name": contact['name']
+                        }
+                    ],
+                    **self._content(email)
+                })
+            batch_data = {
+                "sender": {
+                    "name": BRAND["owner_name"],
+                    "email": self.admin_email
+                },
+                # The top-level content is required by the API; each version overrides it with its own
+                **{field: value for field, value in versions[0].items() if field != "to"},
+                "messageVersions": versions
+            }
+            
+            response = await self._post_email(batch_data, "auto_reply_batch")
+            
+            if response.status_code == 201:
+                logger.info(f"Batch of {len(contacts)} auto-replies sent successfully")
+                return True
+            elif _rejected(response.status_code):
+                raise EmailRejectedError(f"HTTP {response.status_code}: {response.text}")
+            else:
+                logger.error(f"Failed to send auto-reply batch: {response.status_code} - {response.text}")
+                return False
+                
+        except (CircuitOpenError, EmailRejectedError):
+            raise
+        except Exception as e:
+            logger.error(f"Error sending auto-reply batch: {str(e)}")
+            return False
+
 # Global email service instance
 email_service = EmailService()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import os
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(os.environ.get('EMAIL_TEMPLATE_DIR', str(Path(__file__).parent / 'templates' / 'email')))
+
+# File suffix -> part of the rendered email; a template is the set of files sharing a name
+PARTS = {
+    ".subject.txt": "subject",
+    ".html": "html",
+    ".txt": "text",
+}
+
+# Values every template can use, overridable per deployment
+BRAND = {
+    "owner_name": os.environ.get('EMAIL_OWNER_NAME', 'Nikhil Jadhav'),
+    "owner_title": os.environ.get('EMAIL_OWNER_TITLE', 'Data Engineer & Azure Cloud Specialist'),
+    "form_name": os.environ.get('EMAIL_FORM_NAME', 'Portfolio Contact Form'),
+    "linkedin_url": os.environ.get('EMAIL_LINKEDIN_URL', 'https://www.linkedin.com/in/nikhil-n-jadhav07/'),
+    "github_url": os.environ.get('EMAIL_GITHUB_URL', 'https://github.com/nikhil-jadhav123'),
+    "resume_url": os.environ.get('EMAIL_RESUME_URL', '#'),
+    "excerpt_length": int(os.environ.get('EMAIL_EXCERPT_LENGTH', '500')),
+}
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    html: Optional[str]
+    text: Optional[str]
+
+def _nl2br(value):
+    from markupsafe import Markup, escape
+    return Markup("<br>\n").join(escape(line) for line in str(value).splitlines())
+
+class EmailTemplates:
+    """Email bodies rendered from Jinja templates under TEMPLATE_DIR.
+
+    Each email is a group of files sharing a name: `<name>.subject.txt`,
+    `<name>.html` and `<name>.txt` (either body may be left out). Files
+    starting with `_` are layouts and partials. `load()` compiles every
+    template once at startup; `render()` then only runs the compiled code, in
+    which the static markup is already a constant. Templates that use no
+    per-email variables are rendered once and served from memory.
+
+    HTML is autoescaped, the subject and text parts are not. Jinja is
+    imported in `load()`, not at module import, to keep startup fast.
+    """
+
+    def __init__(self, directory: Path = TEMPLATE_DIR):
+        self.directory = directory
+        self._env = None
+        self._compiled: Dict[str, Dict[str, Any]] = {}
+        self._static: Dict[tuple, str] = {}
+
+    @property
+    def names(self):
+        return sorted(self._compiled)
+
+    def load(self):
+        """Parse and compile all templates; a syntax error fails startup instead of a send"""
+        from jinja2 import Environment, FileSystemLoader, StrictUndefined, meta, select_autoescape
+
+        env = Environment(
+            loader=FileSystemLoader(str(self.directory)),
+            autoescape=select_autoescape(enabled_extensions=("html",), default_for_string=False, default=False),
+            undefined=StrictUndefined,
+            auto_reload=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            cache_size=-1,
+        )
+        env.filters["nl2br"] = _nl2br
+        env.globals.update(BRAND)
+
+        compiled: Dict[str, Dict[str, Any]] = {}
+        static: Dict[tuple, str] = {}
+        for filename in env.list_templates():
+            if filename.startswith("_") or "/" in filename:
+                continue
+            suffix = next((s for s in PARTS if filename.endswith(s)), None)
+            if suffix is None:
+                continue
+            name, part = filename[:-len(suffix)], PARTS[suffix]
+            template = env.get_template(filename)
+            compiled.setdefault(name, {})[part] = template
+            if not self._variables(env, meta, filename) - set(env.globals):
+                static[(name, part)] = template.render()
+
+        for name, parts in compiled.items():
+            if "subject" not in parts or not ({"html", "text"} & set(parts)):
+                raise ValueError(f"Email template '{name}' needs a subject and an html or txt body")
+
+        self._env, self._compiled, self._static = env, compiled, static
+        logger.info(f"Loaded {len(compiled)} email templates from {self.directory}")
+
+    def _variables(self, env, meta, filename: str) -> set:
+        """Per-email variables a template reads, including those of its layouts and includes"""
+        ast = env.parse(env.loader.get_source(env, filename)[0])
+        variables = set(meta.find_undeclared_variables(ast))
+        for referenced in meta.find_referenced_templates(ast):
+            if referenced is None:
+                # A dynamic include could pull in anything
+                return {None}
+            variables |= self._variables(env, meta, referenced)
+        return variables
+
+    def _part(self, name: str, part: str, context: Dict[str, Any]) -> Optional[str]:
+        if (name, part) in self._static:
+            return self._static[(name, part)]
+        template = self._compiled[name].get(part)
+        return template.render(context) if template is not None else None
+
+    def render(self, name: str, context: Dict[str, Any]) -> RenderedEmail:
+        if self._env is None:
+            self.load()
+        if name not in self._compiled:
+            raise KeyError(f"Unknown email template '{name}'")
+        # Subjects are header values: no line breaks, whatever the template or the input holds
+        subject = " ".join(self._part(name, "subject", context).split())
+        return RenderedEmail(subject, self._part(name, "html", context), self._part(name, "text", context))
+
+# Global template registry
+email_templates = EmailTemplates()
@@ -0,0 +1,99 @@
+import io
+import os
+import csv
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+# Exportable collections and the fields each may include, in output column order
+EXPORT_FIELDS: Dict[str, List[str]] = {
+    "contact_messages": ["id", "timestamp", "name", "email", "subject", "message", "read", "replied", "archived", "duplicate_count"],
+    "page_views": ["id", "timestamp", "page", "user_agent", "ip_address"],
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+# Spreadsheets evaluate a cell starting with one of these as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Visitor-supplied text: a leading quote makes the spreadsheet show it as text
+        return "'" + value
+    return value
+
+class Exporter:
+    """Streams a collection as NDJSON or CSV straight from a Motor cursor.
+
+    The cursor is read `batch_size` documents per round trip and rows are
+    written out in chunks of about `chunk_bytes`, so memory stays flat no
+    matter how many rows an export has; the client's read speed paces the
+    cursor through StreamingResponse.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.batch_size = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+        self.chunk_bytes = int(os.environ.get('EXPORT_CHUNK_BYTES', '65536'))
+
+    def resolve_fields(self, collection: str, fields: Optional[str]) -> List[str]:
+        """Requested comma-separated fields in canonical order; raises ValueError for unknown ones"""
+        allowed = EXPORT_FIELDS[collection]
+        if not fields:
+            return allowed
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(allowed)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return [field for field in allowed if field in requested]
+
+    async def stream(
+        self,
+        collection: str,
+        export_format: str,
+        fields: List[str],
+        after: Optional[datetime] = None,
+        before: Optional[datetime] = None
+    ) -> AsyncIterator[bytes]:
+        query: Dict[str, Any] = {}
+        if after or before:
+            query["timestamp"] = {}
+            if after:
+                query["timestamp"]["$gte"] = after
+            if before:
+                query["timestamp"]["$lt"] = before
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        cursor = self.db[collection].find(query, projection).sort("timestamp", 1).batch_size(self.batch_size)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if export_format == "csv" else None
+        if writer is not None:
+            writer.writerow(fields)
+        try:
+            async for doc in cursor:
+                if writer is not None:
+                    writer.writerow([_csv_value(doc.get(field)) for field in fields])
+                else:
+                    buffer.write(json.dumps({field: doc.get(field) for field in fields}, default=_json_default, separators=(",", ":")))
+                    buffer.write("\n")
+                if buffer.tell() >= self.chunk_bytes:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue().encode("utf-8")
+        finally:
+            # Also runs when the client disconnects mid-export
+            await cursor.close()
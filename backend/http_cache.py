@@ -0,0 +1,144 @@
+import os
+import gzip
+import hashlib
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+class HTTPCacheStats:
+    """Counters reported by the admin HTTP stats endpoint"""
+
+    def __init__(self):
+        self.responses = 0
+        self.not_modified = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "responses": self.responses,
+            "not_modified": self.not_modified,
+            "compressed": self.compressed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_saved,
+        }
+
+http_cache_stats = HTTPCacheStats()
+
+def _header(headers: List[tuple], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+class HTTPCacheMiddleware:
+    """Adds strong ETags, 304 responses and compression to JSON responses.
+
+    Only `application/json` bodies are buffered; every other response
+    (streams, exports, HTML) passes through untouched.
+    """
+
+    def __init__(self, app, minimum_size: Optional[int] = None, stats: HTTPCacheStats = http_cache_stats):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.environ.get('HTTP_COMPRESSION_MIN_BYTES', '1024'))
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = scope["headers"]
+        method = scope["method"]
+        start_message = None
+        body_parts: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                content_type = _header(message.get("headers", []), b"content-type") or ""
+                if not content_type.startswith("application/json") or _header(message.get("headers", []), b"content-encoding"):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send_buffered(start_message, b"".join(body_parts), method, request_headers, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_buffered(self, start_message, body: bytes, method: str, request_headers, send):
+        status = start_message["status"]
+        headers = [(k, v) for k, v in start_message.get("headers", []) if k.lower() != b"content-length"]
+        self.stats.responses += 1
+        self.stats.bytes_in += len(body)
+
+        encoding = None
+        if len(body) >= self.minimum_size:
+            encoding = _choose_encoding(_header(request_headers, b"accept-encoding") or "")
+            headers.append((b"vary", b"Accept-Encoding"))
+
+        if method in ("GET", "HEAD") and status == 200:
+            etag = _header(headers, b"etag")
+            if etag is None:
+                digest = hashlib.sha256(body).hexdigest()[:32]
+                # Each encoding is a distinct representation and needs its own strong ETag
+                etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+                headers.append((b"etag", etag.encode("latin-1")))
+            if _header(headers, b"cache-control") is None:
+                # Let browsers keep the body but revalidate it on every poll
+                headers.append((b"cache-control", b"private, no-cache"))
+
+            if_none_match = _header(request_headers, b"if-none-match")
+            if if_none_match and _etag_matches(if_none_match, etag):
+                self.stats.not_modified += 1
+                not_modified_headers = [(k, v) for k, v in headers if k.lower() in (b"etag", b"vary", b"cache-control")]
+                await send({"type": "http.response.start", "status": 304, "headers": not_modified_headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        if encoding == "br":
+            body = brotli.compress(body, quality=4)
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=6)
+        if encoding:
+            self.stats.compressed += 1
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+
+        self.stats.bytes_out += len(body)
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body if method != "HEAD" else b""})
@@ -0,0 +1,192 @@
+import os
+import sys
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, List
+
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever INDEXES changes so deployments can tell which layout they run
+SCHEMA_VERSION = 9
+
+# Raw page views expire after this many days (0 keeps them); see retention.py
+PAGE_VIEW_RETENTION_DAYS = int(os.environ.get('PAGE_VIEW_RETENTION_DAYS', '0'))
+PAGE_VIEW_TTL = {"expireAfterSeconds": PAGE_VIEW_RETENTION_DAYS * 86400} if PAGE_VIEW_RETENTION_DAYS > 0 else {}
+
+# Indexes every collection needs, keyed by collection name
+INDEXES: Dict[str, List[IndexModel]] = {
+    "contact_messages": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("read", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("email", ASCENDING)]),
+        # Exact duplicate submissions within one dedup window period; older messages have no key
+        IndexModel(
+            [("dedup_key", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"dedup_key": {"$exists": True}}
+        ),
+        # Outbox sweep: only messages whose emails have not been queued yet are in it
+        IndexModel(
+            [("timestamp", ASCENDING)],
+            name="emails_unqueued",
+            partialFilterExpression={"emails_queued": False}
+        ),
+        # Admin search; a collection can have only one text index, so every searchable field is in it
+        IndexModel(
+            [("name", TEXT), ("email", TEXT), ("subject", TEXT), ("message", TEXT)],
+            weights={"subject": 5, "name": 3, "email": 3, "message": 1},
+            default_language="english"
+        ),
+    ],
+    "page_views": [
+        IndexModel([("timestamp", ASCENDING)], **PAGE_VIEW_TTL),
+    ],
+    "portfolio_sections": [
+        IndexModel([("section_name", ASCENDING)], unique=True),
+    ],
+    "email_outbox": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("idempotency_key", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        # Batch sweep: pending jobs of one kind, oldest first
+        IndexModel([("status", ASCENDING), ("kind", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("message_id", ASCENDING)]),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "analytics_hourly": [
+        IndexModel([("bucket", ASCENDING), ("page", ASCENDING)], unique=True),
+    ],
+    "analytics_daily": [
+        IndexModel([("bucket", ASCENDING), ("page", ASCENDING)], unique=True),
+    ],
+}
+
+# Indexes superseded by entries above in a released version, dropped by ensure_indexes if present
+OBSOLETE_INDEXES: Dict[str, List[str]] = {}
+
+# Queries on request or worker hot paths: (name, collection, filter, sort)
+HOT_QUERIES = [
+    ("contact messages by recency", "contact_messages", {"archived": {"$ne": True}}, {"timestamp": -1, "id": -1}),
+    ("contact messages after cursor", "contact_messages", {
+        "$or": [
+            {"timestamp": {"$lt": datetime(2000, 1, 1)}},
+            {"timestamp": datetime(2000, 1, 1), "id": {"$lt": "explain"}},
+        ],
+        "archived": {"$ne": True},
+    }, {"timestamp": -1, "id": -1}),
+    ("unread contact messages by recency", "contact_messages", {"read": False, "archived": {"$ne": True}}, {"timestamp": -1, "id": -1}),
+    ("bulk action targets", "contact_messages", {"id": {"$in": ["explain"]}}, {"timestamp": 1, "id": 1}),
+    ("bulk action filter targets", "contact_messages", {"$and": [
+        {"timestamp": {"$lt": datetime(2000, 1, 1)}}, {"read": {"$ne": True}}
+    ]}, {"timestamp": 1, "id": 1}),
+    ("message text search", "contact_messages", {"$text": {"$search": "explain"}}, None),
+    ("messages by email prefix", "contact_messages", {"email": {"$regex": "^explain"}}, {"timestamp": -1, "id": -1}),
+    ("contact message by id", "contact_messages", {"id": "explain"}, None),
+    ("contact message by dedup key", "contact_messages", {"dedup_key": "explain"}, None),
+    ("unread contact messages", "contact_messages", {"read": False}, None),
+    ("portfolio section upsert", "portfolio_sections", {"section_name": "explain"}, None),
+    ("outbox claim", "email_outbox", {
+        "$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": datetime(2000, 1, 1)}},
+            {"status": "sending", "locked_until": {"$lte": datetime(2000, 1, 1)}},
+        ]
+    }, {"next_attempt_at": 1}),
+    ("outbox batch sweep", "email_outbox", {
+        "status": "pending", "kind": "explain",
+        "$or": [{"attempts": 0}, {"next_attempt_at": {"$lte": datetime(2000, 1, 1)}}],
+    }, {"created_at": 1}),
+    ("messages without email jobs", "contact_messages", {"emails_queued": False, "timestamp": {"$lte": datetime(2000, 1, 1)}}, None),
+    ("outbox job by id", "email_outbox", {"id": "explain"}, None),
+    ("deliveries by message", "email_outbox", {"message_id": "explain"}, None),
+    ("hourly bucket upsert", "analytics_hourly", {"bucket": datetime(2000, 1, 1), "page": "explain"}, None),
+    ("hourly buckets by range", "analytics_hourly", {"bucket": {"$gte": datetime(2000, 1, 1), "$lt": datetime(2000, 2, 1)}}, None),
+    ("daily buckets by range", "analytics_daily", {"bucket": {"$gte": datetime(2000, 1, 1), "$lt": datetime(2000, 2, 1)}}, None),
+    ("archivable contact messages", "contact_messages", {"timestamp": {"$lt": datetime(2000, 1, 1)}}, {"timestamp": 1, "id": 1}),
+]
+
+async def _sync_ttl(db, collection: str, index: IndexModel):
+    """Bring an existing index's TTL in line with its declaration before create_indexes sees it"""
+    name = index.document["name"]
+    existing = (await db[collection].index_information()).get(name)
+    if existing is None:
+        return
+    wanted = index.document.get("expireAfterSeconds")
+    current = existing.get("expireAfterSeconds")
+    if wanted == current:
+        return
+    if wanted is None:
+        # A TTL cannot be removed in place; the index is rebuilt without it
+        await db[collection].drop_index(name)
+    else:
+        # collMod changes or adds the TTL without a rebuild (MongoDB 5.1+)
+        await db.command("collMod", collection, index={"name": name, "expireAfterSeconds": wanted})
+    logger.info(f"TTL of {collection}.{name} changed from {current} to {wanted}")
+
+async def ensure_indexes(db):
+    """Create every declared index (a no-op for ones that exist) and record the schema version"""
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+    for index in INDEXES["page_views"]:
+        await _sync_ttl(db, "page_views", index)
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+    await db.schema_meta.update_one(
+        {"_id": "indexes"},
+        {"$set": {"version": SCHEMA_VERSION, "applied_at": datetime.utcnow()}},
+        upsert=True
+    )
+    logger.info(f"Indexes at schema version {SCHEMA_VERSION}")
+
+def _find_stages(plan: Dict[str, Any], stage: str) -> bool:
+    if plan.get("stage") == stage:
+        return True
+    children = [plan.get("inputStage")] + plan.get("inputStages", [])
+    return any(_find_stages(child, stage) for child in children if child)
+
+async def verify_query_plans(db) -> List[str]:
+    """Explain every hot query and return the names of those planned as a COLLSCAN"""
+    collscans = []
+    for name, collection, query, sort in HOT_QUERIES:
+        command: Dict[str, Any] = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = sort
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        # The slot-based engine (MongoDB 7+) nests the classic plan tree under queryPlan
+        if _find_stages(winning_plan.get("queryPlan", winning_plan), "COLLSCAN"):
+            collscans.append(name)
+    return collscans
+
+async def _main(verify: bool) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    root_dir = Path(__file__).parent
+    load_dotenv(root_dir / ('.env.production' if os.path.exists(root_dir / '.env.production') else '.env'))
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        await ensure_indexes(db)
+        if verify:
+            collscans = await verify_query_plans(db)
+            for name in collscans:
+                print(f"COLLSCAN: {name}")
+            return 1 if collscans else 0
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    # python indexes.py [--verify]
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main("--verify" in sys.argv)))
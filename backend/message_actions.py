@@ -0,0 +1,134 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bulk action -> (field, value) it sets; "delete" is handled separately
+FIELD_ACTIONS = {
+    "read": ("read", True),
+    "unread": ("read", False),
+    "replied": ("replied", True),
+    "archive": ("archived", True),
+}
+
+# Filter matches are taken oldest first, so repeated calls page through them in a fixed order
+TARGET_SORT = [("timestamp", 1), ("id", 1)]
+
+# Concurrent find_one_and_delete calls per bulk delete
+DELETE_CONCURRENCY = 20
+
+class ContactMessageActions:
+    """Bulk triage of contact messages with one update or delete per action.
+
+    Targets are given as ids, a filter, or both (their intersection). Without
+    ids the filter must have at least one criterion, so an empty filter can
+    never select the whole inbox, and at most `limit` ids are accepted. A
+    filter resolves to at most `limit` messages per call, oldest first, and
+    skips messages the action would not change; `has_more` tells the caller
+    to repeat it, and every repeat makes progress. The analytics rollups are
+    adjusted from the modified counts in the same call.
+    """
+
+    def __init__(self, db, analytics):
+        self.db = db
+        self.analytics = analytics
+        self.limit = int(os.environ.get('BULK_ACTION_LIMIT', '1000'))
+
+    @property
+    def collection(self):
+        return self.db.contact_messages
+
+    def _query(self, ids: Optional[List[str]], message_filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if ids is not None:
+            query["id"] = {"$in": ids}
+        message_filter = {k: v for k, v in (message_filter or {}).items() if v is not None}
+        for field in ("read", "replied", "archived"):
+            if field in message_filter:
+                # Older documents have no `archived` field, so false must also match a missing one
+                query[field] = message_filter[field] if message_filter[field] else {"$ne": True}
+        if "email" in message_filter:
+            query["email"] = message_filter["email"]
+        if "before" in message_filter or "after" in message_filter:
+            query["timestamp"] = {}
+            if "after" in message_filter:
+                query["timestamp"]["$gte"] = message_filter["after"]
+            if "before" in message_filter:
+                query["timestamp"]["$lt"] = message_filter["before"]
+        return query
+
+    async def _resolve(self, query: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool]:
+        projection = {"_id": 0, "id": 1, "read": 1, "replied": 1, "archived": 1, "timestamp": 1}
+        cursor = self.collection.find(query, projection).sort(TARGET_SORT).limit(self.limit + 1)
+        docs = await cursor.to_list(self.limit + 1)
+        return docs[:self.limit], len(docs) > self.limit
+
+    async def apply(self, action: str, ids: Optional[List[str]] = None, message_filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if ids is None and message_filter is None:
+            raise ValueError("Provide ids, a filter, or both")
+        if ids is None and not any(value is not None for value in message_filter.values()):
+            raise ValueError("A filter without ids needs at least one criterion")
+        if ids is not None and len(set(ids)) > self.limit:
+            raise ValueError(f"At most {self.limit} ids per call")
+        query = self._query(ids, message_filter)
+        if ids is None and action in FIELD_ACTIONS:
+            # Leave out messages already in the target state, or a repeated call would match them again
+            field, value = FIELD_ACTIONS[action]
+            query = {"$and": [query, {field: {"$ne": value}}]}
+        docs, has_more = await self._resolve(query)
+
+        if action == "delete":
+            modified, results = await self._delete(docs)
+        else:
+            modified, results = await self._set_field(docs, *FIELD_ACTIONS[action])
+
+        found = {doc["id"] for doc in docs}
+        results += [{"id": message_id, "status": "not_found"} for message_id in dict.fromkeys(ids or []) if message_id not in found]
+        logger.info(f"Bulk {action}: {len(docs)} matched, {modified} modified")
+        return {
+            "action": action,
+            "matched": len(docs),
+            "modified": modified,
+            "has_more": has_more,
+            "results": results,
+            "analytics": await self.analytics.get_totals(),
+        }
+
+    async def _set_field(self, docs: List[Dict[str, Any]], field: str, value: bool) -> Tuple[int, List[Dict[str, Any]]]:
+        targets = [doc["id"] for doc in docs if doc.get(field, False) != value]
+        modified = 0
+        if targets:
+            # The $ne guard keeps modified_count exact if another request changed a message meanwhile
+            result = await self.collection.update_many(
+                {"id": {"$in": targets}, field: {"$ne": value}},
+                {"$set": {field: value}}
+            )
+            modified = result.modified_count
+            if field == "read":
+                await self.analytics.record_read_change(modified if value else -modified)
+        changed = set(targets)
+        results = [{"id": doc["id"], "status": "updated" if doc["id"] in changed else "unchanged"} for doc in docs]
+        return modified, results
+
+    async def _delete(self, docs: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """Delete one by one, so the counters and statuses follow exactly what this call removed"""
+        semaphore = asyncio.Semaphore(DELETE_CONCURRENCY)
+
+        async def delete(message_id: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.collection.find_one_and_delete(
+                    {"id": message_id}, projection={"_id": 0, "read": 1, "timestamp": 1}
+                )
+
+        removed = await asyncio.gather(*(delete(doc["id"]) for doc in docs))
+        deleted = [doc for doc in removed if doc is not None]
+        await self.analytics.record_messages_deleted(
+            [doc["timestamp"] for doc in deleted], sum(doc.get("read") is False for doc in deleted)
+        )
+        # A message missing here was removed by a concurrent request
+        return len(deleted), [
+            {"id": doc["id"], "status": "deleted" if doc_removed is not None else "not_found"}
+            for doc, doc_removed in zip(docs, removed)
+        ]
@@ -0,0 +1,306 @@
+import os
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Tuple, Optional, Callable, Awaitable
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond cache hits up to slow email provider calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def samples(self, const_labels: Tuple[Tuple[str, str], ...]) -> List[str]:
+        raise NotImplementedError
+
+    def render(self, const_labels: Tuple[Tuple[str, str], ...] = ()) -> List[str]:
+        header = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return header + self.samples(const_labels)
+
+class Counter(Metric):
+    """Monotonic counter; `inc` is a single dict update"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self, const_labels) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, labels, const_labels)} {value}"
+            for labels, value in list(self._values.items())
+        ]
+
+class Gauge(Metric):
+    """Point-in-time value, set directly or read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[tuple, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, *label_values):
+        self._values[label_values] = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def samples(self, const_labels) -> List[str]:
+        if self._function is not None:
+            self._values[()] = self._function()
+        return [
+            f"{self.name}{_format_labels(self.label_names, labels, const_labels)} {value}"
+            for labels, value in list(self._values.items())
+        ]
+
+class Histogram(Metric):
+    """Bucketed latency distribution.
+
+    Each label set owns one flat list: a count per bucket (plus +Inf), then
+    the sum and the count, so `observe` is a bisect and three increments.
+    Buckets are only made cumulative when rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * len(self._bounds) + [0.0, 0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self, const_labels) -> List[str]:
+        lines = []
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for i, le in enumerate(self._bounds):
+                cumulative += series[i]
+                bucket_labels = _format_labels(self.label_names, labels, const_labels + (("le", le),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.label_names, labels, const_labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-2]}")
+            lines.append(f"{self.name}_count{label_text} {series[-1]}")
+        return lines
+
+class MetricsRegistry:
+    """Metrics of this worker process, rendered in the Prometheus text format.
+
+    Every metric is only mutated on the event loop thread, so no locks are
+    taken. Producers on other threads (the pymongo command listener) append
+    to `pending`, a deque whose append is atomic, and the loop folds those
+    observations in via `drain()`. Async collectors refresh gauges that need
+    a database read just before each scrape.
+    """
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.pending: deque = deque(maxlen=100_000)
+        self._collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]):
+        self._collectors.append(collector)
+
+    def drain(self):
+        """Fold observations queued by other threads into their metrics"""
+        pending = self.pending
+        while pending:
+            metric, value, labels = pending.popleft()
+            if isinstance(metric, Histogram):
+                metric.observe(value, *labels)
+            else:
+                metric.inc(*labels, amount=value)
+
+    async def render(self) -> str:
+        self.drain()
+        for collector in self._collectors:
+            try:
+                await collector()
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {str(e)}")
+        # Every worker is scraped separately; the pid keeps their series apart
+        const_labels = (("worker", str(os.getpid())),)
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render(const_labels))
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status", ("method", "route", "status"))
+mongo_command_duration_seconds = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command", ("collection", "command"))
+mongo_command_failures_total = registry.counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error", ("collection", "command"))
+email_send_duration_seconds = registry.histogram(
+    "email_send_duration_seconds", "Email provider API call latency", ("kind",))
+email_sends_total = registry.counter(
+    "email_sends_total", "Email provider API calls by outcome (sent, rejected, error)", ("kind", "outcome"))
+email_circuit_state = registry.gauge(
+    "email_circuit_state", "Email provider circuit in this worker (0 closed, 1 half-open, 2 open)")
+email_circuit_transitions_total = registry.counter(
+    "email_circuit_transitions_total", "Email provider circuit state changes, by new state", ("state",))
+email_timeout_seconds = registry.gauge(
+    "email_timeout_seconds", "Current adaptive timeout for email provider calls")
+page_view_buffer_pending = registry.gauge(
+    "page_view_buffer_pending", "Page views waiting in this worker's write buffer")
+page_views_dropped_total = registry.counter(
+    "page_views_dropped_total", "Page views discarded because this worker's write buffer stayed full")
+email_outbox_jobs = registry.gauge(
+    "email_outbox_jobs", "Email outbox jobs by status", ("status",))
+event_loop_lag_seconds = registry.gauge(
+    "event_loop_lag_seconds", "Most recent event loop scheduling delay")
+event_loop_lag_distribution = registry.histogram(
+    "event_loop_lag_distribution_seconds", "Event loop scheduling delay")
+request_budget_overruns_total = registry.counter(
+    "request_budget_overruns_total", "Requests that responded after their route's deadline", ("method", "route"))
+deferred_steps_total = registry.counter(
+    "deferred_steps_total", "Request steps left to finish in the background when the budget ran out", ("step",))
+duplicate_submissions_total = registry.counter(
+    "duplicate_submissions_total", "Contact submissions merged into an earlier message (exact, near)", ("kind",))
+log_errors_total = registry.counter(
+    "log_errors_total", "Records logged at ERROR or above, by logger", ("logger",))
+
+class MetricsMiddleware:
+    """Counts and times every HTTP request under its route template.
+
+    The template (e.g. /api/portfolio/{section_name}) comes from the route
+    FastAPI matched, so path parameters never create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched", str(status_code))
+            http_request_duration_seconds.observe(time.perf_counter() - started, *labels)
+            http_requests_total.inc(*labels)
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times Mongo commands per collection; pymongo calls this from Motor's executor threads"""
+
+    def __init__(self, metrics_registry: MetricsRegistry = registry):
+        self.registry = metrics_registry
+        self._collections: Dict[tuple, str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        # getMore names the cursor id under the command and the collection separately
+        collection = target if isinstance(target, str) else event.command.get("collection", "")
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, failed: bool):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        labels = (collection, event.command_name)
+        self.registry.pending.append((mongo_command_duration_seconds, event.duration_micros / 1_000_000, labels))
+        if failed:
+            self.registry.pending.append((mongo_command_failures_total, 1, labels))
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+class ErrorCountingHandler(logging.Handler):
+    """Counts ERROR records so failures that are only logged still show up in metrics"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def emit(self, record):
+        # Records can come from executor threads; those go through the drain queue
+        registry.pending.append((log_errors_total, 1, (record.name,)))
+
+class EventLoopMonitor:
+    """Measures how late the event loop wakes a periodic sleep and drains queued observations"""
+
+    def __init__(self, metrics_registry: MetricsRegistry = registry):
+        self.registry = metrics_registry
+        self.interval = float(os.environ.get('METRICS_LOOP_INTERVAL_SECONDS', '0.5'))
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            event_loop_lag_seconds.set(lag)
+            event_loop_lag_distribution.observe(lag)
+            self.registry.drain()
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 import uuid
 
@@ -13,6 +13,10 @@ class ContactMessage(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     read: bool = False
     replied: bool = False
+    archived: bool = False
+    # Repeats of this submission that were merged into it instead of stored
+    duplicate_count: int = 0
+    last_duplicate_at: Optional[datetime] = None
 
 class ContactMessageCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
@@ -20,10 +24,47 @@ class ContactMessageCreate(BaseModel):
     subject: str = Field(..., min_length=1, max_length=200)
     message: str = Field(..., min_length=1, max_length=2000)
 
+class ContactMessagePage(BaseModel):
+    messages: List[ContactMessage]
+    next_cursor: Optional[str] = None
+
+class ContactMessageSearchHit(ContactMessage):
+    score: Optional[float] = None
+
+class ContactMessageSearchPage(BaseModel):
+    messages: List[ContactMessageSearchHit]
+    next_cursor: Optional[str] = None
+
+class ContactMessageFilter(BaseModel):
+    read: Optional[bool] = None
+    replied: Optional[bool] = None
+    archived: Optional[bool] = None
+    email: Optional[EmailStr] = None
+    before: Optional[datetime] = None
+    after: Optional[datetime] = None
+
+class ContactMessageBulkAction(BaseModel):
+    action: Literal["read", "unread", "replied", "archive", "delete"]
+    ids: Optional[List[str]] = Field(None, max_length=1000)
+    filter: Optional[ContactMessageFilter] = None
+
+class BulkItemResult(BaseModel):
+    id: str
+    status: Literal["updated", "unchanged", "deleted", "not_found"]
+
 class ContactResponse(BaseModel):
     success: bool
     message: str
 
+class EmailDelivery(BaseModel):
+    kind: str
+    status: str
+    attempts: int = 0
+    last_error: Optional[str] = None
+    next_attempt_at: Optional[datetime] = None
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+
 # Admin Models
 class AdminLogin(BaseModel):
     password: str
@@ -50,6 +91,26 @@ class AnalyticsData(BaseModel):
     unread_messages: int = 0
     last_contact: Optional[datetime] = None
 
+class ContactMessageBulkResult(BaseModel):
+    action: str
+    matched: int
+    modified: int
+    has_more: bool = False
+    results: List[BulkItemResult]
+    analytics: AnalyticsData
+
+class TimeSeriesPoint(BaseModel):
+    bucket: datetime
+    page: Optional[str] = None
+    page_views: int = 0
+    contact_submissions: int = 0
+
+class AnalyticsTimeSeries(BaseModel):
+    granularity: str
+    start: datetime
+    end: datetime
+    points: List[TimeSeriesPoint] = []
+
 class PageView(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     page: str
@@ -0,0 +1,293 @@
+import os
+import asyncio
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from pymongo import ReturnDocument, ASCENDING
+from pymongo.errors import BulkWriteError
+
+from circuit_breaker import CircuitOpenError
+from email_service import EmailRejectedError
+
+logger = logging.getLogger(__name__)
+
+# Outbox job kinds and the EmailService method that delivers each of them
+EMAIL_KINDS = {
+    "notification": "send_contact_notification",
+    "auto_reply": "send_auto_reply",
+}
+
+# Kinds that can be delivered together, and the EmailService method that sends a batch of them
+BATCH_KINDS = {
+    "notification": "send_contact_digest",
+    "auto_reply": "send_auto_replies",
+}
+
+UNFINISHED_STATUSES = ("pending", "sending", "failed")
+
+class EmailOutbox:
+    """Durable queue of contact-form emails drained by a background worker.
+
+    The contact endpoint only writes outbox documents; delivery, retries with
+    exponential backoff and failure bookkeeping happen in `run()` tasks.
+
+    Batching is opt-in per kind. With EMAIL_DIGEST_WINDOW_SECONDS set, a new
+    admin notification waits up to that long, and every notification queued
+    meanwhile goes out with it as one digest email. AUTO_REPLY_BATCH_WINDOW_SECONDS
+    does the same for auto-replies, which are sent as one provider request
+    carrying a message version per recipient. The window is the maximum
+    added delay; a batch is capped at the kind's batch size. A batch the
+    provider rejects with a 4xx is resent job by job, so one bad recipient
+    cannot fail the rest.
+
+    While the email provider's circuit breaker is open, workers stop claiming
+    and jobs refused by the breaker are requeued without using an attempt.
+
+    A contact message is stored with `emails_queued: false` and flipped once
+    its jobs are written. If the process dies or the enqueue fails in between,
+    `sweep()` finds the message after OUTBOX_SWEEP_GRACE_SECONDS and queues
+    its emails; the idempotency keys make a repeated enqueue harmless.
+    """
+
+    def __init__(self, db, email_service):
+        self.db = db
+        self.email_service = email_service
+        self.concurrency = int(os.environ.get('OUTBOX_CONCURRENCY', '2'))
+        self.max_attempts = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '6'))
+        self.base_backoff = float(os.environ.get('OUTBOX_BACKOFF_SECONDS', '5'))
+        self.max_backoff = float(os.environ.get('OUTBOX_MAX_BACKOFF_SECONDS', '900'))
+        self.lease_seconds = float(os.environ.get('OUTBOX_LEASE_SECONDS', '60'))
+        self.poll_interval = float(os.environ.get('OUTBOX_POLL_SECONDS', '2'))
+        self.sweep_interval = float(os.environ.get('OUTBOX_SWEEP_SECONDS', '60'))
+        self.sweep_grace = float(os.environ.get('OUTBOX_SWEEP_GRACE_SECONDS', '30'))
+        # Kind -> (seconds a job may wait for others, most jobs per batch); a 0 window sends jobs one by one
+        self.batching = {
+            "notification": (
+                float(os.environ.get('EMAIL_DIGEST_WINDOW_SECONDS', '0')),
+                int(os.environ.get('EMAIL_DIGEST_MAX_MESSAGES', '50'))
+            ),
+            "auto_reply": (
+                float(os.environ.get('AUTO_REPLY_BATCH_WINDOW_SECONDS', '0')),
+                int(os.environ.get('AUTO_REPLY_BATCH_SIZE', '100'))
+            ),
+        }
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running = False
+
+    @property
+    def collection(self):
+        return self.db.email_outbox
+
+    @property
+    def messages(self):
+        return self.db.contact_messages
+
+    def _batch_window(self, kind: str) -> float:
+        window, size = self.batching.get(kind, (0, 1))
+        return window if size > 1 else 0
+
+    def _new_job(self, message_id: str, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        return {
+            "id": str(uuid.uuid4()),
+            "idempotency_key": f"{message_id}:{kind}",
+            "message_id": message_id,
+            "kind": kind,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "last_error": None,
+            # A batched job becomes due at the end of its window; jobs queued after it ride along
+            "next_attempt_at": now + timedelta(seconds=self._batch_window(kind)),
+            "locked_until": None,
+            "claim_id": None,
+            "created_at": now,
+            "sent_at": None,
+        }
+
+    async def enqueue_contact_emails(self, message_id: str, contact_data: Dict[str, Any]):
+        """Queue the admin notification and the auto-reply for one contact message"""
+        jobs = [self._new_job(message_id, kind, contact_data) for kind in EMAIL_KINDS]
+        try:
+            await self.collection.insert_many(jobs, ordered=False)
+        except BulkWriteError as e:
+            # Jobs already queued under the same idempotency key are fine
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+        await self.messages.update_one({"id": message_id}, {"$set": {"emails_queued": True}})
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def sweep(self) -> int:
+        """Queue the emails of messages stored without them; returns how many messages were repaired"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.sweep_grace)
+        # Messages stored before this flag existed have no field and are left alone
+        stranded = await self.messages.find(
+            {"emails_queued": False, "timestamp": {"$lte": cutoff}},
+            {"_id": 0, "id": 1, "name": 1, "email": 1, "subject": 1, "message": 1}
+        ).limit(100).to_list(100)
+        for message in stranded:
+            message_id = message.pop("id")
+            await self.enqueue_contact_emails(message_id, message)
+        if stranded:
+            logger.warning(f"Queued emails for {len(stranded)} contact messages stored without them")
+        return len(stranded)
+
+    async def run_sweeps(self):
+        """Sweep loop, one per process; several workers sweeping at once only collide on idempotency keys"""
+        while self._running:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error sweeping for unqueued contact emails: {str(e)}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def get_deliveries(self, message_id: str) -> List[Dict[str, Any]]:
+        return await self.collection.find(
+            {"message_id": message_id},
+            {"_id": 0, "payload": 0}
+        ).to_list(len(EMAIL_KINDS))
+
+    async def count_by_status(self) -> Dict[str, int]:
+        """Queue depth per unfinished job status, for the metrics endpoint"""
+        # Sent jobs are never removed, so they are not counted; each count uses the status index
+        counts = await asyncio.gather(*(
+            self.collection.count_documents({"status": status}) for status in UNFINISHED_STATUSES
+        ))
+        return dict(zip(UNFINISHED_STATUSES, counts))
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    # Jobs whose worker died mid-send become claimable again
+                    {"status": "sending", "locked_until": {"$lte": now}},
+                ]
+            },
+            {"$set": {"status": "sending", "locked_until": now + timedelta(seconds=self.lease_seconds)}},
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _claim_batch(self, job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """The claimed job plus up to a batch's worth of other pending jobs of its kind"""
+        if self._batch_window(job["kind"]) <= 0:
+            return [job]
+        now = datetime.utcnow()
+        size = self.batching[job["kind"]][1]
+        # Jobs still in their first window join early; retries only once their backoff is over
+        sweep = {
+            "status": "pending",
+            "kind": job["kind"],
+            "$or": [{"attempts": 0}, {"next_attempt_at": {"$lte": now}}],
+        }
+        candidates = await self.collection.find(sweep, {"_id": 0, "id": 1}).sort("created_at", ASCENDING).limit(size - 1).to_list(size - 1)
+        if not candidates:
+            return [job]
+        claim_id = str(uuid.uuid4())
+        # Another worker may take some candidates first; the claim id tells which ones this one got
+        ids = [doc["id"] for doc in candidates]
+        await self.collection.update_many(
+            {**sweep, "id": {"$in": ids}},
+            {"$set": {"status": "sending", "locked_until": job["locked_until"], "claim_id": claim_id}}
+        )
+        others = await self.collection.find({"id": {"$in": ids}, "claim_id": claim_id}).to_list(size - 1)
+        return [job] + others
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.base_backoff * (2 ** (attempts - 1)), self.max_backoff)
+
+    async def _defer(self, jobs: List[Dict[str, Any]]):
+        """Put jobs back untouched while the provider's circuit is open; no attempt is used up"""
+        retry_at = datetime.utcnow() + timedelta(seconds=max(self.email_service.breaker.retry_in(), self.poll_interval))
+        await self.collection.update_many(
+            {"id": {"$in": [job["id"] for job in jobs]}},
+            {"$set": {"status": "pending", "next_attempt_at": retry_at, "locked_until": None}}
+        )
+
+    async def _deliver(self, jobs: List[Dict[str, Any]]):
+        kind = jobs[0]["kind"]
+        error = None
+        try:
+            if len(jobs) == 1:
+                delivered = await getattr(self.email_service, EMAIL_KINDS[kind])(jobs[0]["payload"])
+            else:
+                delivered = await getattr(self.email_service, BATCH_KINDS[kind])([job["payload"] for job in jobs])
+            if not delivered:
+                error = "Email provider rejected the request"
+        except CircuitOpenError:
+            await self._defer(jobs)
+            return
+        except EmailRejectedError as e:
+            # One bad message version fails the whole request; send each job alone so only that one is retried
+            logger.warning(f"Provider rejected a batch of {len(jobs)} {kind} emails ({str(e)}); sending them one by one")
+            for job in jobs:
+                await self._deliver([job])
+            return
+        except Exception as e:
+            error = str(e)
+
+        now = datetime.utcnow()
+        if error is None:
+            update = {"status": "sent", "sent_at": now, "locked_until": None, "last_error": None}
+            await self.collection.update_many({"id": {"$in": [job["id"] for job in jobs]}}, {"$set": update, "$inc": {"attempts": 1}})
+            return
+
+        for job in jobs:
+            attempts = job["attempts"] + 1
+            if attempts >= self.max_attempts:
+                update = {"status": "failed", "locked_until": None, "last_error": error}
+                logger.error(f"Giving up on {job['idempotency_key']} after {attempts} attempts: {error}")
+            else:
+                retry_at = now + timedelta(seconds=self._backoff(attempts))
+                update = {"status": "pending", "next_attempt_at": retry_at, "locked_until": None, "last_error": error}
+                logger.warning(f"Delivery of {job['idempotency_key']} failed (attempt {attempts}), retrying at {retry_at}")
+            await self.collection.update_one({"id": job["id"]}, {"$set": update, "$inc": {"attempts": 1}})
+
+    async def run(self):
+        """Worker loop: claim due jobs and deliver them until stopped"""
+        while self._running:
+            # Cleared before claiming so an enqueue racing the claim is not missed
+            self._wakeup.clear()
+            # While the provider's circuit is open jobs stay queued instead of failing one by one
+            paused_for = self.email_service.breaker.retry_in()
+            if paused_for > 0:
+                await asyncio.sleep(min(paused_for, self.poll_interval))
+                continue
+            try:
+                job = await self._claim()
+                if job is not None:
+                    await self._deliver(await self._claim_batch(job))
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error draining email outbox: {str(e)}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._running = True
+        self._tasks = [asyncio.create_task(self.run()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self.run_sweeps()))
+
+    async def stop(self):
+        # wait_for() can swallow a cancel that races the wakeup event, so the loop also checks a flag
+        self._running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
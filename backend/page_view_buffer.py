@@ -0,0 +1,115 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+from pymongo.errors import BulkWriteError
+
+from metrics import page_views_dropped_total
+
+logger = logging.getLogger(__name__)
+
+class PageViewBuffer:
+    """In-process write buffer that turns per-hit page views into bulk inserts.
+
+    A background task flushes with `insert_many(ordered=False)` once the
+    buffer holds `batch_size` documents or `flush_interval` seconds pass.
+    When `max_pending` documents are waiting, a caller wakes the background
+    flush and waits up to `full_wait` seconds for room; if the buffer is
+    still full (MongoDB is down or not keeping up) the view is dropped and
+    counted rather than queued behind another failing insert.
+    `on_flush` receives each batch that was written.
+    """
+
+    def __init__(self, db, on_flush: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None):
+        self.db = db
+        self.on_flush = on_flush
+        self.batch_size = int(os.environ.get('PAGE_VIEW_BATCH_SIZE', '500'))
+        self.flush_interval = float(os.environ.get('PAGE_VIEW_FLUSH_SECONDS', '1'))
+        self.max_pending = int(os.environ.get('PAGE_VIEW_MAX_PENDING', '10000'))
+        self.full_wait = float(os.environ.get('PAGE_VIEW_FULL_WAIT_SECONDS', '0.25'))
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_requested = asyncio.Event()
+        self._has_room = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    @property
+    def collection(self):
+        return self.db.page_views
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    async def add(self, document: Dict[str, Any]):
+        # Backpressure: once the buffer is full, callers wait on the background flush instead of each running one
+        if len(self._buffer) >= self.max_pending:
+            self._has_room.clear()
+            self._flush_requested.set()
+            try:
+                await asyncio.wait_for(self._has_room.wait(), timeout=self.full_wait)
+            except asyncio.TimeoutError:
+                pass
+            if len(self._buffer) >= self.max_pending:
+                page_views_dropped_total.inc()
+                return
+        self._buffer.append(document)
+        if len(self._buffer) >= self.batch_size:
+            self._flush_requested.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            try:
+                await self._flush()
+            finally:
+                if len(self._buffer) < self.max_pending:
+                    self._has_room.set()
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        batch = self._buffer
+        self._buffer = []
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            rejected = {err["index"] for err in e.details.get("writeErrors", [])}
+            logger.error(f"Page view flush partially failed: {len(rejected)} of {len(batch)} documents rejected")
+            batch = [doc for i, doc in enumerate(batch) if i not in rejected]
+        except Exception as e:
+            # Keep the batch for the next flush as long as there is room for it
+            room = max(self.max_pending - len(self._buffer), 0)
+            self._buffer[:0] = batch[:room]
+            logger.error(f"Error flushing {len(batch)} page views: {str(e)}")
+            return
+
+        if self.on_flush is not None:
+            try:
+                await self.on_flush(batch)
+            except Exception as e:
+                logger.error(f"Error in page view flush hook: {str(e)}")
+
+    async def run(self):
+        """Flush on size or time, whichever comes first, until stopped"""
+        while self._running:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    def start(self):
+        self._running = True
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        # wait_for() can swallow a cancel that races the flush event, so the loop also checks a flag
+        self._running = False
+        self._flush_requested.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
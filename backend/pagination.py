@@ -0,0 +1,86 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+# Newest first; `id` breaks ties between messages with the same timestamp
+KEYSET_SORT = [("timestamp", -1), ("id", -1)]
+
+# Search results: best text match first, then the same order as KEYSET_SORT
+SEARCH_SORT = {"score": -1, "timestamp": -1, "id": -1}
+
+def _encode(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(data, dict):
+            raise TypeError("cursor is not an object")
+        return data
+    except (TypeError, json.JSONDecodeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+def encode_cursor(timestamp: datetime, message_id: str) -> str:
+    return _encode({"t": timestamp.isoformat(), "i": message_id})
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
+    data = _decode(cursor)
+    try:
+        return datetime.fromisoformat(data["t"]), str(data["i"])
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def encode_search_cursor(score: float, timestamp: datetime, message_id: str) -> str:
+    return _encode({"s": score, "t": timestamp.isoformat(), "i": message_id})
+
+def decode_search_cursor(cursor: str) -> Tuple[float, datetime, str]:
+    """Inverse of encode_search_cursor; raises ValueError for anything it did not produce"""
+    data = _decode(cursor)
+    try:
+        return float(data["s"]), datetime.fromisoformat(data["t"]), str(data["i"])
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def keyset_filter(cursor: Optional[str]) -> Dict[str, Any]:
+    """Filter selecting documents strictly after `cursor` in KEYSET_SORT order"""
+    if not cursor:
+        return {}
+    timestamp, message_id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": message_id}},
+        ]
+    }
+
+def search_keyset_filter(cursor: Optional[str]) -> Dict[str, Any]:
+    """Filter on the computed `score` field selecting results strictly after `cursor` in SEARCH_SORT order"""
+    if not cursor:
+        return {}
+    score, timestamp, message_id = decode_search_cursor(cursor)
+    return {
+        "$or": [
+            {"score": {"$lt": score}},
+            {"score": score, "timestamp": {"$lt": timestamp}},
+            {"score": score, "timestamp": timestamp, "id": {"$lt": message_id}},
+        ]
+    }
+
+def next_cursor(documents: list, limit: int) -> Optional[str]:
+    """Cursor for the page after `documents`, fetched with limit + 1 to detect more"""
+    if len(documents) <= limit:
+        return None
+    last = documents[limit - 1]
+    return encode_cursor(last["timestamp"], last["id"])
+
+def next_search_cursor(documents: list, limit: int) -> Optional[str]:
+    """Like next_cursor, for search results carrying a `score`"""
+    if len(documents) <= limit:
+        return None
+    last = documents[limit - 1]
+    return encode_search_cursor(last["score"], last["timestamp"], last["id"])
@@ -0,0 +1,94 @@
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from models import PortfolioSection
+
+logger = logging.getLogger(__name__)
+
+VERSION_ID = "portfolio"
+
+class PortfolioCache:
+    """In-process cache of portfolio_sections for the public site.
+
+    Requests are served from memory. Updates bump a version counter in
+    `cache_versions`; the worker that made the update drops its cache at once
+    and other workers notice the new version on their next background check.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.check_interval = float(os.environ.get('PORTFOLIO_CACHE_CHECK_SECONDS', '5'))
+        self._sections: Optional[Dict[str, PortfolioSection]] = None
+        self._version: Optional[int] = None
+        # Bumped by invalidate() so a load that raced an update is not kept
+        self._generation = 0
+        self._load_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        return self.db.portfolio_sections
+
+    @property
+    def versions(self):
+        return self.db.cache_versions
+
+    async def _read_version(self) -> int:
+        doc = await self.versions.find_one({"_id": VERSION_ID})
+        return doc["version"] if doc else 0
+
+    async def _load(self) -> Dict[str, PortfolioSection]:
+        # One loader per worker; concurrent misses wait for it instead of stampeding Mongo
+        async with self._load_lock:
+            if self._sections is not None:
+                return self._sections
+            generation = self._generation
+            version = await self._read_version()
+            documents = await self.collection.find({}, {"_id": 0}).to_list(100)
+            sections = {doc["section_name"]: PortfolioSection(**doc) for doc in documents}
+            if generation == self._generation:
+                self._sections = sections
+                self._version = version
+            return sections
+
+    async def get_sections(self) -> List[PortfolioSection]:
+        sections = self._sections
+        if sections is None:
+            sections = await self._load()
+        return list(sections.values())
+
+    async def get_section(self, section_name: str) -> Optional[PortfolioSection]:
+        sections = self._sections
+        if sections is None:
+            sections = await self._load()
+        return sections.get(section_name)
+
+    async def invalidate(self):
+        """Drop this worker's cache and tell the others via the version counter"""
+        self._generation += 1
+        self._sections = None
+        await self.versions.update_one({"_id": VERSION_ID}, {"$inc": {"version": 1}}, upsert=True)
+
+    async def run(self):
+        """Drop the cache whenever another worker has bumped the version"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                version = await self._read_version()
+                if self._version is not None and version != self._version:
+                    self._generation += 1
+                    self._sections = None
+                    await self._load()
+            except Exception as e:
+                logger.error(f"Error checking portfolio cache version: {str(e)}")
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,302 @@
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from fastapi import HTTPException
+from pymongo import monitoring
+
+from auth import verify_token
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+
+# Set for the duration of a profiled request; Motor copies it into its executor threads
+current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+def _awaited_frames(coro) -> List[Any]:
+    """Frames of a suspended task, outermost first, following the chain of awaits"""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+class Profile:
+    """Samples and await spans collected for one request"""
+
+    def __init__(self, method: str, path: str, trigger: str):
+        self.id = str(uuid.uuid4())
+        self.method = method
+        self.path = path
+        self.route = path
+        self.trigger = trigger
+        self.status: Optional[int] = None
+        self.started_at = datetime.utcnow()
+        self.duration_ms = 0.0
+        # Collapsed stack (below the route) -> microseconds attributed to it
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.awaits: List[Dict[str, Any]] = []
+        # Mongo commands and HTTP calls in flight, so off-CPU samples can be labelled with them
+        self.open_awaits: Dict[Any, str] = {}
+        self.frame = None
+        self.coro = None
+
+    def record_await(self, kind: str, name: str, seconds: float):
+        self.awaits.append({"kind": kind, "name": name, "duration_ms": round(seconds * 1000, 3)})
+
+    def summary(self) -> Dict[str, Any]:
+        awaited: Dict[str, float] = {}
+        for span in self.awaits:
+            awaited[span["kind"]] = round(awaited.get(span["kind"], 0) + span["duration_ms"], 3)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "trigger": self.trigger,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "samples": self.samples,
+            "awaited_ms": awaited,
+            "awaits": self.awaits,
+        }
+
+    def rooted_stacks(self) -> Counter:
+        # The route template is only known once routing has run, so it is prepended here
+        root = f"{self.method} {self.route}"
+        return Counter({f"{root};{stack}": weight for stack, weight in self.stacks.items()})
+
+    def collapsed(self) -> List[str]:
+        """Brendan Gregg's collapsed-stack format, weighted in microseconds"""
+        return [f"{stack} {weight}" for stack, weight in self.rooted_stacks().most_common()]
+
+class Profiler:
+    """Opt-in stack sampler for live requests.
+
+    A daemon thread wakes every `interval` seconds while at least one
+    profiled request is in flight and reads the event loop thread's stack.
+    A profiled request is on-CPU when its middleware frame is on that stack;
+    otherwise its task is suspended and the sample follows the task's chain
+    of awaits instead, ending in the Mongo command or HTTP call it waits on.
+    Finished profiles go into a bounded ring buffer.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get('PROFILER_ENABLED') == '1'
+        self.sample_rate = float(os.environ.get('PROFILER_SAMPLE_RATE', '0'))
+        self.interval = float(os.environ.get('PROFILER_INTERVAL_MS', '5')) / 1000
+        self.profiles: deque = deque(maxlen=int(os.environ.get('PROFILER_MAX_PROFILES', '50')))
+        self._active: Dict[Any, Profile] = {}
+        self._loop_thread_id: Optional[int] = None
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def should_profile(self, headers) -> Optional[str]:
+        """Why this request should be profiled ("header" or "sample"), or None"""
+        requested = False
+        authorization = ""
+        for key, value in headers:
+            key = key.lower()
+            if key == PROFILE_HEADER:
+                requested = value == b"1"
+            elif key == b"authorization":
+                authorization = value.decode("latin-1")
+        if requested and authorization.startswith("Bearer "):
+            try:
+                # Only admins may force a profile; anyone else is just sampled as usual
+                if verify_token(authorization[7:]).get("sub") == "admin":
+                    return "header"
+            except HTTPException:
+                pass
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def begin(self, profile: Profile, frame):
+        profile.frame = frame
+        profile.coro = asyncio.current_task().get_coro()
+        if self._loop_thread_id is None:
+            self._loop_thread_id = threading.get_ident()
+        self._active[frame] = profile
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def end(self, profile: Profile):
+        self._active.pop(profile.frame, None)
+        profile.frame = None
+        profile.coro = None
+        self.profiles.append(profile)
+
+    def _sample_loop(self):
+        last = time.perf_counter()
+        while self._running:
+            if not self._active:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                last = time.perf_counter()
+                continue
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            try:
+                self._sample(int((now - last) * 1_000_000))
+            except Exception as e:
+                logger.error(f"Error sampling request stacks: {str(e)}")
+            last = now
+
+    def _sample(self, weight_us: int):
+        top = sys._current_frames().get(self._loop_thread_id)
+        stack = []
+        frame = top
+        on_cpu = None
+        while frame is not None:
+            profile = self._active.get(frame)
+            if profile is not None:
+                on_cpu = profile
+                break
+            stack.append(frame)
+            frame = frame.f_back
+        if on_cpu is not None:
+            stack.reverse()
+            self._add(on_cpu, [_frame_label(f) for f in stack], weight_us)
+
+        for profile in list(self._active.values()):
+            if profile is on_cpu or profile.coro is None:
+                continue
+            frames = _awaited_frames(profile.coro)
+            # Only the frames below the profiling middleware belong to the request
+            for i, f in enumerate(frames):
+                if f is profile.frame:
+                    frames = frames[i + 1:]
+                    break
+            labels = [_frame_label(f) for f in frames]
+            waits = list(profile.open_awaits.values())
+            labels.append(waits[-1] if waits else "[await]")
+            self._add(profile, labels, weight_us)
+
+    def _add(self, profile: Profile, labels: List[str], weight_us: int):
+        profile.stacks[";".join(labels)] += weight_us
+        profile.samples += 1
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def collapsed(self, route: Optional[str] = None) -> List[str]:
+        """Stacks merged across every buffered profile, optionally for one route"""
+        merged: Counter = Counter()
+        for profile in list(self.profiles):
+            if route is None or profile.route == route:
+                merged.update(profile.rooted_stacks())
+        return [f"{stack} {weight}" for stack, weight in merged.most_common()]
+
+    def stop(self):
+        if self._thread is not None:
+            self._running = False
+            self._wakeup.set()
+            self._thread.join(timeout=1)
+            self._thread = None
+
+profiler = Profiler()
+
+@contextmanager
+def await_span(kind: str, name: str):
+    """Time an awaited external call for the current request's profile, if it has one"""
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    key = object()
+    profile.open_awaits[key] = f"[{kind}] {name}"
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.open_awaits.pop(key, None)
+        profile.record_await(kind, name, time.perf_counter() - started)
+
+class ProfilerCommandListener(monitoring.CommandListener):
+    """Attributes Mongo command time to the profiled request that issued it"""
+
+    def started(self, event):
+        profile = current_profile.get()
+        if profile is not None:
+            target = event.command.get(event.command_name)
+            collection = target if isinstance(target, str) else event.command.get("collection", "")
+            profile.open_awaits[(event.connection_id, event.request_id)] = f"[mongo] {collection}.{event.command_name}"
+
+    def _finish(self, event):
+        profile = current_profile.get()
+        if profile is not None:
+            name = profile.open_awaits.pop((event.connection_id, event.request_id), f"[mongo] {event.command_name}")
+            profile.record_await("mongo", name[len("[mongo] "):], event.duration_micros / 1_000_000)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+class ProfilerMiddleware:
+    """Profiles sampled or admin-requested requests (`X-Profile: 1` with an admin token).
+
+    Only installed when PROFILER_ENABLED=1, so a disabled profiler costs nothing.
+    Header-triggered responses carry `X-Profile-Id` for the admin endpoints.
+    """
+
+    def __init__(self, app, profiler: Profiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        trigger = self.profiler.should_profile(scope["headers"]) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], trigger)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if trigger == "header":
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode("latin-1"))]}
+            await send(message)
+
+        token = current_profile.set(profile)
+        self.profiler.begin(profile, sys._getframe())
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            if route is not None:
+                profile.route = route.path
+            self.profiler.end(profile)
+            current_profile.reset(token)
@@ -0,0 +1,118 @@
+import os
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+
+def parse_limit(spec: str) -> Tuple[float, float]:
+    """"<capacity>/<seconds>" -> (burst capacity, tokens refilled per second)"""
+    capacity, period = spec.split("/")
+    return float(capacity), float(capacity) / float(period)
+
+class MemoryTokenBucketStore:
+    """Token buckets in process memory, sharded into bounded LRU maps.
+
+    Each bucket is a two-item list [tokens, last_refill]. A shard holds at
+    most `max_keys_per_shard` buckets; adding one more evicts the least
+    recently used, so `take` is O(1) and memory stays bounded however many
+    clients show up. An evicted client starts again with a full bucket.
+    """
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 4096):
+        self._shards: List[OrderedDict] = [OrderedDict() for _ in range(shards)]
+        self.max_keys_per_shard = max_keys_per_shard
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    async def take(self, key: str, burst: float, rate: float) -> float:
+        """Consume one token; return 0 if allowed, otherwise seconds until one is available"""
+        now = time.monotonic()
+        shard = self._shards[hash(key) % len(self._shards)]
+        bucket = shard.get(key)
+        if bucket is None:
+            if len(shard) >= self.max_keys_per_shard:
+                shard.popitem(last=False)
+            bucket = shard[key] = [burst, now]
+        else:
+            shard.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate
+
+class MongoTokenBucketStore:
+    """Token buckets shared by all workers, refilled and consumed atomically in Mongo"""
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db.rate_limits
+
+    async def take(self, key: str, burst: float, rate: float) -> float:
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        bucket = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    # TTL index removes buckets once they would have refilled anyway
+                    "expires_at": now + timedelta(seconds=burst / rate),
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / rate
+
+class RateLimiter:
+    """Builds per-route FastAPI dependencies keyed on client IP"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def limit(self, route: str, spec: str):
+        burst, rate = parse_limit(spec)
+
+        async def dependency(request: Request):
+            client_ip = request.client.host if request.client else "unknown"
+            retry_after = await self.store.take(f"{route}:{client_ip}", burst, rate)
+            if retry_after:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests. Please try again later.",
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
+
+        return dependency
+
+def create_store(db):
+    """RATE_LIMIT_BACKEND=memory (one process) or mongo (shared across workers).
+
+    The default follows WEB_CONCURRENCY, which uvicorn also reads for its
+    worker count: per-process buckets would give each client its quota
+    once per worker. Each `take` on the mongo store is a database write, so
+    use it only for low-volume routes.
+    """
+    workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+    backend = os.environ.get('RATE_LIMIT_BACKEND', 'mongo' if workers > 1 else 'memory')
+    if backend == 'mongo':
+        return MongoTokenBucketStore(db)
+    if backend == 'memory':
+        return MemoryTokenBucketStore()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
@@ -0,0 +1,204 @@
+import os
+import gzip
+import json
+import asyncio
+import logging
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterator
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = "retention"
+CHUNK_SUFFIX = ".jsonl.gz"
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S%f"
+
+def midnight(timestamp: datetime) -> datetime:
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+class RetentionManager:
+    """Retention tiers for the two collections that grow without bound.
+
+    Page views: hourly analytics buckets older than PAGE_VIEW_RETENTION_DAYS
+    are compacted into daily buckets, and the raw documents expire through
+    the TTL index that ensure_indexes puts on `page_views.timestamp`.
+
+    Contact messages older than CONTACT_ARCHIVE_AFTER_DAYS are moved to
+    gzip-compressed JSONL chunks under ARCHIVE_DIR, oldest first, and removed
+    from the collection once their chunk is on disk. Chunk names carry the
+    time range they cover, so reads only open the chunks they need.
+
+    Both tiers are off (0 days) unless configured. One worker at a time runs
+    a pass, under a lease in `retention_state`.
+    """
+
+    def __init__(self, db, analytics):
+        self.db = db
+        self.analytics = analytics
+        self.page_view_days = int(os.environ.get('PAGE_VIEW_RETENTION_DAYS', '0'))
+        self.contact_archive_days = int(os.environ.get('CONTACT_ARCHIVE_AFTER_DAYS', '0'))
+        self.archive_dir = Path(os.environ.get('ARCHIVE_DIR', str(Path(__file__).parent / 'archive')))
+        self.chunk_size = int(os.environ.get('ARCHIVE_CHUNK_SIZE', '1000'))
+        self.interval = float(os.environ.get('RETENTION_INTERVAL_SECONDS', '3600'))
+        self.lease_seconds = float(os.environ.get('RETENTION_LEASE_SECONDS', '600'))
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    @property
+    def state(self):
+        return self.db.retention_state
+
+    @property
+    def contact_archive_path(self) -> Path:
+        return self.archive_dir / "contact_messages"
+
+    def raw_since(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Start of the first whole day whose raw data is still complete, or None without retention"""
+        days = [d for d in (self.page_view_days, self.contact_archive_days) if d > 0]
+        if not days:
+            return None
+        return midnight((now or datetime.utcnow()) - timedelta(days=min(days))) + timedelta(days=1)
+
+    async def _acquire(self, now: datetime) -> bool:
+        try:
+            doc = await self.state.find_one_and_update(
+                {"_id": STATE_ID, "$or": [{"locked_until": {"$lte": now}}, {"locked_until": None}]},
+                {"$set": {"locked_until": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another worker holds the lease: the upsert collides with its document
+            return False
+        return doc is not None
+
+    async def _release(self):
+        await self.state.update_one({"_id": STATE_ID}, {"$set": {"locked_until": None}})
+
+    async def compact_page_views(self, now: datetime) -> int:
+        """Fold hourly buckets older than the page-view retention into daily ones"""
+        if self.page_view_days <= 0:
+            return 0
+        horizon = midnight(now - timedelta(days=self.page_view_days))
+        state = await self.state.find_one({"_id": STATE_ID}) or {}
+        compacted_through = state.get("compacted_through")
+        if compacted_through is not None and compacted_through >= horizon:
+            return 0
+        days = await self.analytics.compact(compacted_through, horizon)
+        # The watermark moves before the hourly buckets go, so a rerun never recomputes a half-deleted day
+        await self.state.update_one({"_id": STATE_ID}, {"$set": {"compacted_through": horizon}})
+        await self.analytics.drop_hourly_before(horizon)
+        return days
+
+    def _write_chunk(self, messages: List[Dict[str, Any]]) -> Path:
+        first, last = messages[0], messages[-1]
+        # Named after its first message, so a pass repeated after a crash rewrites the same chunk
+        name = f"{first['timestamp'].strftime(TIMESTAMP_FORMAT)}_{last['timestamp'].strftime(TIMESTAMP_FORMAT)}_{first['id'][:8]}{CHUNK_SUFFIX}"
+        directory = self.contact_archive_path / first["timestamp"].strftime("%Y-%m")
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / name
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for message in messages:
+                f.write(json.dumps(message, default=_json_default, separators=(",", ":")) + "\n")
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    async def archive_contact_messages(self, now: datetime) -> int:
+        """Move messages older than the archive threshold to disk, one chunk at a time"""
+        if self.contact_archive_days <= 0:
+            return 0
+        cutoff = now - timedelta(days=self.contact_archive_days)
+        archived = 0
+        while True:
+            messages = await self.db.contact_messages.find(
+                {"timestamp": {"$lt": cutoff}}, {"_id": 0}
+            ).sort([("timestamp", 1), ("id", 1)]).limit(self.chunk_size).to_list(self.chunk_size)
+            if not messages:
+                break
+            path = await asyncio.to_thread(self._write_chunk, messages)
+            ids = [message["id"] for message in messages]
+            unread = await self.db.contact_messages.delete_many({"id": {"$in": ids}, "read": False})
+            rest = await self.db.contact_messages.delete_many({"id": {"$in": ids}})
+            await self.analytics.record_messages_archived(unread.deleted_count + rest.deleted_count, unread.deleted_count)
+            archived += len(messages)
+            logger.info(f"Archived {len(messages)} contact messages to {path.name}")
+            if len(messages) < self.chunk_size:
+                break
+        return archived
+
+    async def run_once(self) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        if not await self._acquire(now):
+            return {"skipped": True}
+        try:
+            return {
+                "skipped": False,
+                "compacted_days": await self.compact_page_views(now),
+                "archived_messages": await self.archive_contact_messages(now),
+            }
+        finally:
+            await self._release()
+
+    def list_chunks(self) -> List[Dict[str, Any]]:
+        chunks = []
+        for path in sorted(self.contact_archive_path.glob(f"*/*{CHUNK_SUFFIX}")):
+            start, end, _ = path.name[:-len(CHUNK_SUFFIX)].split("_")
+            chunks.append({
+                "file": f"{path.parent.name}/{path.name}",
+                "from": datetime.strptime(start, TIMESTAMP_FORMAT),
+                "to": datetime.strptime(end, TIMESTAMP_FORMAT),
+                "bytes": path.stat().st_size,
+            })
+        return chunks
+
+    def iter_archived_messages(self, after: Optional[datetime] = None, before: Optional[datetime] = None) -> Iterator[bytes]:
+        """NDJSON lines of archived messages in [after, before), reading only overlapping chunks.
+
+        A plain generator: Starlette iterates it in a worker thread, so the
+        blocking gzip reads stay off the event loop.
+        """
+        for chunk in self.list_chunks():
+            if (after and chunk["to"] < after) or (before and chunk["from"] >= before):
+                continue
+            with gzip.open(self.contact_archive_path / chunk["file"], "rt", encoding="utf-8") as f:
+                for line in f:
+                    if after or before:
+                        timestamp = datetime.fromisoformat(json.loads(line)["timestamp"])
+                        if (after and timestamp < after) or (before and timestamp >= before):
+                            continue
+                    yield line.encode("utf-8")
+
+    async def run(self):
+        """Apply retention every `interval` seconds until stopped"""
+        while self._running:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error applying retention: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.page_view_days <= 0 and self.contact_archive_days <= 0:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,87 @@
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from pagination import (
+    KEYSET_SORT, SEARCH_SORT, keyset_filter, next_cursor,
+    search_keyset_filter, next_search_cursor
+)
+
+class ContactMessageSearch:
+    """Admin inbox search backed by the text index on contact_messages.
+
+    `q` is matched against name, email, subject and message through the
+    text index and ranked by textScore (subject and sender weigh more than
+    the body). `email_prefix` is an anchored regex on the email index.
+    Without `q` results come back newest first, like the inbox.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db.contact_messages
+
+    def _filters(
+        self,
+        email_prefix: Optional[str],
+        read: Optional[bool],
+        replied: Optional[bool],
+        archived: Optional[bool],
+        after: Optional[datetime],
+        before: Optional[datetime]
+    ) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if email_prefix:
+            # Anchored, case-sensitive regexes keep the scan within tight email index bounds,
+            # so the common casings are tried instead of a case-insensitive match
+            variants = dict.fromkeys([email_prefix, email_prefix.lower(), email_prefix.capitalize()])
+            query["email"] = {"$in": [re.compile("^" + re.escape(variant)) for variant in variants]}
+        for field, value in (("read", read), ("replied", replied), ("archived", archived)):
+            if value is not None:
+                # Documents written before a flag existed lack the field, which means false
+                query[field] = True if value else {"$ne": True}
+        if after or before:
+            query["timestamp"] = {}
+            if after:
+                query["timestamp"]["$gte"] = after
+            if before:
+                query["timestamp"]["$lt"] = before
+        return query
+
+    async def search(
+        self,
+        q: Optional[str] = None,
+        email_prefix: Optional[str] = None,
+        read: Optional[bool] = None,
+        replied: Optional[bool] = None,
+        archived: Optional[bool] = None,
+        after: Optional[datetime] = None,
+        before: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of matches and the cursor for the next; raises ValueError for a bad cursor"""
+        query = self._filters(email_prefix, read, replied, archived, after, before)
+
+        if not q:
+            query.update(keyset_filter(cursor))
+            documents = await self.collection.find(query, {"_id": 0}).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+            return documents[:limit], next_cursor(documents, limit)
+
+        query["$text"] = {"$search": q}
+        pipeline = [
+            {"$match": query},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        keyset = search_keyset_filter(cursor)
+        if keyset:
+            pipeline.append({"$match": keyset})
+        pipeline += [
+            {"$sort": SEARCH_SORT},
+            {"$limit": limit + 1},
+            {"$project": {"_id": 0}},
+        ]
+        documents = await self.collection.aggregate(pipeline).to_list(limit + 1)
+        return documents[:limit], next_search_cursor(documents, limit)
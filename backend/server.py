@@ -1,19 +1,25 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer
 from dotenv import load_dotenv
+from pymongo import monitoring
+from pymongo.errors import PyMongoError, DuplicateKeyError
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
 import os
+import hmac
+import asyncio
 import logging
 from pathlib import Path
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Import our models
 from models import (
-    ContactMessage, ContactMessageCreate, ContactResponse,
+    ContactMessage, ContactMessageCreate, ContactMessagePage, ContactResponse, EmailDelivery,
+    ContactMessageBulkAction, ContactMessageBulkResult, ContactMessageSearchHit, ContactMessageSearchPage,
     AdminLogin, AdminToken, PortfolioSection, PortfolioUpdate,
-    AnalyticsData, PageView
+    AnalyticsData, AnalyticsTimeSeries, TimeSeriesPoint, PageView
 )
 
 
@@ -28,18 +34,88 @@ else:
 # Import services after loading environment variables
 from auth import authenticate_admin, create_access_token, get_current_admin
 from email_service import email_service
+from email_templates import email_templates
+from outbox import EmailOutbox
+from page_view_buffer import PageViewBuffer
+from analytics import AnalyticsRollups, GRANULARITIES, naive_utc
+from indexes import ensure_indexes, verify_query_plans
+from pagination import KEYSET_SORT, keyset_filter, next_cursor
+from portfolio_cache import PortfolioCache
+from http_cache import HTTPCacheMiddleware, http_cache_stats
+from rate_limit import RateLimiter, MemoryTokenBucketStore, create_store
+from database import Database
+from message_actions import ContactMessageActions
+from search import ContactMessageSearch
+from retention import RetentionManager
+from exports import Exporter, EXPORT_FIELDS, FORMATS as EXPORT_FORMATS
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry,
+    MetricsMiddleware, EventLoopMonitor, ErrorCountingHandler,
+    page_view_buffer_pending, email_outbox_jobs, email_circuit_state, email_timeout_seconds,
+    duplicate_submissions_total
+)
+from circuit_breaker import STATE_VALUES as CIRCUIT_STATE_VALUES
+from profiler import profiler, ProfilerMiddleware, ProfilerCommandListener
+from deadline import DeadlineMiddleware, run_within_budget, finish_deferred
+from dedup import SubmissionDeduplicator
+
+# MongoDB connection, opened per process by the app lifespan
+db = Database()
+
+# Contact-form emails are delivered from a durable outbox by a background worker
+email_outbox = EmailOutbox(db, email_service)
+
+# Dashboard counters are maintained incrementally on every write path
+analytics_rollups = AnalyticsRollups(db)
+
+# Bulk read/unread/replied/archive/delete for the admin dashboard
+message_actions = ContactMessageActions(db, analytics_rollups)
+
+# Ranked text search over the admin inbox
+message_search = ContactMessageSearch(db)
+
+# Page-view compaction/TTL and the cold archive of old contact messages
+retention = RetentionManager(db, analytics_rollups)
+
+# Streaming NDJSON/CSV exports for the admin
+exporter = Exporter(db)
+
+# Exact and near-duplicate contact submissions are merged instead of stored
+deduplicator = SubmissionDeduplicator(db)
+
+# Per-IP token buckets for the unauthenticated write endpoints. Contact buckets follow
+# RATE_LIMIT_BACKEND; page-view buckets stay in each worker's memory, since a shared bucket
+# would put a MongoDB write back on every tracked view
+rate_limiter = RateLimiter(create_store(db))
+page_view_rate_limiter = RateLimiter(MemoryTokenBucketStore())
+contact_rate_limit = rate_limiter.limit("contact", os.environ.get('RATE_LIMIT_CONTACT', '5/600'))
+page_view_rate_limit = page_view_rate_limiter.limit("page-view", os.environ.get('RATE_LIMIT_PAGE_VIEW', '60/60'))
+
+# Public portfolio content is served from memory and invalidated on update
+portfolio_cache = PortfolioCache(db)
+
+# Page views are buffered in-process and written in bulk
+page_view_buffer = PageViewBuffer(db, on_flush=analytics_rollups.record_page_views)
+
+# Event loop lag sampling, which also folds in Mongo timings recorded on driver threads
+event_loop_monitor = EventLoopMonitor()
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+page_view_buffer_pending.set_function(lambda: len(page_view_buffer))
+email_circuit_state.set_function(lambda: CIRCUIT_STATE_VALUES[email_service.breaker.state])
+email_timeout_seconds.set_function(lambda: email_service.breaker.timeout)
 
-# Create the main app without a prefix
-app = FastAPI()
+async def collect_outbox_depth():
+    for job_status, count in (await email_outbox.count_by_status()).items():
+        email_outbox_jobs.set(count, job_status)
+
+metrics_registry.add_collector(collect_outbox_depth)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Prometheus scrape endpoint, served at the root like other exporters
+metrics_router = APIRouter()
+
 
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
@@ -47,34 +123,63 @@ async def root():
     return {"message": "Portfolio API is running"}
 
 # Contact Form Endpoints
-@api_router.post("/contact", response_model=ContactResponse)
+@api_router.post("/contact", response_model=ContactResponse, dependencies=[Depends(contact_rate_limit)])
 async def submit_contact_form(contact_data: ContactMessageCreate, request: Request):
+    received = ContactResponse(
+        success=True,
+        message="Thank you for your message! I'll get back to you soon."
+    )
     try:
+        # Repeats are merged into the original: no new document, no emails, same answer to the sender
+        fingerprint = deduplicator.check(contact_data.dict())
+        if fingerprint.duplicate_of and await deduplicator.merge({"id": fingerprint.duplicate_of}):
+            duplicate_submissions_total.inc("exact" if fingerprint.exact else "near")
+            return received
+        
         # Create contact message document
         contact_message = ContactMessage(**contact_data.dict())
+        dedup_key = deduplicator.window_key(fingerprint)
         
-        # Save to database
-        await db.contact_messages.insert_one(contact_message.dict())
+        # Storing the message is the one step the response waits for; it runs under the request deadline
+        try:
+            # emails_queued stays false until the outbox jobs exist; the outbox sweep repairs messages left without them
+            await db.contact_messages.insert_one({
+                **contact_message.dict(),
+                "dedup_key": dedup_key,
+                "emails_queued": False
+            })
+        except DuplicateKeyError:
+            # The unique dedup_key index catches exact repeats within the window, including ones another worker stored
+            await deduplicator.merge({"dedup_key": dedup_key})
+            duplicate_submissions_total.inc("exact")
+            return received
+        deduplicator.remember(contact_message.id, fingerprint)
         
-        # Send email notifications
-        email_sent = await email_service.send_contact_notification(contact_data.dict())
-        auto_reply_sent = await email_service.send_auto_reply(contact_data.dict())
-        
-        # Track analytics
-        await track_page_view("contact_submission", request)
+        # From here on the message is stored and the visitor gets a success. The emails are queued before
+        # responding so they are durable; analytics run alongside and may finish in the background
+        await asyncio.gather(
+            queue_contact_emails(contact_message.id, contact_data.dict()),
+            run_within_budget({
+                "record_contact": analytics_rollups.record_contact(contact_message.dict()),
+                "track_page_view": track_page_view("contact_submission", request),
+            })
+        )
         
-        if email_sent:
-            return ContactResponse(
-                success=True,
-                message="Thank you for your message! I'll get back to you soon."
-            )
-        else:
-            # Even if email fails, we saved the message
-            return ContactResponse(
-                success=True,
-                message="Your message has been received. I'll get back to you soon."
-            )
+        return received
             
+    except PyMongoError as e:
+        if not e.timeout:
+            logger.error(f"Error processing contact form: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to send message. Please try again later."
+            )
+        logger.warning(f"Contact form store ran out of time: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The service is busy. Please try again in a moment.",
+            headers={"Retry-After": "5"}
+        )
     except Exception as e:
         logger.error(f"Error processing contact form: {str(e)}")
         raise HTTPException(
@@ -82,10 +187,30 @@ async def submit_contact_form(contact_data: ContactMessageCreate, request: Reque
             detail="Failed to send message. Please try again later."
         )
 
+# Public Portfolio Content
+@api_router.get("/portfolio", response_model=List[PortfolioSection])
+async def get_public_portfolio():
+    try:
+        return await portfolio_cache.get_sections()
+    except Exception as e:
+        logger.error(f"Error fetching public portfolio: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch portfolio data")
+
+@api_router.get("/portfolio/{section_name}", response_model=PortfolioSection)
+async def get_public_portfolio_section(section_name: str):
+    try:
+        section = await portfolio_cache.get_section(section_name)
+    except Exception as e:
+        logger.error(f"Error fetching public portfolio section: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch portfolio data")
+    if section is None:
+        raise HTTPException(status_code=404, detail="Portfolio section not found")
+    return section
+
 # Admin Authentication
 @api_router.post("/admin/login", response_model=AdminToken)
 async def admin_login(credentials: AdminLogin):
-    if not authenticate_admin(credentials.password):
+    if not await authenticate_admin(credentials.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid admin credentials"
@@ -95,19 +220,74 @@ async def admin_login(credentials: AdminLogin):
     return AdminToken(access_token=access_token)
 
 # Admin Dashboard Endpoints
-@api_router.get("/admin/contact-messages")
+@api_router.get("/admin/http-stats")
+async def get_http_stats(admin=Depends(get_current_admin)):
+    return http_cache_stats.as_dict()
+
+@api_router.get("/admin/contact-messages", response_model=ContactMessagePage)
 async def get_contact_messages(
-    skip: int = 0, 
     limit: int = 50,
+    cursor: Optional[str] = None,
+    unread_only: bool = False,
+    archived: bool = False,
     admin=Depends(get_current_admin)
 ):
+    limit = max(1, min(limit, 100))
     try:
-        messages = await db.contact_messages.find().sort("timestamp", -1).skip(skip).limit(limit).to_list(limit)
-        return [ContactMessage(**msg) for msg in messages]
+        query = keyset_filter(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if unread_only:
+        query["read"] = False
+    # Archived messages are listed separately; older documents have no `archived` field
+    query["archived"] = True if archived else {"$ne": True}
+    try:
+        # One extra document tells us whether another page exists
+        messages = await db.contact_messages.find(query).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+        return ContactMessagePage(
+            messages=[ContactMessage(**msg) for msg in messages[:limit]],
+            next_cursor=next_cursor(messages, limit)
+        )
     except Exception as e:
         logger.error(f"Error fetching contact messages: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch messages")
 
+@api_router.get("/admin/contact-messages/search", response_model=ContactMessageSearchPage)
+async def search_contact_messages(
+    q: Optional[str] = None,
+    email: Optional[str] = None,
+    read: Optional[bool] = None,
+    replied: Optional[bool] = None,
+    archived: Optional[bool] = None,
+    after: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    admin=Depends(get_current_admin)
+):
+    limit = max(1, min(limit, 100))
+    try:
+        messages, cursor = await message_search.search(
+            q=q.strip() if q else None,
+            email_prefix=email,
+            read=read,
+            replied=replied,
+            archived=archived,
+            after=naive_utc(after) if after else None,
+            before=naive_utc(before) if before else None,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except Exception as e:
+        logger.error(f"Error searching contact messages: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to search messages")
+    return ContactMessageSearchPage(
+        messages=[ContactMessageSearchHit(**msg) for msg in messages],
+        next_cursor=cursor
+    )
+
 @api_router.put("/admin/contact-messages/{message_id}/read")
 async def mark_message_read(message_id: str, admin=Depends(get_current_admin)):
     try:
@@ -115,38 +295,182 @@ async def mark_message_read(message_id: str, admin=Depends(get_current_admin)):
             {"id": message_id},
             {"$set": {"read": True}}
         )
-        if result.modified_count == 0:
+        if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Message not found")
+        await analytics_rollups.record_read_change(result.modified_count)
         return {"success": True, "message": "Message marked as read"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error marking message as read: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to update message")
 
+@api_router.post("/admin/contact-messages/bulk", response_model=ContactMessageBulkResult)
+async def bulk_update_messages(bulk_action: ContactMessageBulkAction, admin=Depends(get_current_admin)):
+    try:
+        result = await message_actions.apply(
+            bulk_action.action,
+            ids=bulk_action.ids,
+            message_filter=bulk_action.filter.dict() if bulk_action.filter else None
+        )
+        return ContactMessageBulkResult(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error applying bulk {bulk_action.action}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to update messages")
+
+@api_router.get("/admin/contact-messages/{message_id}/delivery", response_model=List[EmailDelivery])
+async def get_message_delivery(message_id: str, admin=Depends(get_current_admin)):
+    try:
+        deliveries = await email_outbox.get_deliveries(message_id)
+        return [EmailDelivery(**delivery) for delivery in deliveries]
+    except Exception as e:
+        logger.error(f"Error fetching delivery status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch delivery status")
+
+@api_router.get("/admin/email/circuit")
+async def get_email_circuit(admin=Depends(get_current_admin)):
+    # The breaker is per worker process; the queue is shared
+    try:
+        return {
+            "worker": os.getpid(),
+            **email_service.breaker.snapshot(),
+            "queued": await email_outbox.count_by_status(),
+        }
+    except Exception as e:
+        logger.error(f"Error fetching email circuit state: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch email circuit state")
+
 @api_router.get("/admin/analytics", response_model=AnalyticsData)
 async def get_analytics(admin=Depends(get_current_admin)):
     try:
-        # Get contact form statistics
-        total_messages = await db.contact_messages.count_documents({})
-        unread_messages = await db.contact_messages.count_documents({"read": False})
-        
-        # Get page views
-        page_views = await db.page_views.count_documents({})
-        
-        # Get last contact timestamp
-        last_contact_doc = await db.contact_messages.find().sort("timestamp", -1).limit(1).to_list(1)
-        last_contact = last_contact_doc[0]["timestamp"] if last_contact_doc else None
-        
-        return AnalyticsData(
-            page_views=page_views,
-            contact_submissions=total_messages,
-            total_messages=total_messages,
-            unread_messages=unread_messages,
-            last_contact=last_contact
-        )
+        # Single read of the incrementally maintained rollup document
+        totals = await analytics_rollups.get_totals()
+        return AnalyticsData(**totals)
     except Exception as e:
         logger.error(f"Error fetching analytics: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch analytics")
 
+@api_router.get("/admin/analytics/timeseries", response_model=AnalyticsTimeSeries)
+async def get_analytics_timeseries(
+    granularity: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    split_by_page: bool = False,
+    page: Optional[str] = None,
+    admin=Depends(get_current_admin)
+):
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    try:
+        points = await analytics_rollups.time_series(start, end, granularity, split_by_page, page)
+        return AnalyticsTimeSeries(
+            granularity=granularity,
+            start=start,
+            end=end,
+            points=[TimeSeriesPoint(**point) for point in points]
+        )
+    except Exception as e:
+        logger.error(f"Error fetching analytics time series: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch analytics time series")
+
+@api_router.post("/admin/analytics/reconcile", response_model=AnalyticsData)
+async def reconcile_analytics(admin=Depends(get_current_admin)):
+    try:
+        # Flush buffered page views first so they are not counted twice
+        await page_view_buffer.flush()
+        # Only the window whose raw data is still complete is recomputed
+        totals = await analytics_rollups.reconcile(raw_since=retention.raw_since())
+        return AnalyticsData(**totals)
+    except Exception as e:
+        logger.error(f"Error reconciling analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to reconcile analytics")
+
+# Data export
+@api_router.get("/admin/export/{collection}")
+async def export_collection(
+    collection: str,
+    format: str = "ndjson",
+    fields: Optional[str] = None,
+    after: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    admin=Depends(get_current_admin)
+):
+    if collection not in EXPORT_FIELDS:
+        raise HTTPException(status_code=404, detail=f"Exportable collections: {', '.join(EXPORT_FIELDS)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    try:
+        export_fields = exporter.resolve_fields(collection, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"{collection}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{format}"
+    return StreamingResponse(
+        exporter.stream(
+            collection,
+            format,
+            export_fields,
+            after=naive_utc(after) if after else None,
+            before=naive_utc(before) if before else None
+        ),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Retention and archive
+@api_router.post("/admin/retention/run")
+async def run_retention(admin=Depends(get_current_admin)):
+    try:
+        return await retention.run_once()
+    except Exception as e:
+        logger.error(f"Error applying retention: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to apply retention")
+
+@api_router.get("/admin/archive/contact-messages/chunks")
+async def list_archive_chunks(admin=Depends(get_current_admin)):
+    return retention.list_chunks()
+
+@api_router.get("/admin/archive/contact-messages")
+async def stream_archived_messages(
+    after: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    admin=Depends(get_current_admin)
+):
+    # NDJSON streamed straight from the gzip chunks; nothing is loaded into memory
+    return StreamingResponse(
+        retention.iter_archived_messages(
+            after=naive_utc(after) if after else None,
+            before=naive_utc(before) if before else None
+        ),
+        media_type="application/x-ndjson"
+    )
+
+# Request profiles (PROFILER_ENABLED=1)
+def require_profiler():
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+
+@api_router.get("/admin/profiles", dependencies=[Depends(require_profiler)])
+async def list_profiles(admin=Depends(get_current_admin)):
+    return [profile.summary() for profile in reversed(profiler.profiles)]
+
+@api_router.get("/admin/profiles/collapsed", response_class=PlainTextResponse, dependencies=[Depends(require_profiler)])
+async def get_collapsed_profiles(route: Optional[str] = None, admin=Depends(get_current_admin)):
+    # Collapsed stacks of every buffered profile, ready for flamegraph.pl or speedscope
+    return "\n".join(profiler.collapsed(route)) + "\n"
+
+@api_router.get("/admin/profiles/{profile_id}/collapsed", response_class=PlainTextResponse, dependencies=[Depends(require_profiler)])
+async def get_collapsed_profile(profile_id: str, admin=Depends(get_current_admin)):
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return "\n".join(profile.collapsed()) + "\n"
+
 # Portfolio Management
 @api_router.get("/admin/portfolio")
 async def get_portfolio_data(admin=Depends(get_current_admin)):
@@ -170,12 +494,20 @@ async def update_portfolio_section(
             {"$set": section_data.dict()},
             upsert=True
         )
+        await portfolio_cache.invalidate()
         
         return {"success": True, "message": "Portfolio section updated successfully"}
     except Exception as e:
         logger.error(f"Error updating portfolio section: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to update portfolio section")
 
+async def queue_contact_emails(message_id: str, contact: dict):
+    try:
+        await email_outbox.enqueue_contact_emails(message_id, contact)
+    except Exception as e:
+        # The message keeps emails_queued false, so the outbox sweep queues them later
+        logger.error(f"Error queueing emails for message {message_id}: {str(e)}")
+
 # Analytics tracking helper
 async def track_page_view(page: str, request: Request):
     try:
@@ -184,34 +516,111 @@ async def track_page_view(page: str, request: Request):
             user_agent=request.headers.get("user-agent"),
             ip_address=request.client.host if request.client else None
         )
-        await db.page_views.insert_one(page_view.dict())
+        await page_view_buffer.add(page_view.dict())
     except Exception as e:
         logger.error(f"Error tracking page view: {str(e)}")
 
 # Page view tracking endpoint
-@api_router.post("/track/page-view")
+@api_router.post("/track/page-view", dependencies=[Depends(page_view_rate_limit)])
 async def track_page(request: Request, page: str = "home"):
     await track_page_view(page, request)
     return {"success": True}
 
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    # Optional shared secret for scrapers; without METRICS_TOKEN the endpoint is open
+    token = os.environ.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(await metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+logging.getLogger().addHandler(ErrorCountingHandler())
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def startup():
+    """Open this process's connections and start its background workers"""
+    # Compiled before serving, so a broken template fails the deploy rather than the first send
+    email_templates.load()
+    db.connect()
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Error creating indexes: {str(e)}")
+    # Test mode: refuse to start if any hot query would scan a whole collection
+    # (tests/test_indexes.py runs the same check against the mongod at TEST_MONGO_URL)
+    if os.environ.get('VERIFY_QUERY_PLANS') == '1':
+        collscans = await verify_query_plans(db)
+        if collscans:
+            raise RuntimeError(f"Hot queries without a supporting index: {', '.join(collscans)}")
+    try:
+        await analytics_rollups.ensure_backfilled()
+    except Exception as e:
+        logger.error(f"Error backfilling analytics rollups: {str(e)}")
+    try:
+        await deduplicator.warm()
+    except Exception as e:
+        logger.error(f"Error loading recent submissions for duplicate detection: {str(e)}")
+    await email_outbox.start()
+    page_view_buffer.start()
+    portfolio_cache.start()
+    retention.start()
+    event_loop_monitor.start()
+
+async def shutdown():
+    await event_loop_monitor.stop()
+    profiler.stop()
+    # Contact steps deferred past their request budget still need the database
+    await finish_deferred()
+    await email_outbox.stop()
+    await portfolio_cache.stop()
+    await retention.stop()
+    await page_view_buffer.stop()
+    await email_service.close()
+    db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+def create_app() -> FastAPI:
+    """Build the ASGI app; each worker process runs its own lifespan"""
+    app = FastAPI(lifespan=lifespan)
+
+    # Include the router in the main app
+    app.include_router(api_router)
+    app.include_router(metrics_router)
+
+    # ETags, 304s and compression for JSON responses; CORS stays outermost
+    app.add_middleware(HTTPCacheMiddleware)
+
+    # Opt-in request profiling; nothing is installed unless PROFILER_ENABLED=1
+    if profiler.enabled:
+        app.add_middleware(ProfilerMiddleware)
+        # Registered globally so the Motor client created by the lifespan picks it up
+        monitoring.register(ProfilerCommandListener())
+
+    # Per-route deadlines, applied to Mongo operations; inside the metrics so overruns show in latency too
+    app.add_middleware(DeadlineMiddleware, routes=app.router.routes)
+
+    # Request counts and latency per route template, including compression time
+    app.add_middleware(MetricsMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+app = create_app()
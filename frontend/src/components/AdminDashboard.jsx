@@ -3,6 +3,18 @@ import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Button } from './ui/button';
 import { Input } from './ui/input';
 import { Badge } from './ui/badge';
+import { Checkbox } from './ui/checkbox';
+import {
+  AlertDialog,
+  AlertDialogAction,
+  AlertDialogCancel,
+  AlertDialogContent,
+  AlertDialogDescription,
+  AlertDialogFooter,
+  AlertDialogHeader,
+  AlertDialogTitle,
+  AlertDialogTrigger
+} from './ui/alert-dialog';
 import { 
   Mail, 
   Eye, 
@@ -99,6 +111,7 @@ const AdminDashboard = () => {
   const [token, setToken] = useState(localStorage.getItem('admin_token'));
   const [analytics, setAnalytics] = useState(null);
   const [messages, setMessages] = useState([]);
+  const [selectedIds, setSelectedIds] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
   const { toast } = useToast();
 
@@ -123,7 +136,7 @@ const AdminDashboard = () => {
   const fetchMessages = async () => {
     try {
       const response = await axios.get(`${API}/admin/contact-messages?limit=10`, axiosConfig);
-      setMessages(response.data);
+      setMessages(response.data.messages);
     } catch (error) {
       console.error('Error fetching messages:', error);
       if (error.response?.status === 401) {
@@ -132,21 +145,44 @@ const AdminDashboard = () => {
     }
   };
 
-  const markAsRead = async (messageId) => {
+  const bulkActionLabels = {
+    read: 'marked as read',
+    unread: 'marked as unread',
+    replied: 'marked as replied',
+    archive: 'archived',
+    delete: 'deleted'
+  };
+
+  const applyBulkAction = async (action, ids) => {
     try {
-      await axios.put(`${API}/admin/contact-messages/${messageId}/read`, {}, axiosConfig);
-      // Update local state
-      setMessages(messages.map(msg => 
-        msg.id === messageId ? { ...msg, read: true } : msg
-      ));
-      // Refresh analytics
-      fetchAnalytics();
+      const response = await axios.post(
+        `${API}/admin/contact-messages/bulk`,
+        { action, ids },
+        axiosConfig
+      );
+      const changed = new Set(
+        response.data.results.filter(r => r.status !== 'not_found').map(r => r.id)
+      );
+      // Update local state; the response already carries the new analytics totals
+      if (action === 'archive' || action === 'delete') {
+        setMessages(messages.filter(msg => !changed.has(msg.id)));
+      } else {
+        const updates = { read: { read: true }, unread: { read: false }, replied: { replied: true } }[action];
+        setMessages(messages.map(msg =>
+          changed.has(msg.id) ? { ...msg, ...updates } : msg
+        ));
+      }
+      setAnalytics(response.data.analytics);
+      setSelectedIds([]);
       toast({
-        title: "Message marked as read",
+        title: ids.length === 1 ? `Message ${bulkActionLabels[action]}` : `${response.data.modified} messages ${bulkActionLabels[action]}`,
         description: "Message status updated successfully."
       });
     } catch (error) {
-      console.error('Error marking message as read:', error);
+      console.error(`Error applying ${action} to messages:`, error);
+      if (error.response?.status === 401) {
+        handleLogout();
+      }
       toast({
         title: "Error",
         description: "Failed to update message status.",
@@ -155,6 +191,15 @@ const AdminDashboard = () => {
     }
   };
 
+  const markAsRead = (messageId) => applyBulkAction('read', [messageId]);
+
+  const toggleSelected = (messageId, checked) => {
+    setSelectedIds(checked
+      ? [...selectedIds, messageId]
+      : selectedIds.filter(id => id !== messageId)
+    );
+  };
+
   const handleLogout = () => {
     localStorage.removeItem('admin_token');
     setToken(null);
@@ -273,10 +318,67 @@ const AdminDashboard = () => {
         {/* Recent Messages */}
         <Card className="bg-slate-800 border-slate-700">
           <CardHeader>
-            <CardTitle className="text-white flex items-center gap-2">
-              <MessageSquare className="w-5 h-5" />
-              Recent Contact Messages
-            </CardTitle>
+            <div className="flex justify-between items-center">
+              <CardTitle className="text-white flex items-center gap-2">
+                <MessageSquare className="w-5 h-5" />
+                Recent Contact Messages
+              </CardTitle>
+              {selectedIds.length > 0 && (
+                <div className="flex items-center gap-2">
+                  <span className="text-gray-400 text-sm">{selectedIds.length} selected</span>
+                  <Button
+                    size="sm"
+                    onClick={() => applyBulkAction('read', selectedIds)}
+                    className="bg-cyan-500 hover:bg-cyan-400 text-white"
+                  >
+                    Mark Read
+                  </Button>
+                  <Button
+                    size="sm"
+                    onClick={() => applyBulkAction('replied', selectedIds)}
+                    className="bg-slate-600 hover:bg-slate-500 text-white"
+                  >
+                    Mark Replied
+                  </Button>
+                  <Button
+                    size="sm"
+                    onClick={() => applyBulkAction('archive', selectedIds)}
+                    className="bg-slate-600 hover:bg-slate-500 text-white"
+                  >
+                    Archive
+                  </Button>
+                  <AlertDialog>
+                    <AlertDialogTrigger asChild>
+                      <Button
+                        size="sm"
+                        className="bg-red-600 hover:bg-red-500 text-white"
+                      >
+                        Delete
+                      </Button>
+                    </AlertDialogTrigger>
+                    <AlertDialogContent className="bg-slate-800 border-slate-700">
+                      <AlertDialogHeader>
+                        <AlertDialogTitle className="text-white">
+                          Delete {selectedIds.length === 1 ? 'this message' : `${selectedIds.length} messages`}?
+                        </AlertDialogTitle>
+                        <AlertDialogDescription className="text-gray-400">
+                          Deleted messages cannot be recovered. Archive them instead to keep a copy.
+                        </AlertDialogDescription>
+                      </AlertDialogHeader>
+                      <AlertDialogFooter>
+                        <AlertDialogCancel>Cancel</AlertDialogCancel>
+                        <AlertDialogAction
+                          onClick={() => applyBulkAction('delete', selectedIds)}
+                          className="bg-red-600 hover:bg-red-500 text-white"
+                        >
+                          Delete
+                        </AlertDialogAction>
+                      </AlertDialogFooter>
+                    </AlertDialogContent>
+                  </AlertDialog>
+                </div>
+              )}
+            </div>
           </CardHeader>
           <CardContent>
             {messages.length === 0 ? (
@@ -295,12 +397,22 @@ const AdminDashboard = () => {
                     <div className="flex justify-between items-start mb-3">
                       <div className="flex-1">
                         <div className="flex items-center gap-2 mb-1">
+                          <Checkbox
+                            checked={selectedIds.includes(message.id)}
+                            onCheckedChange={(checked) => toggleSelected(message.id, checked === true)}
+                            aria-label={`Select message from ${message.name}`}
+                          />
                           <h4 className="text-white font-semibold">{message.name}</h4>
                           {!message.read && (
                             <Badge className="bg-cyan-500 text-white text-xs">
                               New
                             </Badge>
                           )}
+                          {message.duplicate_count > 0 && (
+                            <Badge className="bg-gray-600 text-white text-xs" title="Repeated submissions merged into this message">
+                              ×{message.duplicate_count + 1}
+                            </Badge>
+                          )}
                         </div>
                         <p className="text-gray-400 text-sm">{message.email}</p>
                       </div>
@@ -0,0 +1,44 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# The backend modules import each other by bare name, as they do when uvicorn runs from backend/
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'portfolio_test')
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def db():
+    """A fresh in-memory database per test"""
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()[os.environ['DB_NAME']]
+
+@pytest.fixture
+async def mongod():
+    """A throwaway database on the mongod at TEST_MONGO_URL, for what the in-memory stand-in cannot run"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo.errors import PyMongoError
+
+    url = os.environ.get('TEST_MONGO_URL')
+    if not url:
+        pytest.skip("TEST_MONGO_URL is not set")
+    client = AsyncIOMotorClient(url, serverSelectionTimeoutMS=2000)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError as e:
+        client.close()
+        pytest.skip(f"No mongod at TEST_MONGO_URL: {e}")
+    name = f"portfolio_test_{uuid.uuid4().hex[:8]}"
+    yield client[name]
+    await client.drop_database(name)
+    client.close()
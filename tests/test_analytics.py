@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from analytics import AnalyticsRollups, GLOBAL_ID, bucket_matches
+from message_actions import ContactMessageActions
+from models import ContactMessage, PageView
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2024, 3, 1, 9, 30)
+
+async def add_message(db, rollups, timestamp, **fields):
+    # What the contact endpoint does: store the message, then count it
+    message = ContactMessage(
+        name="Visitor", email="visitor@example.com", subject="Hello", message="Hi there",
+        timestamp=timestamp, **fields
+    ).dict()
+    await db.contact_messages.insert_one(dict(message))
+    await rollups.record_contact(message)
+    return message["id"]
+
+async def add_page_views(db, rollups, views):
+    # What a page-view buffer flush does
+    documents = [PageView(page=page, timestamp=timestamp).dict() for page, timestamp in views]
+    await db.page_views.insert_many([dict(doc) for doc in documents])
+    await rollups.record_page_views(documents)
+
+async def snapshot(db):
+    """Every rollup counter except last_contact, which reconcile() may legitimately move backwards"""
+    counters = {}
+    for doc in await db.analytics_rollups.find().to_list(None):
+        key = doc.pop("_id")
+        doc.pop("last_contact", None)
+        # $inc leaves zero-valued counters behind that reconcile() does not write
+        counters[key] = {field: value for field, value in doc.items() if value}
+    return {key: values for key, values in counters.items() if values}
+
+async def test_incremental_counters_match_reconcile(db):
+    rollups = AnalyticsRollups(db)
+    actions = ContactMessageActions(db, rollups)
+    ids = [await add_message(db, rollups, START + timedelta(hours=7 * i)) for i in range(6)]
+    await add_message(db, rollups, START + timedelta(days=1), read=True)
+    await add_page_views(db, rollups, [
+        ("home", START),
+        ("home", START + timedelta(minutes=5)),
+        ("projects", START + timedelta(days=1, hours=2)),
+        ("contact_submission", START + timedelta(hours=7)),
+    ])
+
+    await actions.apply("read", ids=ids[:3])
+    await actions.apply("unread", ids=ids[1:2])
+    # One read and one unread message deleted, on different days
+    await actions.apply("delete", ids=[ids[0], ids[5]])
+
+    incremental = await snapshot(db)
+    totals = await rollups.get_totals()
+    assert totals["total_messages"] == 5
+    assert totals["unread_messages"] == 3
+    assert totals["contact_submissions"] == 5
+    assert totals["page_views"] == 4
+
+    await rollups.reconcile()
+    assert await snapshot(db) == incremental
+
+async def test_deleting_a_compacted_day_matches_reconcile(db):
+    rollups = AnalyticsRollups(db)
+    old = await add_message(db, rollups, START)
+    await add_message(db, rollups, START + timedelta(hours=1))
+    await add_message(db, rollups, START + timedelta(days=2))
+    await add_page_views(db, rollups, [("home", START), ("home", START + timedelta(days=2))])
+
+    # Retention: the first day is folded into the daily tier and its raw page views expire
+    cutoff = START.replace(hour=0, minute=30) + timedelta(days=1)
+    await rollups.compact(None, cutoff)
+    await rollups.drop_hourly_before(cutoff)
+    await db.page_views.delete_many({"timestamp": {"$lt": cutoff}})
+    assert await db.analytics_daily.count_documents({}) == 2
+
+    await ContactMessageActions(db, rollups).apply("delete", ids=[old])
+    incremental = await snapshot(db)
+
+    await rollups.reconcile(raw_since=cutoff)
+    assert await snapshot(db) == incremental
+    assert (await rollups.get_totals())["contact_submissions"] == 2
+
+async def test_archiving_leaves_submission_history(db):
+    rollups = AnalyticsRollups(db)
+    first = await add_message(db, rollups, START)
+    await add_message(db, rollups, START + timedelta(hours=1))
+
+    await db.contact_messages.delete_one({"id": first})
+    await rollups.record_messages_archived(1, 1)
+
+    totals = await rollups.get_totals()
+    assert (totals["total_messages"], totals["unread_messages"], totals["contact_submissions"]) == (1, 1, 2)
+
+async def test_backfill_builds_rollups_once(db):
+    rollups = AnalyticsRollups(db)
+    await db.contact_messages.insert_one(ContactMessage(
+        name="Visitor", email="visitor@example.com", subject="Hello", message="Hi", timestamp=START
+    ).dict())
+
+    await rollups.ensure_backfilled()
+    assert (await rollups.get_totals())["total_messages"] == 1
+
+    await db.analytics_rollups.update_one({"_id": GLOBAL_ID}, {"$set": {"total_messages": 7}})
+    await rollups.ensure_backfilled()
+    assert (await rollups.get_totals())["total_messages"] == 7
+
+class RacingCollection:
+    """Runs `race` once, just before the next bulk_write reaches the collection"""
+
+    def __init__(self, collection, race):
+        self.collection = collection
+        self.race = race
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def bulk_write(self, operations, **kwargs):
+        race, self.race = self.race, None
+        if race:
+            await race()
+        return await self.collection.bulk_write(operations, **kwargs)
+
+async def test_reconcile_keeps_increments_to_counters_that_were_right(db, monkeypatch):
+    rollups = AnalyticsRollups(db)
+    await add_message(db, rollups, START)
+    await add_page_views(db, rollups, [("home", START), ("home", START + timedelta(hours=1))])
+    # Drift on one counter, so reconcile has something to write
+    await db.analytics_rollups.update_one({"_id": "day:2024-03-01"}, {"$inc": {"contact_submissions": 5}})
+
+    # A page view is counted after reconcile has recomputed everything, before it writes
+    racing = RacingCollection(db.analytics_rollups, lambda: add_page_views(db, rollups, [("home", START)]))
+    monkeypatch.setattr(AnalyticsRollups, "collection", property(lambda self: racing))
+    await rollups.reconcile()
+    monkeypatch.undo()
+
+    counters = await snapshot(db)
+    assert counters["page:home"] == {"page_views": 3}
+    assert counters["day:2024-03-01"]["contact_submissions"] == 1
+    await rollups.reconcile()
+    assert await snapshot(db) == counters
+
+def test_a_mid_day_start_keeps_that_compacted_day():
+    hourly, daily = bucket_matches(START, START + timedelta(days=2), page="home")
+    assert hourly == {"bucket": {"$gte": datetime(2024, 3, 1, 9), "$lt": START + timedelta(days=2)}, "page": "home"}
+    assert daily == {"bucket": {"$gte": datetime(2024, 3, 1), "$lt": START + timedelta(days=2)}, "page": "home"}
+
+async def test_time_series_over_compacted_data_from_a_mid_day_start(mongod):
+    """$unionWith and $dateTrunc need a real mongod"""
+    rollups = AnalyticsRollups(mongod)
+    await add_page_views(mongod, rollups, [
+        ("home", START), ("home", START + timedelta(hours=3)), ("home", START + timedelta(days=1, hours=1)),
+    ])
+    # The first day is folded into one daily bucket at midnight
+    cutoff = START.replace(hour=0, minute=0) + timedelta(days=1)
+    await rollups.compact(None, cutoff)
+    await rollups.drop_hourly_before(cutoff)
+
+    series = await rollups.time_series(START, START + timedelta(days=2), granularity="day")
+
+    assert [(point["bucket"], point["page_views"]) for point in series] == [
+        (datetime(2024, 3, 1), 2), (datetime(2024, 3, 2), 1)
+    ]
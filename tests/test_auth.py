@@ -0,0 +1,77 @@
+import time
+import asyncio
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+import auth
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", "test-secret")
+    monkeypatch.setattr(auth, "_token_cache", auth.OrderedDict())
+
+def token(seconds: float, **claims) -> str:
+    return jwt.encode({"sub": "admin", "exp": int(time.time() + seconds), **claims}, auth.JWT_SECRET, algorithm=auth.ALGORITHM)
+
+async def test_password_check_does_not_block_the_event_loop(monkeypatch):
+    hashed = auth.get_password_hash("correct horse")
+    monkeypatch.setattr(auth, "ADMIN_PASSWORD_HASH", hashed)
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        assert await auth.authenticate_admin("correct horse")
+        assert not await auth.authenticate_admin("wrong")
+    finally:
+        task.cancel()
+    # Two bcrypt checks take far longer than one tick; the loop kept running through them
+    assert ticks >= 2
+
+async def test_verified_token_is_served_from_the_cache(monkeypatch):
+    value = token(60)
+    assert auth.verify_token(value)["sub"] == "admin"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("decoded again")
+
+    monkeypatch.setattr(auth.jwt, "decode", fail)
+    assert auth.verify_token(value)["sub"] == "admin"
+
+async def test_cached_token_is_rejected_once_expired(monkeypatch):
+    value = token(60)
+    auth.verify_token(value)
+    later = time.time() + 120
+    monkeypatch.setattr(auth.time, "time", lambda: later)
+
+    def expired(*args, **kwargs):
+        raise jwt.ExpiredSignatureError()
+
+    monkeypatch.setattr(auth.jwt, "decode", expired)
+
+    with pytest.raises(HTTPException) as error:
+        auth.verify_token(value)
+    assert error.value.status_code == 401
+    assert value not in auth._token_cache
+
+async def test_token_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(auth, "TOKEN_CACHE_SIZE", 2)
+    first, second, third = token(60, n=1), token(60, n=2), token(60, n=3)
+    for value in (first, second, third):
+        auth.verify_token(value)
+    assert list(auth._token_cache) == [second, third]
+
+async def test_invalid_token_is_not_cached():
+    with pytest.raises(HTTPException):
+        auth.verify_token("not-a-token")
+    assert not auth._token_cache
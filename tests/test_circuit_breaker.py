@@ -0,0 +1,95 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    monkeypatch.setenv('EMAIL_BREAKER_FAILURES', '3')
+    monkeypatch.setenv('EMAIL_BREAKER_OPEN_SECONDS', '30')
+    monkeypatch.setenv('EMAIL_BREAKER_PROBES', '2')
+    monkeypatch.setenv('EMAIL_MIN_TIMEOUT_SECONDS', '2')
+    monkeypatch.setenv('EMAIL_TIMEOUT_MULTIPLIER', '3')
+    monkeypatch.setenv('EMAIL_TIMEOUT_MIN_SAMPLES', '20')
+    return CircuitBreaker("test", max_timeout=10)
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record_failure("HTTP 503")
+
+def test_full_cycle_closed_open_half_open_closed(breaker, clock):
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+    fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.retry_in() == 30
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    assert breaker.retry_in() == 0
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        # One probe at a time
+        breaker.before_call()
+    breaker.record_success(0.1)
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+def test_failed_probe_reopens_for_a_full_period(breaker, clock):
+    fail(breaker, 3)
+    clock.now += 30
+    fail(breaker)
+    assert breaker.state == OPEN
+    clock.now += 29
+    assert breaker.state == OPEN
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+
+def test_only_consecutive_failures_open_the_circuit(breaker):
+    for _ in range(5):
+        fail(breaker, 2)
+        breaker.before_call()
+        breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+
+def test_cancelled_probe_lets_the_next_one_through(breaker, clock):
+    fail(breaker, 3)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_cancelled()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+
+def test_timeout_follows_recent_latency_within_bounds(breaker):
+    assert breaker.timeout == 10
+    for _ in range(19):
+        breaker.record_success(1.0)
+    # Not enough samples yet
+    assert breaker.timeout == 10
+    breaker.record_success(1.0)
+    assert breaker.timeout == pytest.approx(3.0)
+    for _ in range(200):
+        breaker.record_success(0.05)
+    assert breaker.timeout == 2
+    for _ in range(200):
+        breaker.record_success(8.0)
+    assert breaker.timeout == 10
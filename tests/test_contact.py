@@ -0,0 +1,114 @@
+import time
+
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+SUBMISSION = {
+    "name": "Jane Doe",
+    "email": "jane@acme.com",
+    "subject": "Data platform role",
+    "message": "Hi, I am hiring a data engineer for our Azure platform team and would love to talk this week.",
+}
+
+@pytest.fixture
+async def app(db, monkeypatch):
+    """The API wired to the test database, without the lifespan's background workers"""
+    import server
+    from dedup import SubmissionDeduplicator
+    from rate_limit import MemoryTokenBucketStore
+
+    monkeypatch.setattr(server.db, "_database", db)
+    monkeypatch.setattr(server.rate_limiter, "store", MemoryTokenBucketStore())
+    monkeypatch.setattr(server, "deduplicator", SubmissionDeduplicator(server.db))
+    return server
+
+@pytest.fixture
+async def client(app):
+    transport = httpx.ASGITransport(app=app.app, client=("198.51.100.7", 40000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+async def test_submission_is_stored_counted_and_queued(app, client, db):
+    response = await client.post("/api/contact", json=SUBMISSION)
+
+    assert response.status_code == 200
+    message = await db.contact_messages.find_one()
+    assert message["emails_queued"] is True
+    assert sorted(job["kind"] for job in await db.email_outbox.find().to_list(None)) == ["auto_reply", "notification"]
+    assert (await app.analytics_rollups.get_totals())["contact_submissions"] == 1
+
+async def test_failed_rollup_after_store_still_succeeds(app, client, db, monkeypatch):
+    async def broken(message):
+        raise RuntimeError("rollup write failed")
+    monkeypatch.setattr(app.analytics_rollups, "record_contact", broken)
+
+    response = await client.post("/api/contact", json=SUBMISSION)
+
+    assert response.status_code == 200
+    assert await db.contact_messages.count_documents({}) == 1
+    assert await db.email_outbox.count_documents({}) == 2
+
+async def test_failed_enqueue_is_repaired_by_the_outbox_sweep(app, client, db, monkeypatch):
+    async def broken(message_id, contact):
+        raise RuntimeError("outbox write failed")
+    monkeypatch.setattr(app.email_outbox, "enqueue_contact_emails", broken)
+
+    response = await client.post("/api/contact", json=SUBMISSION)
+    assert response.status_code == 200
+    assert (await db.contact_messages.find_one())["emails_queued"] is False
+    assert await db.email_outbox.count_documents({}) == 0
+
+    monkeypatch.delattr(app.email_outbox, "enqueue_contact_emails")
+    monkeypatch.setattr(app.email_outbox, "sweep_grace", 0)
+    assert await app.email_outbox.sweep() == 1
+    assert (await db.contact_messages.find_one())["emails_queued"] is True
+    jobs = await db.email_outbox.find().to_list(None)
+    assert {job["payload"]["email"] for job in jobs} == {SUBMISSION["email"]}
+    assert len(jobs) == 2
+
+async def test_similar_message_from_another_sender_is_stored(app, client, db):
+    assert (await client.post("/api/contact", json=SUBMISSION)).status_code == 200
+    other = dict(SUBMISSION, name="Raj Patel", email="raj@globex.io")
+    assert (await client.post("/api/contact", json=other)).status_code == 200
+
+    messages = await db.contact_messages.find().to_list(None)
+    assert sorted(message["email"] for message in messages) == ["jane@acme.com", "raj@globex.io"]
+    assert await db.email_outbox.count_documents({}) == 4
+
+async def test_exact_repeat_is_merged_and_counted_as_exact(app, client, db):
+    exact = app.duplicate_submissions_total._values.get(("exact",), 0)
+    for _ in range(2):
+        assert (await client.post("/api/contact", json=SUBMISSION)).status_code == 200
+
+    assert await db.contact_messages.count_documents({}) == 1
+    assert await db.email_outbox.count_documents({}) == 2
+    assert app.duplicate_submissions_total._values.get(("exact",), 0) == exact + 1
+
+async def another_worker(app, db, monkeypatch, days_later=0):
+    """The unique dedup index and a second worker with an empty window, `days_later`"""
+    from indexes import INDEXES
+    await db.contact_messages.create_indexes([
+        index for index in INDEXES["contact_messages"] if "dedup_key" in index.document["key"]
+    ])
+    worker = type(app.deduplicator)(app.db)
+    window_key = worker.window_key
+    monkeypatch.setattr(worker, "window_key", lambda fingerprint: window_key(fingerprint, time.time() + days_later * 86400))
+    monkeypatch.setattr(app, "deduplicator", worker)
+
+async def test_exact_repeat_stored_by_another_worker_is_merged(app, client, db, monkeypatch):
+    assert (await client.post("/api/contact", json=SUBMISSION)).status_code == 200
+    await another_worker(app, db, monkeypatch)
+
+    assert (await client.post("/api/contact", json=SUBMISSION)).status_code == 200
+    assert await db.contact_messages.count_documents({}) == 1
+    assert (await db.contact_messages.find_one())["duplicate_count"] == 1
+
+async def test_exact_repeat_after_the_window_is_stored_again(app, client, db, monkeypatch):
+    assert (await client.post("/api/contact", json=SUBMISSION)).status_code == 200
+    await another_worker(app, db, monkeypatch, days_later=30)
+
+    assert (await client.post("/api/contact", json=SUBMISSION)).status_code == 200
+    assert await db.contact_messages.count_documents({}) == 2
+    assert await db.email_outbox.count_documents({}) == 4
@@ -0,0 +1,64 @@
+import time
+
+import httpx
+import pytest
+
+from deadline import current_deadline, timeout_within
+from email_service import EmailService
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def budget():
+    """Run the test as if inside a request with `seconds` of budget left, or outside one with None"""
+    def start(seconds):
+        current_deadline.set(None if seconds is None else time.monotonic() + seconds)
+    yield start
+    current_deadline.set(None)
+
+def test_timeout_within_is_cut_to_the_budget_left(budget):
+    assert timeout_within(10) == 10
+    budget(0.5)
+    assert 0.4 < timeout_within(10) <= 0.5
+    assert timeout_within(0.1) == 0.1
+    budget(-1)
+    assert timeout_within(10) == 0.001
+
+@pytest.fixture
+def email_service(monkeypatch):
+    monkeypatch.setenv('SENDINBLUE_API_KEY', 'test-key')
+    monkeypatch.setenv('ADMIN_EMAIL', 'admin@example.com')
+    return EmailService()
+
+async def test_email_send_inside_a_request_gets_the_budget_left(email_service, budget):
+    timeouts = []
+
+    def handler(request):
+        timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(201, json={"messageId": "<test@local>"})
+    email_service.transport = httpx.MockTransport(handler)
+
+    await email_service._post_email({"to": []}, "notification")
+    budget(0.5)
+    await email_service._post_email({"to": []}, "notification")
+    await email_service.close()
+
+    assert timeouts[0] == email_service.breaker.timeout
+    assert 0.4 < timeouts[1] <= 0.5
+
+async def test_running_out_of_budget_is_not_a_provider_failure(email_service, budget):
+    def handler(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+    email_service.transport = httpx.MockTransport(handler)
+
+    budget(0.5)
+    with pytest.raises(httpx.ReadTimeout):
+        await email_service._post_email({"to": []}, "notification")
+    assert email_service.breaker.snapshot()["consecutive_failures"] == 0
+
+    # Outside a request the same timeout is the provider's
+    budget(None)
+    with pytest.raises(httpx.ReadTimeout):
+        await email_service._post_email({"to": []}, "notification")
+    await email_service.close()
+    assert email_service.breaker.snapshot()["consecutive_failures"] == 1
@@ -0,0 +1,52 @@
+import pytest
+
+from dedup import SubmissionDeduplicator
+
+# Long enough that one added word moves the SimHash well within the distance for any hash salt
+MESSAGE = (
+    "Hi, I am hiring a data engineer for our Azure platform team and would love to talk this week about the role. "
+    "The team owns ingestion, the warehouse and the reporting layer, and works closely with product and finance. "
+    "Let me know a few times that suit you and I will send an invite."
+)
+
+def contact(email="jane@acme.com", subject="Data platform role", message=MESSAGE):
+    return {"email": email, "subject": subject, "message": message}
+
+@pytest.fixture
+def deduplicator(monkeypatch):
+    monkeypatch.setenv('DEDUP_WINDOW_SIZE', '10')
+    monkeypatch.setenv('DEDUP_WINDOW_SECONDS', '60')
+    return SubmissionDeduplicator(db=None)
+
+def remember(deduplicator, message_id, submission, seen_at=None):
+    deduplicator.remember(message_id, deduplicator.check(submission), seen_at)
+
+def test_exact_repeat_is_found_as_exact(deduplicator):
+    remember(deduplicator, "first", contact())
+    fingerprint = deduplicator.check(contact(email=" Jane@ACME.com", message=MESSAGE.upper()))
+    assert (fingerprint.duplicate_of, fingerprint.exact) == ("first", True)
+
+def test_near_repeat_from_the_same_sender_is_found(deduplicator):
+    remember(deduplicator, "first", contact())
+    fingerprint = deduplicator.check(contact(message=MESSAGE + " Thanks"))
+    assert (fingerprint.duplicate_of, fingerprint.exact) == ("first", False)
+
+def test_same_text_from_another_sender_is_not_merged(deduplicator):
+    remember(deduplicator, "first", contact())
+    assert deduplicator.check(contact(email="raj@globex.io")).duplicate_of is None
+    assert deduplicator.check(contact(email="raj@globex.io", message=MESSAGE + " Thanks")).duplicate_of is None
+
+def test_short_messages_are_only_matched_exactly(deduplicator):
+    remember(deduplicator, "first", contact(subject="Hi", message="Are you free to talk?"))
+    assert deduplicator.check(contact(subject="Hi", message="Are you free to talk today?")).duplicate_of is None
+    assert deduplicator.check(contact(subject="Hi", message="Are you free to talk?")).duplicate_of == "first"
+
+def test_window_drops_old_and_overflowing_messages(deduplicator):
+    remember(deduplicator, "old", contact(), seen_at=0)
+    assert deduplicator.check(contact()).duplicate_of is None
+    remember(deduplicator, "first", contact())
+    for i in range(10):
+        remember(deduplicator, f"other-{i}", contact(email=f"sender{i}@example.com"))
+    assert len(deduplicator) == 10
+    assert deduplicator.check(contact()).duplicate_of is None
+    assert deduplicator.check(contact(email="sender9@example.com")).duplicate_of == "other-9"
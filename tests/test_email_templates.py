@@ -0,0 +1,96 @@
+import pytest
+
+from email_templates import EmailTemplates, BRAND
+
+CONTACT = {
+    "name": "Jane <b>Doe</b>",
+    "email": "jane@acme.com",
+    "subject": "Data role\r\nBcc: someone@example.com",
+    "message": "First line\nSecond & last line",
+}
+
+@pytest.fixture
+def shipped():
+    templates = EmailTemplates()
+    templates.load()
+    return templates
+
+def write_templates(directory, files):
+    for name, source in files.items():
+        (directory / name).write_text(source)
+    return EmailTemplates(directory)
+
+def test_shipped_templates_all_load(shipped):
+    assert shipped.names == ["auto_reply", "notification", "notification_digest"]
+
+def test_html_is_escaped_and_text_is_not(shipped):
+    email = shipped.render("notification", CONTACT)
+
+    assert "Jane &lt;b&gt;Doe&lt;/b&gt;" in email.html
+    assert "First line<br>\nSecond &amp; last line" in email.html
+    assert "Name: Jane <b>Doe</b>" in email.text
+    assert "Second & last line" in email.text
+
+def test_subject_cannot_carry_extra_header_lines(shipped):
+    subject = shipped.render("notification", CONTACT).subject
+    assert "\n" not in subject and "\r" not in subject
+    assert subject == "New Contact Form Submission: Data role Bcc: someone@example.com"
+
+def test_brand_values_are_available_to_every_template(shipped):
+    email = shipped.render("auto_reply", CONTACT)
+    assert BRAND["owner_name"] in email.html
+    assert BRAND["linkedin_url"] in email.text
+
+def test_digest_lists_every_message(shipped):
+    messages = [dict(CONTACT, name=f"Sender {i}") for i in range(3)]
+    email = shipped.render("notification_digest", {"messages": messages, "count": 3})
+    assert all(f"Sender {i}" in email.text for i in range(3))
+
+def test_missing_variable_fails_the_render(shipped):
+    from jinja2 import UndefinedError
+
+    with pytest.raises(UndefinedError, match="subject"):
+        shipped.render("notification", {"name": "Jane", "email": "jane@acme.com", "message": "hi"})
+
+def test_unknown_template_is_a_key_error(shipped):
+    with pytest.raises(KeyError):
+        shipped.render("welcome", CONTACT)
+
+def test_templates_without_variables_are_rendered_once(tmp_path, monkeypatch):
+    templates = write_templates(tmp_path, {
+        "ping.subject.txt": "Ping from {{ form_name }}",
+        "ping.txt": "Nothing to see",
+        "hello.subject.txt": "Hello {{ name }}",
+        "hello.txt": "Hi {{ name }}",
+    })
+    templates.load()
+    assert set(templates._static) == {("ping", "subject"), ("ping", "text")}
+
+    def fail(*args, **kwargs):
+        raise AssertionError("rendered again")
+
+    monkeypatch.setattr(templates._compiled["ping"]["text"], "render", fail)
+    assert templates.render("ping", {}).text == "Nothing to see"
+    assert templates.render("hello", {"name": "Jane"}).text == "Hi Jane"
+
+def test_template_including_a_variable_partial_is_not_static(tmp_path):
+    templates = write_templates(tmp_path, {
+        "_signature.txt": "Sent to {{ email }}",
+        "note.subject.txt": "Note",
+        "note.txt": "Hello\n{% include '_signature.txt' %}",
+    })
+    templates.load()
+    assert ("note", "text") not in templates._static
+    assert templates.render("note", {"email": "jane@acme.com"}).text == "Hello\nSent to jane@acme.com"
+
+def test_template_without_a_body_fails_load(tmp_path):
+    templates = write_templates(tmp_path, {"orphan.subject.txt": "Just a subject"})
+    with pytest.raises(ValueError, match="orphan"):
+        templates.load()
+
+def test_syntax_error_fails_load(tmp_path):
+    from jinja2 import TemplateSyntaxError
+
+    templates = write_templates(tmp_path, {"broken.subject.txt": "Hi", "broken.txt": "{% if name %}unclosed"})
+    with pytest.raises(TemplateSyntaxError):
+        templates.load()
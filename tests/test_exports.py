@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+import auth
+from exports import Exporter, EXPORT_FIELDS
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2024, 3, 1)
+
+async def export(db, collection, export_format, fields, **window):
+    chunks = [chunk async for chunk in Exporter(db).stream(collection, export_format, fields, **window)]
+    return b"".join(chunks).decode("utf-8")
+
+async def store_page_views(db, count):
+    await db.page_views.insert_many([
+        {"id": f"view-{i}", "timestamp": START + timedelta(hours=i), "page": "home", "ip_address": "198.51.100.7"}
+        for i in range(count)
+    ])
+
+async def test_ndjson_has_one_object_per_document_with_only_the_requested_fields(db):
+    await store_page_views(db, 3)
+
+    lines = (await export(db, "page_views", "ndjson", ["id", "timestamp", "page"])).splitlines()
+
+    assert [json.loads(line) for line in lines] == [
+        {"id": f"view-{i}", "timestamp": (START + timedelta(hours=i)).isoformat(), "page": "home"} for i in range(3)
+    ]
+
+async def test_csv_has_a_header_and_empty_cells_for_missing_fields(db):
+    await store_page_views(db, 2)
+
+    rows = list(csv.reader(io.StringIO(await export(db, "page_views", "csv", ["id", "page", "user_agent"]))))
+
+    assert rows == [["id", "page", "user_agent"], ["view-0", "home", ""], ["view-1", "home", ""]]
+
+async def test_after_and_before_bound_the_export(db):
+    await store_page_views(db, 5)
+
+    lines = (await export(db, "page_views", "ndjson", ["id"], after=START + timedelta(hours=1), before=START + timedelta(hours=3))).splitlines()
+
+    assert [json.loads(line)["id"] for line in lines] == ["view-1", "view-2"]
+
+async def test_rows_are_streamed_in_chunks_of_about_chunk_bytes(db, monkeypatch):
+    monkeypatch.setenv("EXPORT_CHUNK_BYTES", "200")
+    monkeypatch.setenv("EXPORT_BATCH_SIZE", "7")
+    await store_page_views(db, 50)
+
+    chunks = [chunk async for chunk in Exporter(db).stream("page_views", "ndjson", ["id", "timestamp", "page"])]
+
+    assert len(chunks) > 10
+    # A chunk is cut at the first row boundary past the threshold, never mid-row
+    assert all(chunk.endswith(b"\n") and len(chunk) < 300 for chunk in chunks)
+    assert len(b"".join(chunks).splitlines()) == 50
+
+def test_requested_fields_come_back_in_column_order():
+    exporter = Exporter(db=None)
+    assert exporter.resolve_fields("page_views", "page, id") == ["id", "page"]
+    assert exporter.resolve_fields("page_views", None) == EXPORT_FIELDS["page_views"]
+    with pytest.raises(ValueError, match="password"):
+        exporter.resolve_fields("page_views", "id,password")
+
+@pytest.mark.parametrize("text", ["=HYPERLINK(\"http://evil\")", "+1+1", "-2+3", "@SUM(A1)", "\tx", "\rx"])
+async def test_csv_cells_that_a_spreadsheet_would_evaluate_are_quoted(db, text):
+    await db.contact_messages.insert_one({
+        "id": "msg-0", "timestamp": datetime(2024, 3, 1), "name": text, "message": "plain", "duplicate_count": -1
+    })
+
+    rows = list(csv.reader(io.StringIO(await export(db, "contact_messages", "csv", ["name", "message", "duplicate_count"]))))
+
+    assert rows[1] == ["'" + text, "plain", "-1"]
+
+@pytest.fixture
+async def client(db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server.exporter, "db", db)
+    monkeypatch.setattr(auth, "JWT_SECRET", "test-secret")
+    token = auth.create_access_token({"sub": "admin"})
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers={"Authorization": f"Bearer {token}"}) as client:
+        yield client
+
+async def test_export_endpoint_streams_an_attachment(client, db):
+    await store_page_views(db, 3)
+
+    response = await client.get("/api/admin/export/page_views", params={"format": "csv", "fields": "id,page"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"].startswith('attachment; filename="page_views-')
+    assert response.text.splitlines()[0] == "id,page"
+
+@pytest.mark.parametrize("path, params, status", [
+    ("/api/admin/export/rate_limits", {}, 404),
+    ("/api/admin/export/page_views", {"format": "xlsx"}, 400),
+    ("/api/admin/export/page_views", {"fields": "id,password"}, 400),
+])
+async def test_export_endpoint_rejects_bad_requests(client, path, params, status):
+    assert (await client.get(path, params=params)).status_code == status
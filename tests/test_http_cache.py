@@ -0,0 +1,82 @@
+import gzip
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from http_cache import HTTPCacheMiddleware, HTTPCacheStats
+
+pytestmark = pytest.mark.anyio
+
+ITEMS = [{"id": i, "name": f"item {i}"} for i in range(100)]
+
+@pytest.fixture
+def stats():
+    return HTTPCacheStats()
+
+@pytest.fixture
+async def client(stats):
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items():
+        return ITEMS
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse("x" * 4096)
+
+    app.add_middleware(HTTPCacheMiddleware, minimum_size=1024, stats=stats)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+async def test_matching_etag_gets_an_empty_304(client, stats):
+    first = await client.get("/items", headers={"Accept-Encoding": "identity"})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = await client.get("/items", headers={"Accept-Encoding": "identity", "If-None-Match": f"W/{etag}"})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert stats.not_modified == 1
+
+async def test_changed_etag_gets_the_full_body(client):
+    response = await client.get("/items", headers={"Accept-Encoding": "identity", "If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.json() == ITEMS
+
+async def test_large_json_is_gzipped_with_its_own_etag(client, stats):
+    plain = await client.get("/items", headers={"Accept-Encoding": "identity"})
+    zipped = await client.get("/items", headers={"Accept-Encoding": "gzip"})
+
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in zipped.headers["vary"]
+    assert zipped.json() == ITEMS
+    assert zipped.headers["etag"] != plain.headers["etag"]
+    assert stats.compressed == 1
+    assert stats.bytes_saved > 0
+
+async def test_small_json_is_not_compressed(client):
+    response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"ok": True}
+
+async def test_non_json_passes_through(client, stats):
+    response = await client.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "etag" not in response.headers
+    assert response.text == "x" * 4096
+    assert stats.responses == 0
+
+async def test_compressed_body_length_matches_header(client):
+    # httpx decodes the body, so read the raw bytes to check Content-Length
+    async with client.stream("GET", "/items", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+    assert int(response.headers["content-length"]) == len(raw)
+    assert gzip.decompress(raw).startswith(b"[")
@@ -0,0 +1,16 @@
+import os
+import statistics
+
+from benchmarks.import_time import DEFAULT_BUDGET_MS, FORBIDDEN_AT_STARTUP, loaded_modules, measure_once
+
+BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', DEFAULT_BUDGET_MS))
+
+def test_server_imports_within_budget():
+    # The first run also compiles bytecode; it is not counted
+    measure_once("server")
+    runs = [measure_once("server")[0] for _ in range(3)]
+    assert statistics.median(runs) <= BUDGET_MS, f"import server took {runs} ms, budget {BUDGET_MS:.0f} ms"
+
+def test_heavy_packages_are_not_imported_at_startup():
+    loaded = {name.split(".")[0] for name in loaded_modules("server")}
+    assert not loaded & FORBIDDEN_AT_STARTUP
@@ -0,0 +1,35 @@
+import pytest
+from pymongo import TEXT
+
+from indexes import HOT_QUERIES, INDEXES, ensure_indexes, verify_query_plans
+
+pytestmark = pytest.mark.anyio
+
+def query_fields(query):
+    """Fields every document matched by `query` is constrained on"""
+    fields = set()
+    for key, value in query.items():
+        if key == "$and":
+            fields.update(*map(query_fields, value))
+        elif key == "$or":
+            fields.update(set.intersection(*map(query_fields, value)))
+        else:
+            fields.add(key)
+    return fields
+
+def leading_fields(collection):
+    fields = set()
+    for index in INDEXES.get(collection, []):
+        field, direction = next(iter(index.document["key"].items()))
+        fields.add("$text" if direction == TEXT else field)
+    return fields
+
+@pytest.mark.parametrize("name, collection, query, sort", HOT_QUERIES, ids=[query[0] for query in HOT_QUERIES])
+def test_every_hot_query_has_an_index_to_start_from(name, collection, query, sort):
+    """A declared index leads with a field the query filters or sorts on, so dropping one fails here"""
+    used = query_fields(query) | set(list(sort or {})[:1])
+    assert used & leading_fields(collection)
+
+async def test_no_hot_query_is_planned_as_a_collscan(mongod):
+    await ensure_indexes(mongod)
+    assert await verify_query_plans(mongod) == []
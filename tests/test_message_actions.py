@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from analytics import AnalyticsRollups
+from message_actions import ContactMessageActions
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def actions(db):
+    await db.contact_messages.insert_many([
+        {"id": f"msg-{i}", "email": "visitor@example.com", "read": i % 2 == 0, "replied": False,
+         "timestamp": datetime(2024, 3, 1) + timedelta(hours=i)}
+        for i in range(4)
+    ])
+    return ContactMessageActions(db, AnalyticsRollups(db))
+
+@pytest.mark.parametrize("message_filter", [{}, {"read": None, "email": None}])
+async def test_filter_without_criteria_is_rejected(db, actions, message_filter):
+    with pytest.raises(ValueError):
+        await actions.apply("delete", message_filter=message_filter)
+    assert await db.contact_messages.count_documents({}) == 4
+
+async def test_filter_with_a_criterion_deletes_only_its_matches(db, actions):
+    result = await actions.apply("delete", message_filter={"read": True})
+    assert result["modified"] == 2
+    assert sorted(doc["id"] for doc in await db.contact_messages.find().to_list(None)) == ["msg-1", "msg-3"]
+
+async def test_ids_with_an_empty_filter_use_the_ids(db, actions):
+    result = await actions.apply("archive", ids=["msg-1", "missing"], message_filter={})
+    assert result["modified"] == 1
+    assert {item["id"]: item["status"] for item in result["results"]} == {"msg-1": "updated", "missing": "not_found"}
+
+async def test_repeating_a_filter_action_pages_through_every_match(db, actions, monkeypatch):
+    monkeypatch.setattr(actions, "limit", 1)
+    await db.contact_messages.update_many({}, {"$set": {"read": True}})
+    await db.contact_messages.update_many({"id": {"$in": ["msg-2", "msg-3"]}}, {"$set": {"read": False}})
+
+    calls = []
+    while True:
+        result = await actions.apply("read", message_filter={"before": datetime(2024, 3, 2)})
+        calls.append([item["id"] for item in result["results"]])
+        if not result["has_more"]:
+            break
+    # Messages already read are skipped, the rest come oldest first
+    assert calls == [["msg-2"], ["msg-3"]]
+    assert await db.contact_messages.count_documents({"read": False}) == 0
+
+async def test_more_ids_than_the_limit_are_rejected(db, actions, monkeypatch):
+    monkeypatch.setattr(actions, "limit", 2)
+    with pytest.raises(ValueError):
+        await actions.apply("read", ids=["msg-0", "msg-1", "msg-2"])
+    assert (await actions.apply("read", ids=["msg-1", "msg-1", "msg-3"]))["modified"] == 2
+
+async def test_delete_counts_only_what_it_removed(db, actions):
+    await actions.analytics.reconcile()
+    # Another request deletes msg-1 between resolving the targets and deleting them
+    resolve = actions._resolve
+
+    async def resolve_then_race(query):
+        docs, has_more = await resolve(query)
+        await db.contact_messages.delete_one({"id": "msg-1"})
+        return docs, has_more
+    actions._resolve = resolve_then_race
+
+    result = await actions.apply("delete", ids=["msg-0", "msg-1", "msg-3"])
+    assert result["modified"] == 2
+    assert {item["id"]: item["status"] for item in result["results"]} == {
+        "msg-0": "deleted", "msg-1": "not_found", "msg-3": "deleted"
+    }
+    # msg-0 was read, msg-3 unread; msg-1 (unread) is not this call's to count
+    totals = await actions.analytics.get_totals()
+    assert (totals["total_messages"], totals["unread_messages"]) == (2, 1)
@@ -0,0 +1,99 @@
+import os
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from metrics import MetricsRegistry, MetricsMiddleware, CONTENT_TYPE, http_requests_total
+
+pytestmark = pytest.mark.anyio
+
+async def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, "/api/x")
+
+    text = await registry.render()
+    worker = f'worker="{os.getpid()}"'
+    assert "# TYPE latency_seconds histogram" in text
+    assert f'latency_seconds_bucket{{route="/api/x",{worker},le="0.1"}} 1' in text
+    assert f'latency_seconds_bucket{{route="/api/x",{worker},le="1.0"}} 3' in text
+    assert f'latency_seconds_bucket{{route="/api/x",{worker},le="+Inf"}} 4' in text
+    assert f'latency_seconds_sum{{route="/api/x",{worker}}} 4.05' in text
+    assert f'latency_seconds_count{{route="/api/x",{worker}}} 4' in text
+
+async def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors", ("logger",)).inc('a"b\\c\nd')
+    text = await registry.render()
+    assert 'logger="a\\"b\\\\c\\nd"' in text
+
+async def test_observations_from_other_threads_are_drained_at_scrape():
+    registry = MetricsRegistry()
+    counter = registry.counter("commands_total", "Commands", ("command",))
+    registry.pending.append((counter, 1, ("find",)))
+    registry.pending.append((counter, 1, ("find",)))
+
+    assert counter.samples(()) == []
+    assert 'command="find",' in await registry.render()
+    assert counter._values[("find",)] == 2
+
+async def test_gauge_callbacks_and_collectors_run_at_scrape():
+    registry = MetricsRegistry()
+    depth = registry.gauge("depth", "Depth")
+    depth.set_function(lambda: 7)
+    jobs = registry.gauge("jobs", "Jobs", ("status",))
+
+    async def collect():
+        jobs.set(3, "pending")
+
+    async def broken():
+        raise RuntimeError("database down")
+
+    registry.add_collector(broken)
+    registry.add_collector(collect)
+    text = await registry.render()
+    assert f'depth{{worker="{os.getpid()}"}} 7' in text
+    assert f'jobs{{status="pending",worker="{os.getpid()}"}} 3' in text
+
+async def test_requests_are_counted_by_route_template():
+    app = FastAPI()
+
+    @app.get("/api/portfolio/{section_name}")
+    async def section(section_name: str):
+        return {"section": section_name}
+
+    app.add_middleware(MetricsMiddleware)
+    labels = ("GET", "/api/portfolio/{section_name}", "200")
+    before = http_requests_total._values.get(labels, 0)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/api/portfolio/about")
+        await client.get("/api/portfolio/skills")
+        await client.get("/nowhere")
+
+    assert http_requests_total._values.get(labels, 0) == before + 2
+    assert http_requests_total._values.get(("GET", "unmatched", "404"), 0) >= 1
+
+@pytest.fixture
+async def client(db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server.db, "_database", db)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+        yield client
+
+async def test_metrics_endpoint_serves_the_text_format(client, monkeypatch):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    assert "# TYPE http_requests_total counter" in response.text
+    assert "# TYPE email_outbox_jobs gauge" in response.text
+
+async def test_metrics_endpoint_requires_the_token_when_set(client, monkeypatch):
+    monkeypatch.setenv("METRICS_TOKEN", "scrape-secret")
+    assert (await client.get("/metrics")).status_code == 401
+    assert (await client.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 401
+    response = await client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from email_service import EmailService
+from outbox import EmailOutbox
+
+pytestmark = pytest.mark.anyio
+
+CONTACTS = [
+    {"name": name, "email": f"{name.lower()}@example.com", "subject": "Hello", "message": "Hi there"}
+    for name in ("Ann", "Bad", "Cy")
+]
+
+def provider(requests, status_for_batch=400):
+    """Sendinblue stand-in: refuses any request addressed to bad@example.com"""
+    def handler(request):
+        body = json.loads(request.content)
+        recipients = [to["email"] for version in body.get("messageVersions", [body]) for to in version["to"]]
+        requests.append(recipients)
+        if "bad@example.com" in recipients:
+            return httpx.Response(status_for_batch if len(recipients) > 1 else 400, json={"code": "invalid_parameter"})
+        return httpx.Response(201, json={"messageId": "<test@local>"})
+    return httpx.MockTransport(handler)
+
+async def deliver_auto_reply_batch(db, monkeypatch, status_for_batch):
+    monkeypatch.setenv('SENDINBLUE_API_KEY', 'test-key')
+    monkeypatch.setenv('ADMIN_EMAIL', 'admin@example.com')
+    requests = []
+    email_service = EmailService()
+    email_service.transport = provider(requests, status_for_batch)
+    outbox = EmailOutbox(db, email_service)
+    outbox.batching["auto_reply"] = (60, 100)
+    for i, contact in enumerate(CONTACTS):
+        await outbox.enqueue_contact_emails(f"msg-{i}", contact)
+    await db.email_outbox.delete_many({"kind": "notification"})
+    # Skip the batch window
+    await db.email_outbox.update_many({}, {"$set": {"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)}})
+
+    job = await outbox._claim()
+    await outbox._deliver(await outbox._claim_batch(job))
+    await email_service.close()
+    jobs = {job["payload"]["email"]: job for job in await db.email_outbox.find().to_list(None)}
+    return requests, jobs
+
+async def test_rejected_batch_is_resent_job_by_job(db, monkeypatch):
+    requests, jobs = await deliver_auto_reply_batch(db, monkeypatch, status_for_batch=400)
+
+    assert len(requests[0]) == 3
+    assert sorted(map(tuple, requests[1:])) == [("ann@example.com",), ("bad@example.com",), ("cy@example.com",)]
+    assert jobs["ann@example.com"]["status"] == "sent"
+    assert jobs["cy@example.com"]["status"] == "sent"
+    assert (jobs["bad@example.com"]["status"], jobs["bad@example.com"]["attempts"]) == ("pending", 1)
+
+async def test_batch_failing_on_the_provider_side_is_retried_whole(db, monkeypatch):
+    requests, jobs = await deliver_auto_reply_batch(db, monkeypatch, status_for_batch=503)
+
+    assert len(requests) == 1
+    assert {job["status"] for job in jobs.values()} == {"pending"}
+    assert {job["attempts"] for job in jobs.values()} == {1}
@@ -0,0 +1,96 @@
+import pytest
+
+from metrics import page_views_dropped_total
+from page_view_buffer import PageViewBuffer
+
+pytestmark = pytest.mark.anyio
+
+def view(i):
+    return {"id": f"view-{i}", "page": "home"}
+
+def dropped():
+    return page_views_dropped_total._values.get((), 0)
+
+@pytest.fixture
+def buffer(db, monkeypatch):
+    monkeypatch.setenv('PAGE_VIEW_MAX_PENDING', '3')
+    monkeypatch.setenv('PAGE_VIEW_BATCH_SIZE', '100')
+    monkeypatch.setenv('PAGE_VIEW_FLUSH_SECONDS', '60')
+    monkeypatch.setenv('PAGE_VIEW_FULL_WAIT_SECONDS', '0.5')
+    flushed = []
+
+    async def on_flush(batch):
+        flushed.append([doc["id"] for doc in batch])
+    buffer = PageViewBuffer(db, on_flush=on_flush)
+    buffer.flushed = flushed
+    return buffer
+
+async def test_full_buffer_waits_for_the_background_flush(db, buffer):
+    before = dropped()
+    buffer.start()
+    for i in range(4):
+        await buffer.add(view(i))
+    await buffer.stop()
+
+    # The fourth view woke the flush and waited for room instead of flushing itself
+    assert buffer.flushed == [["view-0", "view-1", "view-2"], ["view-3"]]
+    assert dropped() == before
+
+async def test_full_buffer_drops_views_when_no_flush_makes_room(db, buffer, monkeypatch):
+    monkeypatch.setattr(buffer, "full_wait", 0.05)
+    before = dropped()
+    for i in range(5):
+        await buffer.add(view(i))
+
+    assert len(buffer) == 3
+    assert dropped() == before + 2
+    assert await db.page_views.count_documents({}) == 0
+
+async def test_stop_flushes_what_is_pending(db, buffer):
+    buffer.start()
+    await buffer.add(view(0))
+    await buffer.add(view(1))
+    await buffer.stop()
+
+    assert await db.page_views.count_documents({}) == 2
+    assert len(buffer) == 0
+
+class FlakyPageViews:
+    """page_views stand-in whose first insert_many fails as if MongoDB were unreachable"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = []
+
+    async def insert_many(self, documents, **kwargs):
+        self.calls.append(len(documents))
+        if len(self.calls) == 1:
+            raise ConnectionError("MongoDB unreachable")
+        return await self.collection.insert_many(documents, **kwargs)
+
+async def test_failed_insert_keeps_the_batch_for_the_next_flush(db, buffer, monkeypatch):
+    page_views = FlakyPageViews(db.page_views)
+    monkeypatch.setattr(PageViewBuffer, "collection", property(lambda self: page_views))
+
+    await buffer.add(view(0))
+    await buffer.add(view(1))
+    await buffer.flush()
+    assert len(buffer) == 2
+    assert buffer.flushed == []
+
+    await buffer.add(view(2))
+    await buffer.flush()
+    assert page_views.calls == [2, 3]
+    assert buffer.flushed == [["view-0", "view-1", "view-2"]]
+    assert await db.page_views.count_documents({}) == 3
+
+async def test_rejected_documents_are_left_out_of_the_flush_hook(db, buffer):
+    # view-1 was already written, so the bulk insert rejects it as a duplicate
+    await db.page_views.insert_one({"_id": "view-1"})
+    for i in range(3):
+        await buffer.add(view(i) | {"_id": f"view-{i}"})
+
+    await buffer.flush()
+
+    assert buffer.flushed == [["view-0", "view-2"]]
+    assert len(buffer) == 0
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from pagination import (
+    KEYSET_SORT, decode_cursor, decode_search_cursor, encode_cursor, encode_search_cursor,
+    keyset_filter, next_cursor
+)
+
+pytestmark = pytest.mark.anyio
+
+async def fetch_all(db, limit):
+    """Walk every page the way the admin endpoint does; returns the ids in order and the page count"""
+    ids, cursor, pages = [], None, 0
+    total = await db.contact_messages.count_documents({})
+    while True:
+        # A cursor that does not move forward would otherwise page forever
+        assert pages <= total, "pagination did not terminate"
+        page = await db.contact_messages.find(keyset_filter(cursor)).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+        ids += [doc["id"] for doc in page[:limit]]
+        pages += 1
+        cursor = next_cursor(page, limit)
+        if cursor is None:
+            return ids, pages
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 50])
+async def test_pages_cover_every_message_once_despite_timestamp_ties(db, limit):
+    base = datetime(2024, 3, 1, 12, 0, 0, 123456)
+    documents = []
+    for i in range(12):
+        # Groups of four share a timestamp, so page boundaries fall inside ties
+        documents.append({"id": f"msg-{i:02d}", "timestamp": base - timedelta(seconds=i // 4)})
+    await db.contact_messages.insert_many(documents)
+
+    ids, pages = await fetch_all(db, limit)
+
+    expected = [doc["id"] for doc in sorted(documents, key=lambda doc: (doc["timestamp"], doc["id"]), reverse=True)]
+    assert ids == expected
+    assert pages == max(1, -(-len(documents) // limit))
+
+async def test_messages_added_while_paging_do_not_shift_later_pages(db):
+    base = datetime(2024, 3, 1, 12, 0)
+    await db.contact_messages.insert_many([{"id": f"msg-{i}", "timestamp": base - timedelta(minutes=i)} for i in range(4)])
+    first = await db.contact_messages.find().sort(KEYSET_SORT).limit(3).to_list(3)
+    cursor = next_cursor(first, 2)
+
+    await db.contact_messages.insert_one({"id": "msg-new", "timestamp": base + timedelta(minutes=1)})
+
+    rest = await db.contact_messages.find(keyset_filter(cursor)).sort(KEYSET_SORT).to_list(None)
+    assert [doc["id"] for doc in rest] == ["msg-2", "msg-3"]
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 3, 1, 12, 0, 0, 123000)
+    assert decode_cursor(encode_cursor(timestamp, "msg-1")) == (timestamp, "msg-1")
+    assert decode_search_cursor(encode_search_cursor(2.5, timestamp, "msg-1")) == (2.5, timestamp, "msg-1")
+
+def test_no_cursor_means_first_page():
+    assert keyset_filter(None) == {}
+    assert next_cursor([{"id": "a", "timestamp": datetime(2024, 1, 1)}], 1) is None
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", "WzEsMl0", "eyJ0IjoibGF0ZXIiLCJpIjoiYSJ9", "e30"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        keyset_filter(cursor)
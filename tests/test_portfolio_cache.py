@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from portfolio_cache import PortfolioCache
+
+pytestmark = pytest.mark.anyio
+
+async def set_section(db, name, headline):
+    await db.portfolio_sections.update_one(
+        {"section_name": name}, {"$set": {"section_name": name, "content": {"headline": headline}}}, upsert=True
+    )
+
+async def headline(cache, name="about"):
+    return (await cache.get_section(name)).content["headline"]
+
+async def test_sections_are_served_from_memory_until_invalidated(db):
+    await set_section(db, "about", "Data engineer")
+    cache = PortfolioCache(db)
+    assert await headline(cache) == "Data engineer"
+
+    await set_section(db, "about", "Platform engineer")
+    assert await headline(cache) == "Data engineer"
+    await cache.invalidate()
+    assert await headline(cache) == "Platform engineer"
+    assert await cache.get_section("missing") is None
+
+async def test_other_workers_drop_their_cache_on_the_next_version_check(db, monkeypatch):
+    monkeypatch.setenv('PORTFOLIO_CACHE_CHECK_SECONDS', '0.01')
+    await set_section(db, "about", "Data engineer")
+    worker, other_worker = PortfolioCache(db), PortfolioCache(db)
+    assert await headline(worker) == "Data engineer"
+    worker.start()
+    try:
+        await set_section(db, "about", "Platform engineer")
+        await other_worker.invalidate()
+        for _ in range(100):
+            if await headline(worker) == "Platform engineer":
+                break
+            await asyncio.sleep(0.01)
+        assert await headline(worker) == "Platform engineer"
+    finally:
+        await worker.stop()
+
+async def test_concurrent_misses_load_once(db, monkeypatch):
+    await set_section(db, "about", "Data engineer")
+    await set_section(db, "projects", "Lakehouse")
+    cache = PortfolioCache(db)
+    loads = []
+    find = db.portfolio_sections.find
+
+    def counting_find(*args, **kwargs):
+        loads.append(args)
+        return find(*args, **kwargs)
+    collection = db.portfolio_sections
+    monkeypatch.setattr(collection, "find", counting_find)
+    monkeypatch.setattr(PortfolioCache, "collection", property(lambda self: collection))
+
+    results = await asyncio.gather(*(cache.get_sections() for _ in range(20)))
+
+    assert len(loads) == 1
+    assert all(sorted(section.section_name for section in sections) == ["about", "projects"] for sections in results)
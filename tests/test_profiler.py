@@ -0,0 +1,108 @@
+import time
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import auth
+from profiler import Profiler, ProfilerMiddleware, await_span
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", "test-secret")
+    monkeypatch.setattr(auth, "_token_cache", auth.OrderedDict())
+
+def bearer(sub: str) -> dict:
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': sub})}"}
+
+def busy(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+@pytest.fixture
+def profiler(monkeypatch):
+    monkeypatch.setenv("PROFILER_INTERVAL_MS", "1")
+    profiler = Profiler()
+    yield profiler
+    profiler.stop()
+
+@pytest.fixture
+async def client(profiler):
+    app = FastAPI()
+
+    @app.get("/api/portfolio/{section_name}")
+    async def section(section_name: str):
+        busy(0.03)
+        with await_span("http", "provider"):
+            await asyncio.sleep(0.03)
+        return {"section": section_name}
+
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+async def test_profiler_is_off_unless_enabled(monkeypatch):
+    monkeypatch.delenv("PROFILER_ENABLED", raising=False)
+    assert not Profiler().enabled
+    monkeypatch.setenv("PROFILER_ENABLED", "1")
+    assert Profiler().enabled
+
+async def test_only_admins_can_force_a_profile(profiler):
+    admin = [(b"x-profile", b"1"), (b"authorization", bearer("admin")["Authorization"].encode())]
+    visitor = [(b"x-profile", b"1"), (b"authorization", bearer("visitor")["Authorization"].encode())]
+    assert profiler.should_profile(admin) == "header"
+    assert profiler.should_profile(visitor) is None
+    assert profiler.should_profile([(b"x-profile", b"1")]) is None
+    assert profiler.should_profile([(b"x-profile", b"1"), (b"authorization", b"Bearer forged")]) is None
+
+async def test_unprofiled_requests_leave_no_trace(client, profiler):
+    response = await client.get("/api/portfolio/about", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert not profiler.profiles
+    assert profiler._thread is None
+
+async def test_admin_request_is_profiled_on_and_off_cpu(client, profiler):
+    response = await client.get("/api/portfolio/about", headers={"X-Profile": "1", **bearer("admin")})
+
+    profile = profiler.get(response.headers["x-profile-id"])
+    assert profile is not None
+    assert profile.route == "/api/portfolio/{section_name}"
+    assert profile.status == 200
+    assert profile.samples > 0
+    stacks = "\n".join(profile.collapsed())
+    assert stacks.startswith("GET /api/portfolio/{section_name};")
+    assert "test_profiler.py:busy" in stacks
+    assert "[http] provider" in stacks
+    assert [span["name"] for span in profile.summary()["awaits"]] == ["provider"]
+
+async def test_sampled_requests_are_profiled_without_the_header(client, profiler):
+    profiler.sample_rate = 1.0
+    response = await client.get("/api/portfolio/skills")
+    assert "x-profile-id" not in response.headers
+    assert [profile.trigger for profile in profiler.profiles] == ["sample"]
+    assert profiler.collapsed(route="/api/portfolio/{section_name}")
+    assert profiler.collapsed(route="/api/other") == []
+
+@pytest.fixture
+async def server_client(db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server.db, "_database", db)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+        yield client
+
+async def test_admin_profile_endpoints_are_hidden_when_disabled(server_client, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server.profiler, "enabled", False)
+    response = await server_client.get("/api/admin/profiles", headers=bearer("admin"))
+    assert response.status_code == 404
+
+    monkeypatch.setattr(server.profiler, "enabled", True)
+    response = await server_client.get("/api/admin/profiles", headers=bearer("admin"))
+    assert response.status_code == 200
@@ -0,0 +1,23 @@
+import pytest
+
+from rate_limit import MemoryTokenBucketStore, parse_limit
+
+pytestmark = pytest.mark.anyio
+
+async def test_bucket_refuses_once_the_burst_is_spent():
+    store = MemoryTokenBucketStore()
+    burst, rate = parse_limit("3/60")
+    assert [await store.take("contact:1.2.3.4", burst, rate) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert await store.take("contact:1.2.3.4", burst, rate) == pytest.approx(20, rel=0.01)
+    assert await store.take("contact:5.6.7.8", burst, rate) == 0.0
+
+async def test_memory_is_bounded_and_recent_keys_survive_eviction():
+    store = MemoryTokenBucketStore(shards=1, max_keys_per_shard=100)
+    burst, rate = parse_limit("1/60")
+    await store.take("contact:attacked", burst, rate)
+    for i in range(1000):
+        # The throttled client keeps coming back while many others pass through
+        await store.take(f"contact:10.0.{i // 256}.{i % 256}", burst, rate)
+        if i % 50 == 0:
+            assert await store.take("contact:attacked", burst, rate) > 0
+    assert len(store) == 100
@@ -0,0 +1,101 @@
+import json
+import gzip
+from datetime import datetime, timedelta
+
+import pytest
+
+import retention
+from retention import RetentionManager
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+class Analytics:
+    """Stands in for AnalyticsService, recording what retention reports"""
+
+    def __init__(self):
+        self.archived = []
+
+    async def record_messages_archived(self, count: int, unread: int):
+        self.archived.append((count, unread))
+
+@pytest.fixture
+def manager(db, tmp_path, monkeypatch):
+    monkeypatch.setenv("CONTACT_ARCHIVE_AFTER_DAYS", "30")
+    monkeypatch.setenv("ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setenv("ARCHIVE_CHUNK_SIZE", "2")
+    return RetentionManager(db, Analytics())
+
+async def store_messages(db, ages_in_days):
+    messages = [
+        {"id": f"m{i}", "timestamp": NOW - timedelta(days=age), "read": i % 2 == 0, "message": f"hello {i}"}
+        for i, age in enumerate(ages_in_days)
+    ]
+    await db.contact_messages.insert_many([dict(message) for message in messages])
+    return messages
+
+def archived_ids(manager, **window):
+    return [json.loads(line)["id"] for line in manager.iter_archived_messages(**window)]
+
+async def test_old_messages_move_to_chunks_oldest_first(db, manager):
+    await store_messages(db, [90, 80, 70, 60, 50, 1])
+
+    assert await manager.archive_contact_messages(NOW) == 5
+
+    remaining = await db.contact_messages.find({}, {"_id": 0, "id": 1}).to_list(None)
+    assert [doc["id"] for doc in remaining] == ["m5"]
+    assert [chunk["bytes"] > 0 for chunk in manager.list_chunks()] == [True, True, True]
+    assert archived_ids(manager) == ["m0", "m1", "m2", "m3", "m4"]
+    # m1 and m3 were unread
+    assert manager.analytics.archived == [(2, 1), (2, 1), (1, 0)]
+
+async def test_archived_messages_keep_their_fields(db, manager):
+    stored = await store_messages(db, [90])
+    await manager.archive_contact_messages(NOW)
+
+    [line] = list(manager.iter_archived_messages())
+    assert json.loads(line) == dict(stored[0], timestamp=stored[0]["timestamp"].isoformat())
+
+async def test_reads_only_open_chunks_that_overlap_the_window(db, manager, monkeypatch):
+    await store_messages(db, [90, 80, 70, 60, 50])
+    await manager.archive_contact_messages(NOW)
+
+    opened = []
+    real_open = gzip.open
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(retention.gzip, "open", counting_open)
+    assert archived_ids(manager, after=NOW - timedelta(days=75), before=NOW - timedelta(days=55)) == ["m2", "m3"]
+    assert len(opened) == 1
+    assert archived_ids(manager, after=NOW - timedelta(days=55)) == ["m4"]
+
+async def test_rerun_after_a_crash_rewrites_the_same_chunk(db, manager):
+    stored = await store_messages(db, [90, 80])
+    # A pass that died after writing its chunk but before deleting the messages
+    manager._write_chunk(stored)
+
+    await manager.archive_contact_messages(NOW)
+    assert len(manager.list_chunks()) == 1
+    assert archived_ids(manager) == ["m0", "m1"]
+    assert await db.contact_messages.count_documents({}) == 0
+
+async def test_archiving_is_off_by_default(db, tmp_path, monkeypatch):
+    monkeypatch.delenv("CONTACT_ARCHIVE_AFTER_DAYS", raising=False)
+    monkeypatch.setenv("ARCHIVE_DIR", str(tmp_path))
+    manager = RetentionManager(db, Analytics())
+    await store_messages(db, [365])
+
+    assert await manager.archive_contact_messages(NOW) == 0
+    assert await db.contact_messages.count_documents({}) == 1
+    assert manager.raw_since(NOW) is None
+
+async def test_one_worker_at_a_time_runs_a_pass(db, manager):
+    other = RetentionManager(db, Analytics())
+    assert await manager._acquire(NOW)
+    assert not await other._acquire(NOW)
+    await manager._release()
+    assert await other._acquire(NOW)
@@ -0,0 +1,74 @@
+import os
+import re
+import sys
+import time
+import socket
+import subprocess
+from pathlib import Path
+
+import httpx
+
+from rate_limit import MemoryTokenBucketStore, MongoTokenBucketStore, create_store
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_rate_limit_buckets_are_shared_when_running_several_workers(monkeypatch):
+    monkeypatch.delenv('RATE_LIMIT_BACKEND', raising=False)
+    monkeypatch.setenv('WEB_CONCURRENCY', '2')
+    assert isinstance(create_store(db=None), MongoTokenBucketStore)
+    monkeypatch.setenv('WEB_CONCURRENCY', '1')
+    assert isinstance(create_store(db=None), MemoryTokenBucketStore)
+    monkeypatch.setenv('RATE_LIMIT_BACKEND', 'memory')
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    assert isinstance(create_store(db=None), MemoryTokenBucketStore)
+
+def test_page_views_are_limited_in_memory_whatever_the_backend():
+    import server
+    # A shared bucket would cost a MongoDB write per tracked page view
+    assert isinstance(server.page_view_rate_limiter.store, MemoryTokenBucketStore)
+    assert server.page_view_rate_limiter is not server.rate_limiter
+
+def test_each_worker_runs_its_own_lifespan(tmp_path):
+    """`uvicorn --workers 2` as railway.toml runs it: both processes start, serve and shut down cleanly"""
+    port = free_port()
+    log_path = tmp_path / "uvicorn.log"
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY="2",
+        JWT_SECRET="test-secret",
+        ADMIN_PASSWORD="test-password",
+        ADMIN_EMAIL="admin@example.com",
+        SENDINBLUE_API_KEY="test-key",
+        # No database here: startup logs the connection errors and carries on, as it does in production
+        MONGO_URL="mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=200",
+    )
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", env["WEB_CONCURRENCY"]],
+            cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        deadline = time.monotonic() + 30
+        while log_path.read_text().count("Application startup complete") < 2:
+            assert process.poll() is None, log_path.read_text()
+            assert time.monotonic() < deadline, log_path.read_text()
+            time.sleep(0.2)
+
+        for _ in range(10):
+            # A new connection each time, so the kernel may hand it to either worker
+            response = httpx.get(f"http://127.0.0.1:{port}/api/", headers={"Connection": "close"})
+            assert response.status_code == 200
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    output = log_path.read_text()
+    worker_pids = set(re.findall(r"Started server process \[(\d+)\]", output))
+    assert len(worker_pids) == 2
+    assert output.count("Application shutdown complete") == 2